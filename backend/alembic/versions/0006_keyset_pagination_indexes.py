@@ -0,0 +1,45 @@
+"""Add composite indexes backing keyset pagination
+
+Revision ID: 0006_keyset_pagination_indexes
+Revises: 0005_add_performance_indexes
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_keyset_pagination_indexes'
+down_revision = '0005_add_performance_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Índices compostos (ordenação, id) usados pelo predicado de seek
+    # WHERE (col, id) < (:last_col, :last_id) ORDER BY col DESC, id DESC
+    op.create_index(
+        'ix_quotations_created_id',
+        'quotations',
+        [sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    op.create_index(
+        'ix_historical_prices_date_id',
+        'historical_prices',
+        [sa.text('date_recorded DESC'), sa.text('id DESC')],
+        unique=False
+    )
+    op.create_index(
+        'ix_quotation_history_quotation_timestamp_id',
+        'quotation_history',
+        ['quotation_id', sa.text('timestamp DESC'), sa.text('id DESC')],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_quotation_history_quotation_timestamp_id', table_name='quotation_history')
+    op.drop_index('ix_historical_prices_date_id', table_name='historical_prices')
+    op.drop_index('ix_quotations_created_id', table_name='quotations')
@@ -0,0 +1,43 @@
+"""Add pg_trgm GIN indexes for ILIKE search columns
+
+Revision ID: 0007_trigram_search_indexes
+Revises: 0006_keyset_pagination_indexes
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_trigram_search_indexes'
+down_revision = '0006_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+TRIGRAM_INDEXES = [
+    ('ix_quotations_reference_id_trgm', 'quotations', 'reference_id'),
+    ('ix_quotations_title_trgm', 'quotations', 'title'),
+    ('ix_quotations_description_trgm', 'quotations', 'description'),
+    ('ix_historical_prices_item_name_trgm', 'historical_prices', 'item_name'),
+]
+
+
+def upgrade():
+    # pg_trgm permite que ILIKE '%termo%' use índice GIN em vez de seq scan
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    for index_name, table_name, column_name in TRIGRAM_INDEXES:
+        op.create_index(
+            index_name,
+            table_name,
+            [column_name],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column_name: 'gin_trgm_ops'}
+        )
+
+
+def downgrade():
+    for index_name, table_name, _ in reversed(TRIGRAM_INDEXES):
+        op.drop_index(index_name, table_name=table_name)
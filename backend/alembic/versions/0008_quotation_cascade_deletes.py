@@ -0,0 +1,43 @@
+"""Cascade quotation deletes in the database
+
+Revision ID: 0008_quotation_cascade_deletes
+Revises: 0007_trigram_search_indexes
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_quotation_cascade_deletes'
+down_revision = '0007_trigram_search_indexes'
+branch_labels = None
+depends_on = None
+
+
+# (tabela, coluna, tabela referenciada, ação ON DELETE)
+FOREIGN_KEYS = [
+    ('quotation_items', 'quotation_id', 'quotations', 'CASCADE'),
+    ('quotation_history', 'quotation_id', 'quotations', 'CASCADE'),
+    ('quotation_tag', 'quotation_id', 'quotations', 'CASCADE'),
+    ('historical_prices', 'quotation_item_id', 'quotation_items', 'SET NULL'),
+]
+
+
+def _replace_foreign_key(table, column, referent, ondelete):
+    constraint = f'{table}_{column}_fkey'
+    op.drop_constraint(constraint, table, type_='foreignkey')
+    op.create_foreign_key(
+        constraint, table, referent, [column], ['id'], ondelete=ondelete
+    )
+
+
+def upgrade():
+    # DELETE em massa (sem carregar o ORM) precisa que o banco propague a remoção
+    for table, column, referent, ondelete in FOREIGN_KEYS:
+        _replace_foreign_key(table, column, referent, ondelete)
+
+
+def downgrade():
+    for table, column, referent, _ in reversed(FOREIGN_KEYS):
+        _replace_foreign_key(table, column, referent, None)
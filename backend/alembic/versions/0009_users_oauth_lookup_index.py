@@ -0,0 +1,29 @@
+"""Add composite index for OAuth user lookups
+
+Revision ID: 0009_users_oauth_lookup_index
+Revises: 0008_quotation_cascade_deletes
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_users_oauth_lookup_index'
+down_revision = '0008_quotation_cascade_deletes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Login OAuth busca por (auth_provider, oauth_id) em uma única consulta
+    op.create_index(
+        'ix_users_auth_provider_oauth_id',
+        'users',
+        ['auth_provider', 'oauth_id'],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_users_auth_provider_oauth_id', table_name='users')
@@ -0,0 +1,86 @@
+"""Add trigger-maintained tag id array to quotations
+
+Revision ID: 0010_quotation_tag_ids_array
+Revises: 0009_users_oauth_lookup_index
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_quotation_tag_ids_array'
+down_revision = '0009_users_oauth_lookup_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'quotations',
+        sa.Column(
+            'tag_ids_array',
+            postgresql.ARRAY(sa.Integer()),
+            nullable=False,
+            server_default='{}'
+        )
+    )
+    
+    # Preenche a coluna a partir da tabela de associação existente
+    op.execute("""
+        UPDATE quotations q
+        SET tag_ids_array = t.tag_ids
+        FROM (
+            SELECT quotation_id, array_agg(tag_id ORDER BY tag_id) AS tag_ids
+            FROM quotation_tag
+            GROUP BY quotation_id
+        ) t
+        WHERE t.quotation_id = q.id
+    """)
+    
+    # Mantém o array sincronizado a cada inserção/remoção em quotation_tag
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sync_quotation_tag_ids() RETURNS trigger AS $$
+        DECLARE
+            target_id integer;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                target_id := OLD.quotation_id;
+            ELSE
+                target_id := NEW.quotation_id;
+            END IF;
+            
+            UPDATE quotations
+            SET tag_ids_array = COALESCE(
+                (SELECT array_agg(tag_id ORDER BY tag_id)
+                 FROM quotation_tag WHERE quotation_id = target_id),
+                '{}'
+            )
+            WHERE id = target_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_quotation_tag_sync_ids
+        AFTER INSERT OR DELETE ON quotation_tag
+        FOR EACH ROW EXECUTE FUNCTION sync_quotation_tag_ids()
+    """)
+    
+    # Filtro "possui todas as tags" usa @> sobre este índice
+    op.create_index(
+        'ix_quotations_tag_ids_array',
+        'quotations',
+        ['tag_ids_array'],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_quotations_tag_ids_array', table_name='quotations')
+    op.execute("DROP TRIGGER IF EXISTS trg_quotation_tag_sync_ids ON quotation_tag")
+    op.execute("DROP FUNCTION IF EXISTS sync_quotation_tag_ids()")
+    op.drop_column('quotations', 'tag_ids_array')
@@ -0,0 +1,48 @@
+"""Add partial indexes for active users and superusers
+
+Revision ID: 0011_users_partial_indexes
+Revises: 0010_quotation_tag_ids_array
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_users_partial_indexes'
+down_revision = '0010_quotation_tag_ids_array'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Índices parciais contêm apenas as linhas filtradas pelas consultas frequentes
+    op.create_index(
+        'ix_users_active',
+        'users',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('is_active = true')
+    )
+    op.create_index(
+        'ix_users_superuser',
+        'users',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('is_superuser = true')
+    )
+    # Busca por email de usuários ativos (get_by_email com active_only)
+    op.create_index(
+        'ix_users_email_active',
+        'users',
+        ['email'],
+        unique=True,
+        postgresql_where=sa.text('is_active = true')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_users_email_active', table_name='users')
+    op.drop_index('ix_users_superuser', table_name='users')
+    op.drop_index('ix_users_active', table_name='users')
@@ -0,0 +1,63 @@
+"""Add lowercase item name column to historical prices
+
+Revision ID: 0012_historical_prices_item_name_lc
+Revises: 0011_users_partial_indexes
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012_historical_prices_item_name_lc'
+down_revision = '0011_users_partial_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Coluna gerada com o nome em minúsculas; a busca usa LIKE sem o custo do ILIKE
+    op.add_column(
+        'historical_prices',
+        sa.Column(
+            'item_name_lc',
+            sa.Text(),
+            sa.Computed('lower(item_name)', persisted=True)
+        )
+    )
+    
+    # Busca por substring ('%termo%') usa o índice de trigramas
+    op.create_index(
+        'ix_historical_prices_item_name_lc_trgm',
+        'historical_prices',
+        ['item_name_lc'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'item_name_lc': 'gin_trgm_ops'}
+    )
+    # Termos curtos viram busca por prefixo ('termo%'), atendida por B-tree
+    op.create_index(
+        'ix_historical_prices_item_name_lc_prefix',
+        'historical_prices',
+        ['item_name_lc'],
+        unique=False,
+        postgresql_ops={'item_name_lc': 'text_pattern_ops'}
+    )
+    
+    # O índice de trigramas sobre item_name não é mais usado pelas consultas
+    op.drop_index('ix_historical_prices_item_name_trgm', table_name='historical_prices')
+
+
+def downgrade():
+    op.create_index(
+        'ix_historical_prices_item_name_trgm',
+        'historical_prices',
+        ['item_name'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'item_name': 'gin_trgm_ops'}
+    )
+    op.drop_index('ix_historical_prices_item_name_lc_prefix', table_name='historical_prices')
+    op.drop_index('ix_historical_prices_item_name_lc_trgm', table_name='historical_prices')
+    op.drop_column('historical_prices', 'item_name_lc')
@@ -0,0 +1,92 @@
+"""Add trigger-maintained item totals to quotations
+
+Revision ID: 0013_quotation_cached_totals
+Revises: 0012_historical_prices_item_name_lc
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013_quotation_cached_totals'
+down_revision = '0012_historical_prices_item_name_lc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'quotations',
+        sa.Column('cached_total_cost', sa.Float(), nullable=False, server_default='0')
+    )
+    op.add_column(
+        'quotations',
+        sa.Column('cached_total_price', sa.Float(), nullable=False, server_default='0')
+    )
+    
+    # Recalcula os totais de uma cotação com a mesma fórmula de
+    # QuotationItem.total_price (desconto aplicado antes do imposto)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION refresh_quotation_totals(target_id integer) RETURNS void AS $$
+        BEGIN
+            UPDATE quotations q
+            SET cached_total_cost = t.total_cost,
+                cached_total_price = t.total_price
+            FROM (
+                SELECT
+                    COALESCE(SUM(unit_cost * quantity), 0) AS total_cost,
+                    COALESCE(SUM(
+                        unit_price * quantity
+                        * (1 - discount_percentage / 100)
+                        * (1 + tax_percentage / 100)
+                    ), 0) AS total_price
+                FROM quotation_items
+                WHERE quotation_id = target_id
+            ) t
+            WHERE q.id = target_id;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    
+    # Preenche as cotações existentes
+    op.execute("SELECT refresh_quotation_totals(id) FROM quotations")
+    
+    # Vale também para INSERT/UPDATE/DELETE feitos em Core, fora dos eventos do ORM
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sync_quotation_totals() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM refresh_quotation_totals(OLD.quotation_id);
+            END IF;
+            IF TG_OP = 'INSERT'
+               OR (TG_OP = 'UPDATE' AND NEW.quotation_id <> OLD.quotation_id) THEN
+                PERFORM refresh_quotation_totals(NEW.quotation_id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_quotation_items_sync_totals
+        AFTER INSERT OR UPDATE OR DELETE ON quotation_items
+        FOR EACH ROW EXECUTE FUNCTION sync_quotation_totals()
+    """)
+    
+    # Ordenação da listagem por valor sem agregar os itens
+    op.create_index(
+        'ix_quotations_cached_total_price',
+        'quotations',
+        ['cached_total_price'],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_quotations_cached_total_price', table_name='quotations')
+    op.execute("DROP TRIGGER IF EXISTS trg_quotation_items_sync_totals ON quotation_items")
+    op.execute("DROP FUNCTION IF EXISTS sync_quotation_totals()")
+    op.execute("DROP FUNCTION IF EXISTS refresh_quotation_totals(integer)")
+    op.drop_column('quotations', 'cached_total_price')
+    op.drop_column('quotations', 'cached_total_cost')
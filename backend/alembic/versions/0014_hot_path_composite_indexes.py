@@ -0,0 +1,40 @@
+"""Add composite indexes for message and price history lookups
+
+Revision ID: 0014_hot_path_composite_indexes
+Revises: 0013_quotation_cached_totals
+Create Date: 2026-10-16 16:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0014_hot_path_composite_indexes'
+down_revision = '0013_quotation_cached_totals'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Mensagens de uma conversa em ordem decrescente de data: busca por faixa,
+    # sem ordenação; também atende o DISTINCT ON da última mensagem
+    op.create_index(
+        'ix_messages_conversation_created',
+        'messages',
+        ['conversation_id', sa.text('created_at DESC')],
+        unique=False
+    )
+    
+    # Histórico de preços por SKU em ordem de data (sugestão de preço)
+    op.create_index(
+        'ix_historical_prices_sku_date',
+        'historical_prices',
+        ['item_sku', sa.text('date_recorded DESC')],
+        unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_historical_prices_sku_date', table_name='historical_prices')
+    op.drop_index('ix_messages_conversation_created', table_name='messages')
@@ -0,0 +1,61 @@
+"""Convert quotation JSON columns to JSONB
+
+Revision ID: 0015_json_columns_to_jsonb
+Revises: 0014_hot_path_composite_indexes
+Create Date: 2026-10-16 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0015_json_columns_to_jsonb'
+down_revision = '0014_hot_path_composite_indexes'
+branch_labels = None
+depends_on = None
+
+
+JSON_COLUMNS = [
+    ('quotations', 'risk_factors'),
+    ('quotation_items', 'price_suggestion_data'),
+    ('risk_factors', 'parameters'),
+    ('quotation_history', 'details'),
+]
+
+
+def upgrade():
+    # JSONB guarda a árvore já interpretada: leitura sem novo parse e
+    # suporte a índice GIN
+    for table_name, column_name in JSON_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            type_=postgresql.JSONB(),
+            existing_type=sa.JSON(),
+            existing_nullable=True,
+            postgresql_using=f'{column_name}::jsonb'
+        )
+    
+    op.create_index(
+        'ix_quotations_risk_factors',
+        'quotations',
+        ['risk_factors'],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_quotations_risk_factors', table_name='quotations')
+    
+    for table_name, column_name in JSON_COLUMNS:
+        op.alter_column(
+            table_name,
+            column_name,
+            type_=sa.JSON(),
+            existing_type=postgresql.JSONB(),
+            existing_nullable=True,
+            postgresql_using=f'{column_name}::json'
+        )
@@ -0,0 +1,83 @@
+"""Store enum columns as VARCHAR with CHECK constraints
+
+Revision ID: 0016_enum_columns_to_varchar
+Revises: 0015_json_columns_to_jsonb
+Create Date: 2026-10-16 17:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0016_enum_columns_to_varchar'
+down_revision = '0015_json_columns_to_jsonb'
+branch_labels = None
+depends_on = None
+
+
+# (tabela, coluna, tipo ENUM nativo, valores, server_default)
+ENUM_COLUMNS = [
+    ('quotations', 'status', 'quotation_status',
+     ('draft', 'submitted', 'approved', 'rejected', 'awarded', 'lost'), None),
+    ('quotations', 'risk_level', 'risk_level',
+     ('low', 'medium', 'high', 'critical'), None),
+    ('quotation_items', 'price_source', 'price_source',
+     ('historical', 'market', 'manual', 'ai_suggested'), None),
+    ('users', 'role', 'role',
+     ('admin', 'manager', 'staff', 'user'), 'user'),
+    ('users', 'auth_provider', 'provider',
+     ('local', 'google', 'microsoft', 'github'), 'local'),
+]
+
+
+def _values_sql(values):
+    return ", ".join(f"'{value}'" for value in values)
+
+
+def upgrade():
+    # VARCHAR + CHECK no lugar do ENUM nativo: comparação de texto simples,
+    # índice parcial trivial e novos valores sem ALTER TYPE
+    for table_name, column_name, type_name, values, default in ENUM_COLUMNS:
+        if default is not None:
+            op.alter_column(table_name, column_name, server_default=None)
+        op.alter_column(
+            table_name,
+            column_name,
+            type_=sa.String(length=20),
+            postgresql_using=f'{column_name}::text'
+        )
+        if default is not None:
+            op.alter_column(table_name, column_name, server_default=default)
+        # Mesmo nome que o Enum(create_constraint=True) do modelo gera
+        op.create_check_constraint(
+            type_name,
+            table_name,
+            f"{column_name} IN ({_values_sql(values)})"
+        )
+        op.execute(f"DROP TYPE IF EXISTS {type_name}")
+    
+    # Só as cotações em andamento são filtradas com frequência
+    op.create_index(
+        'ix_quotations_status_active',
+        'quotations',
+        ['status'],
+        unique=False,
+        postgresql_where=sa.text("status IN ('submitted', 'approved')")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_quotations_status_active', table_name='quotations')
+    
+    for table_name, column_name, type_name, values, default in reversed(ENUM_COLUMNS):
+        op.drop_constraint(type_name, table_name, type_='check')
+        op.execute(f"CREATE TYPE {type_name} AS ENUM ({_values_sql(values)})")
+        if default is not None:
+            op.alter_column(table_name, column_name, server_default=None)
+        op.execute(
+            f"ALTER TABLE {table_name} ALTER COLUMN {column_name} "
+            f"TYPE {type_name} USING {column_name}::{type_name}"
+        )
+        if default is not None:
+            op.alter_column(table_name, column_name, server_default=default)
@@ -0,0 +1,49 @@
+"""Add user + status composite indexes on quotations
+
+Revision ID: 0017_quotations_user_status_indexes
+Revises: 0016_enum_columns_to_varchar
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0017_quotations_user_status_indexes'
+down_revision = '0016_enum_columns_to_varchar'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Listagens "minhas cotações": filtro por usuário + status em um único
+    # índice, em vez de combinar dois índices (BitmapAnd) e ordenar depois.
+    # INCLUDE traz título e nível de risco sem ler a tabela
+    op.create_index(
+        'ix_quotations_customer_status_created',
+        'quotations',
+        ['customer_id', 'status', sa.text('created_at DESC')],
+        unique=False,
+        postgresql_include=['title', 'risk_level']
+    )
+    op.create_index(
+        'ix_quotations_assigned_status',
+        'quotations',
+        ['assigned_to_id', 'status'],
+        unique=False,
+        postgresql_include=['title', 'risk_level']
+    )
+    op.create_index(
+        'ix_quotations_created_by_status',
+        'quotations',
+        ['created_by_id', 'status'],
+        unique=False,
+        postgresql_include=['title', 'risk_level']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_quotations_created_by_status', table_name='quotations')
+    op.drop_index('ix_quotations_assigned_status', table_name='quotations')
+    op.drop_index('ix_quotations_customer_status_created', table_name='quotations')
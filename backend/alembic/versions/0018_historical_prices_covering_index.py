@@ -0,0 +1,39 @@
+"""Make the historical prices SKU index covering
+
+Revision ID: 0018_historical_prices_covering_index
+Revises: 0017_quotations_user_status_indexes
+Create Date: 2026-10-16 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0018_historical_prices_covering_index'
+down_revision = '0017_quotations_user_status_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Mesma ordem da consulta (date_recorded DESC, id DESC) e, via INCLUDE, as
+    # colunas que a sugestão de preço lê e filtra: index-only scan por SKU
+    op.drop_index('ix_historical_prices_sku_date', table_name='historical_prices')
+    op.create_index(
+        'ix_historical_prices_sku_date',
+        'historical_prices',
+        ['item_sku', sa.text('date_recorded DESC'), sa.text('id DESC')],
+        unique=False,
+        postgresql_include=['unit_price', 'region', 'customer_type']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_historical_prices_sku_date', table_name='historical_prices')
+    op.create_index(
+        'ix_historical_prices_sku_date',
+        'historical_prices',
+        ['item_sku', sa.text('date_recorded DESC')],
+        unique=False
+    )
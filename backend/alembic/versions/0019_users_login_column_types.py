@@ -0,0 +1,52 @@
+"""Narrow users login tracking column types
+
+Revision ID: 0019_users_login_column_types
+Revises: 0018_historical_prices_covering_index
+Create Date: 2026-10-16 18:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0019_users_login_column_types'
+down_revision = '0018_historical_prices_covering_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Contador de tentativas falhas cabe em 2 bytes
+    op.alter_column(
+        'users', 'failed_login_attempts',
+        existing_type=sa.Integer(),
+        type_=sa.SmallInteger(),
+        existing_nullable=False,
+        existing_server_default=sa.text('0')
+    )
+    # last_login era gravado como texto ISO 8601; converte para timestamp nativo
+    op.alter_column(
+        'users', 'last_login',
+        existing_type=sa.String(length=255),
+        type_=sa.DateTime(),
+        existing_nullable=True,
+        postgresql_using='last_login::timestamp'
+    )
+
+
+def downgrade():
+    op.alter_column(
+        'users', 'last_login',
+        existing_type=sa.DateTime(),
+        type_=sa.String(length=255),
+        existing_nullable=True,
+        postgresql_using="to_char(last_login, 'YYYY-MM-DD\"T\"HH24:MI:SS.US')"
+    )
+    op.alter_column(
+        'users', 'failed_login_attempts',
+        existing_type=sa.SmallInteger(),
+        type_=sa.Integer(),
+        existing_nullable=False,
+        existing_server_default=sa.text('0')
+    )
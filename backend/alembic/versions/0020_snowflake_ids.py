@@ -0,0 +1,84 @@
+"""Time-ordered snowflake BIGINT ids on write-heavy tables
+
+Revision ID: 0020_snowflake_ids
+Revises: 0019_users_login_column_types
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0020_snowflake_ids'
+down_revision = '0019_users_login_column_types'
+branch_labels = None
+depends_on = None
+
+
+# Mesma época de app.models.base.SNOWFLAKE_EPOCH_MS (2024-01-01T00:00:00Z)
+SNOWFLAKE_EPOCH_MS = 1704067200000
+
+# Tabelas cujo id passa a ser snowflake
+SNOWFLAKE_TABLES = ['messages', 'quotation_history', 'historical_prices']
+
+# (tabela, coluna) que referenciam messages.id
+MESSAGE_ID_REFERENCES = [
+    ('message_attachments', 'message_id'),
+    ('read_receipts', 'message_id'),
+]
+
+
+def upgrade():
+    op.execute('CREATE SEQUENCE IF NOT EXISTS snowflake_id_seq')
+    # (ms desde a época << 12) | (shard de 2 bits << 10) | sequência de 10 bits:
+    # crescente no tempo, sem uma sequência exclusiva disputada por tabela.
+    # 41 + 2 + 10 = 53 bits, abaixo de 2^53: o navegador lê o id do JSON sem
+    # arredondar (Number.MAX_SAFE_INTEGER)
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION next_snowflake_id(shard integer DEFAULT 0)
+        RETURNS bigint AS $$
+            SELECT ((floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint
+                     - {SNOWFLAKE_EPOCH_MS}) << 12)
+                 | ((shard & 3)::bigint << 10)
+                 | (nextval('snowflake_id_seq') & 1023)
+        $$ LANGUAGE sql VOLATILE
+    """)
+
+    for table in SNOWFLAKE_TABLES:
+        op.alter_column(
+            table, 'id',
+            existing_type=sa.Integer(),
+            type_=sa.BigInteger(),
+            server_default=sa.text('next_snowflake_id()'),
+            existing_nullable=False
+        )
+        # IDs antigos (pequenos) continuam válidos e abaixo dos novos
+        op.execute(f'DROP SEQUENCE IF EXISTS {table}_id_seq')
+
+    for table, column in MESSAGE_ID_REFERENCES:
+        op.alter_column(
+            table, column,
+            existing_type=sa.Integer(),
+            type_=sa.BigInteger(),
+            existing_nullable=False
+        )
+
+
+def downgrade():
+    # Snowflakes não cabem em INTEGER: as colunas continuam BIGINT e voltam a
+    # usar uma sequência própria, iniciada após o maior id existente
+    for table in reversed(SNOWFLAKE_TABLES):
+        op.execute(f'CREATE SEQUENCE {table}_id_seq AS bigint OWNED BY {table}.id')
+        op.execute(
+            f"SELECT setval('{table}_id_seq', COALESCE((SELECT max(id) FROM {table}), 0) + 1, false)"
+        )
+        op.alter_column(
+            table, 'id',
+            existing_type=sa.BigInteger(),
+            server_default=sa.text(f"nextval('{table}_id_seq'::regclass)"),
+            existing_nullable=False
+        )
+
+    op.execute('DROP FUNCTION IF EXISTS next_snowflake_id(integer)')
+    op.execute('DROP SEQUENCE IF EXISTS snowflake_id_seq')
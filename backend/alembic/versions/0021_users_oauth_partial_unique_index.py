@@ -0,0 +1,39 @@
+"""Make the OAuth lookup index partial and unique
+
+Revision ID: 0021_users_oauth_partial_unique_index
+Revises: 0020_snowflake_ids
+Create Date: 2026-10-16 19:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0021_users_oauth_partial_unique_index'
+down_revision = '0020_snowflake_ids'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Só usuários OAuth entram no índice (os LOCAL têm oauth_id nulo), o que o
+    # mantém pequeno; UNIQUE impede duas contas para a mesma identidade externa
+    op.create_index(
+        'ix_users_oauth',
+        'users',
+        ['auth_provider', 'oauth_id'],
+        unique=True,
+        postgresql_where=sa.text('oauth_id IS NOT NULL')
+    )
+    op.drop_index('ix_users_auth_provider_oauth_id', table_name='users')
+
+
+def downgrade():
+    op.create_index(
+        'ix_users_auth_provider_oauth_id',
+        'users',
+        ['auth_provider', 'oauth_id'],
+        unique=False
+    )
+    op.drop_index('ix_users_oauth', table_name='users')
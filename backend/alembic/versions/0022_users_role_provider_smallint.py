@@ -0,0 +1,69 @@
+"""Store users role and auth_provider as SMALLINT codes
+
+Revision ID: 0022_users_role_provider_smallint
+Revises: 0021_users_oauth_partial_unique_index
+Create Date: 2026-10-16 19:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0022_users_role_provider_smallint'
+down_revision = '0021_users_oauth_partial_unique_index'
+branch_labels = None
+depends_on = None
+
+
+# (coluna, nome do CHECK, {valor: código}, valor padrão); mesmos códigos de
+# ROLE_CODES/PROVIDER_CODES em app.models.user
+CODED_COLUMNS = [
+    ('role', 'role',
+     {'admin': 1, 'manager': 2, 'staff': 3, 'user': 4}, 'user'),
+    ('auth_provider', 'provider',
+     {'local': 1, 'google': 2, 'microsoft': 3, 'github': 4}, 'local'),
+]
+
+
+def _case_sql(column_name, mapping):
+    whens = " ".join(f"WHEN {source!r} THEN {target!r}" for source, target in mapping.items())
+    return f"CASE {column_name} {whens} END"
+
+
+def upgrade():
+    # Comparados a cada requisição autenticada: 2 bytes e igualdade de inteiros
+    for column_name, check_name, codes, default in CODED_COLUMNS:
+        op.drop_constraint(check_name, 'users', type_='check')
+        op.alter_column('users', column_name, server_default=None)
+        op.alter_column(
+            'users',
+            column_name,
+            type_=sa.SmallInteger(),
+            postgresql_using=_case_sql(column_name, codes)
+        )
+        op.alter_column('users', column_name, server_default=str(codes[default]))
+        op.create_check_constraint(
+            check_name,
+            'users',
+            f"{column_name} IN ({', '.join(str(code) for code in codes.values())})"
+        )
+
+
+def downgrade():
+    for column_name, check_name, codes, default in reversed(CODED_COLUMNS):
+        values = {code: value for value, code in codes.items()}
+        op.drop_constraint(check_name, 'users', type_='check')
+        op.alter_column('users', column_name, server_default=None)
+        op.alter_column(
+            'users',
+            column_name,
+            type_=sa.String(length=20),
+            postgresql_using=_case_sql(column_name, values)
+        )
+        op.alter_column('users', column_name, server_default=default)
+        op.create_check_constraint(
+            check_name,
+            'users',
+            f"{column_name} IN ({', '.join(repr(value) for value in codes)})"
+        )
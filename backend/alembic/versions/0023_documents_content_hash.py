@@ -0,0 +1,49 @@
+"""Rename documents.md5_hash to content_hash and record hash_algo
+
+Revision ID: 0023_documents_content_hash
+Revises: 0022_users_role_provider_smallint
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0023_documents_content_hash'
+down_revision = '0022_users_role_provider_smallint'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Novos documentos usam BLAKE2b-256 (64 hex); os existentes mantêm o MD5
+    op.alter_column(
+        'documents', 'md5_hash',
+        new_column_name='content_hash',
+        existing_type=sa.String(length=32),
+        type_=sa.String(length=64),
+        existing_nullable=False
+    )
+    op.add_column(
+        'documents',
+        sa.Column('hash_algo', sa.String(length=16), nullable=False, server_default='md5')
+    )
+    # O default do banco só serve para preencher as linhas antigas
+    op.alter_column('documents', 'hash_algo', server_default=None)
+    op.create_index('ix_documents_hash', 'documents', ['hash_algo', 'content_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_documents_hash', table_name='documents')
+    # Hashes BLAKE2b não cabem em VARCHAR(32) nem são MD5: só os documentos
+    # com hash MD5 voltam para md5_hash, os demais ficam com um valor vazio
+    op.execute("UPDATE documents SET content_hash = '' WHERE hash_algo <> 'md5'")
+    op.drop_column('documents', 'hash_algo')
+    op.alter_column(
+        'documents', 'content_hash',
+        new_column_name='md5_hash',
+        existing_type=sa.String(length=64),
+        type_=sa.String(length=32),
+        existing_nullable=False
+    )
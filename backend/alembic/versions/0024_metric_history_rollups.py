@@ -0,0 +1,72 @@
+"""Create and backfill metric_history_rollups
+
+Revision ID: 0024_metric_history_rollups
+Revises: 0023_documents_content_hash
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0024_metric_history_rollups'
+down_revision = '0023_documents_content_hash'
+branch_labels = None
+depends_on = None
+
+
+# Mesmas granularidades de app.services.metric_aggregator.ROLLUP_GRANULARITIES
+ROLLUP_GRANULARITIES = ['hour', 'day', 'week']
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # As tabelas de métricas vêm do create_all; num banco sem elas o próprio
+    # create_all cria a de rollups (vazia, como o histórico)
+    if not inspector.has_table('metrics'):
+        return
+
+    if not inspector.has_table('metric_history_rollups'):
+        op.create_table(
+            'metric_history_rollups',
+            sa.Column('metric_id', sa.Integer(), nullable=False),
+            sa.Column('granularity', sa.String(length=10), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('value_count', sa.Integer(), nullable=False),
+            sa.Column('value_sum', sa.Float(), nullable=False),
+            sa.Column('value_sum_sq', sa.Float(), nullable=False),
+            sa.Column('value_min', sa.Float(), nullable=True),
+            sa.Column('value_max', sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(['metric_id'], ['metrics.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('metric_id', 'granularity', 'bucket_start')
+        )
+
+    if not inspector.has_table('metric_history'):
+        return
+
+    # Carga inicial a partir do histórico bruto (como MetricHistoryAggregator.rebuild):
+    # sem ela os dashboards, que só leem os rollups, mostrariam o histórico vazio.
+    # Substitui em vez de somar, então pode rodar depois de o app já ter gravado rollups
+    for granularity in ROLLUP_GRANULARITIES:
+        op.execute(f"""
+            INSERT INTO metric_history_rollups (
+                metric_id, granularity, bucket_start, value_count,
+                value_sum, value_sum_sq, value_min, value_max
+            )
+            SELECT metric_id, '{granularity}', date_trunc('{granularity}', timestamp),
+                   count(value), sum(value), sum(value * value), min(value), max(value)
+            FROM metric_history
+            WHERE value IS NOT NULL
+            GROUP BY metric_id, date_trunc('{granularity}', timestamp)
+            ON CONFLICT (metric_id, granularity, bucket_start) DO UPDATE SET
+                value_count = EXCLUDED.value_count,
+                value_sum = EXCLUDED.value_sum,
+                value_sum_sq = EXCLUDED.value_sum_sq,
+                value_min = EXCLUDED.value_min,
+                value_max = EXCLUDED.value_max
+        """)
+
+
+def downgrade():
+    op.execute('DROP TABLE IF EXISTS metric_history_rollups')
@@ -3,7 +3,7 @@ Rotas para autenticação e gerenciamento de usuários.
 """
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import pyotp
 import qrcode
 import io
@@ -22,7 +22,7 @@ from app.core.auth import (
     require_role, require_permission, require_2fa, decode_token
 )
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import get_async_session
 from app.db.repositories.user import user_repository, permission_repository
 from app.models.user import User, Role, Provider, Permission
 from app.services.security import (
@@ -46,13 +46,13 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 async def register(
     user_in: UserRegistration,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Registra um novo usuário no sistema.
     """
     # Verifica se o email já está em uso
-    db_user = user_repository.get_by_email(db, email=user_in.email)
+    db_user = await user_repository.get_by_email(db, email=user_in.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -60,7 +60,7 @@ async def register(
         )
     
     # Verifica se o username já está em uso
-    db_user = user_repository.get_by_username(db, username=user_in.username)
+    db_user = await user_repository.get_by_username(db, username=user_in.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -82,7 +82,7 @@ async def register(
     user_data["auth_provider"] = Provider.LOCAL
     
     # Cria o usuário no banco de dados
-    user = user_repository.create_user(
+    user = await user_repository.create_user(
         db=db, 
         user_data=user_data, 
         plain_password=user_in.password
@@ -106,13 +106,13 @@ async def register(
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Autentica um usuário e retorna os tokens de acesso e refresh.
     """
     # Autentica o usuário
-    user = user_repository.authenticate(db, email=form_data.username, password=form_data.password)
+    user = await user_repository.authenticate(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -128,7 +128,7 @@ async def login(
         )
     
     # Atualiza o último login
-    user_repository.update_last_login(db, user)
+    await user_repository.update_last_login(db, user)
     
     # Gera os tokens
     tokens = generate_tokens(user)
@@ -147,7 +147,7 @@ async def login(
 async def verify_two_factor(
     totp_data: TwoFactorVerify,
     token: str = Depends(OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_PREFIX}/auth/login")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Verifica o código 2FA (TOTP) e retorna novo token com flag de verificação 2FA.
@@ -157,7 +157,7 @@ async def verify_two_factor(
     user_id = payload.get("sub")
     
     # Obtém o usuário
-    user = user_repository.get(db, id=int(user_id))
+    user = await user_repository.get(db, id=int(user_id))
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -202,7 +202,7 @@ async def verify_two_factor(
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
     refresh_data: RefreshToken,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Renova o token de acesso usando o token de refresh.
@@ -226,7 +226,7 @@ async def refresh_token(
             )
         
         # Obtém o usuário
-        user = user_repository.get(db, id=int(user_id))
+        user = await user_repository.get(db, id=int(user_id))
         if not user or not user.is_active:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -263,14 +263,14 @@ async def logout(
 
 @router.post("/setup-2fa", response_model=TwoFactorSetup)
 async def setup_two_factor(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Configura a autenticação de dois fatores (2FA) para o usuário.
     """
     # Habilita 2FA para o usuário
-    result = user_repository.enable_2fa(db, current_user)
+    result = await user_repository.enable_2fa(db, current_user)
     totp_secret = result["totp_secret"]
     
     # Gera QR code para configuração do Google Authenticator
@@ -301,7 +301,7 @@ async def setup_two_factor(
 @router.post("/disable-2fa")
 async def disable_two_factor(
     totp_data: TwoFactorVerify,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -322,7 +322,7 @@ async def disable_two_factor(
         )
     
     # Desativa 2FA
-    user_repository.disable_2fa(db, current_user)
+    await user_repository.disable_2fa(db, current_user)
     
     return {"detail": "2FA disabled successfully"}
 
@@ -331,13 +331,13 @@ async def disable_two_factor(
 async def request_password_reset(
     email: str,
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Inicia o processo de redefinição de senha.
     """
-    # Busca o usuário pelo email
-    user = user_repository.get_by_email(db, email=email)
+    # Busca o usuário pelo email (usuários inativos não podem redefinir a senha)
+    user = await user_repository.get_by_email(db, email=email, active_only=True)
     
     # Mesmo que o usuário não exista, não revelamos isso por segurança
     if user:
@@ -360,7 +360,7 @@ async def request_password_reset(
 @router.post("/password-reset", response_model=UserResponse)
 async def reset_password(
     reset_data: PasswordReset,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Redefine a senha do usuário usando o token de redefinição.
@@ -384,7 +384,7 @@ async def reset_password(
             )
         
         # Obtém o usuário
-        user = user_repository.get(db, id=int(user_id))
+        user = await user_repository.get(db, id=int(user_id))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -400,7 +400,7 @@ async def reset_password(
             )
         
         # Atualiza a senha
-        user = user_repository.update_password(db, user, reset_data.new_password)
+        user = await user_repository.update_password(db, user, reset_data.new_password)
         
         return user
         
@@ -414,7 +414,7 @@ async def reset_password(
 @router.post("/verify-email")
 async def verify_email(
     token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Verifica o email do usuário usando o token de verificação.
@@ -438,7 +438,7 @@ async def verify_email(
             )
         
         # Obtém o usuário
-        user = user_repository.get(db, id=int(user_id))
+        user = await user_repository.get(db, id=int(user_id))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -446,7 +446,7 @@ async def verify_email(
             )
         
         # Marca o email como verificado
-        user = user_repository.verify_email(db, user)
+        user = await user_repository.verify_email(db, user)
         
         return {"detail": "Email verified successfully"}
         
@@ -461,7 +461,7 @@ async def verify_email(
 async def oauth_login(
     provider: str,
     oauth_data: OAuthRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ):
     """
     Autentica o usuário via OAuth 2.0.
@@ -480,15 +480,15 @@ async def oauth_login(
     
     # Verifica se o usuário já existe pelo OAuth ID
     oauth_provider = getattr(Provider, provider.upper())
-    user = user_repository.get_by_oauth_id(db, provider=oauth_provider, oauth_id=user_info["id"])
+    user = await user_repository.get_by_oauth_id(db, provider=oauth_provider, oauth_id=user_info["id"])
     
     if not user:
         # Verifica se existe usuário com mesmo email
-        user = user_repository.get_by_email(db, email=user_info["email"])
+        user = await user_repository.get_by_email(db, email=user_info["email"])
         
         if user:
             # Associa a conta OAuth ao usuário existente
-            user = user_repository.update(db, db_obj=user, obj_in={
+            user = await user_repository.update(db, db_obj=user, obj_in={
                 "auth_provider": oauth_provider,
                 "oauth_id": user_info["id"]
             })
@@ -499,7 +499,7 @@ async def oauth_login(
             # Garante que o username é único
             base_username = username
             counter = 1
-            while user_repository.get_by_username(db, username=username):
+            while await user_repository.get_by_username(db, username=username):
                 username = f"{base_username}{counter}"
                 counter += 1
             
@@ -514,10 +514,10 @@ async def oauth_login(
                 "hashed_password": get_password_hash(secrets.token_urlsafe(16))  # Senha aleatória que não será usada
             }
             
-            user = user_repository.create(db, obj_in=user_data)
+            user = await user_repository.create(db, obj_in=user_data)
     
     # Atualiza o último login
-    user_repository.update_last_login(db, user)
+    await user_repository.update_last_login(db, user)
     
     # Gera os tokens
     tokens = generate_tokens(user)
@@ -538,7 +538,7 @@ async def read_users_me(
 @router.put("/me", response_model=UserResponse)
 async def update_user_me(
     user_in: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -546,7 +546,7 @@ async def update_user_me(
     """
     # Verifica se o email já está em uso
     if user_in.email and user_in.email != current_user.email:
-        db_user = user_repository.get_by_email(db, email=user_in.email)
+        db_user = await user_repository.get_by_email(db, email=user_in.email)
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -555,7 +555,7 @@ async def update_user_me(
     
     # Verifica se o username já está em uso
     if user_in.username and user_in.username != current_user.username:
-        db_user = user_repository.get_by_username(db, username=user_in.username)
+        db_user = await user_repository.get_by_username(db, username=user_in.username)
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -572,7 +572,7 @@ async def update_user_me(
         del user_data["is_active"]
     
     # Atualiza o usuário
-    user = user_repository.update(db, db_obj=current_user, obj_in=user_data)
+    user = await user_repository.update(db, db_obj=current_user, obj_in=user_data)
     
     return user
 
@@ -580,7 +580,7 @@ async def update_user_me(
 @router.post("/me/change-password")
 async def change_password(
     password_data: PasswordChange,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -602,7 +602,7 @@ async def change_password(
         )
     
     # Atualiza a senha
-    user_repository.update_password(db, current_user, password_data.new_password)
+    await user_repository.update_password(db, current_user, password_data.new_password)
     
     return {"detail": "Password updated successfully"}
 
@@ -612,14 +612,14 @@ async def change_password(
 async def read_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Retorna a lista de usuários (apenas para administradores).
     """
-    users = user_repository.get_multi(db, skip=skip, limit=limit)
-    total = user_repository.count(db)
+    users = await user_repository.get_multi(db, skip=skip, limit=limit)
+    total = await user_repository.count(db)
     
     return {
         "total": total,
@@ -630,13 +630,13 @@ async def read_users(
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def read_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Retorna as informações de um usuário específico (apenas para administradores).
     """
-    user = user_repository.get(db, id=user_id)
+    user = await user_repository.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -649,14 +649,14 @@ async def read_user(
 @router.post("/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     user_in: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Cria um novo usuário (apenas para administradores).
     """
     # Verifica se o email já está em uso
-    db_user = user_repository.get_by_email(db, email=user_in.email)
+    db_user = await user_repository.get_by_email(db, email=user_in.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -664,7 +664,7 @@ async def create_user(
         )
     
     # Verifica se o username já está em uso
-    db_user = user_repository.get_by_username(db, username=user_in.username)
+    db_user = await user_repository.get_by_username(db, username=user_in.username)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -687,7 +687,7 @@ async def create_user(
     user_data["auth_provider"] = getattr(Provider, user_in.auth_provider.name)
     
     # Cria o usuário
-    user = user_repository.create_user(
+    user = await user_repository.create_user(
         db=db,
         user_data=user_data,
         plain_password=user_in.password
@@ -700,13 +700,13 @@ async def create_user(
 async def update_user(
     user_id: int,
     user_in: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Atualiza as informações de um usuário (apenas para administradores).
     """
-    user = user_repository.get(db, id=user_id)
+    user = await user_repository.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -715,7 +715,7 @@ async def update_user(
     
     # Verifica se o email já está em uso
     if user_in.email and user_in.email != user.email:
-        db_user = user_repository.get_by_email(db, email=user_in.email)
+        db_user = await user_repository.get_by_email(db, email=user_in.email)
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -724,7 +724,7 @@ async def update_user(
     
     # Verifica se o username já está em uso
     if user_in.username and user_in.username != user.username:
-        db_user = user_repository.get_by_username(db, username=user_in.username)
+        db_user = await user_repository.get_by_username(db, username=user_in.username)
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -739,7 +739,7 @@ async def update_user(
         user_data["role"] = getattr(Role, user_in.role.name)
     
     # Atualiza o usuário
-    updated_user = user_repository.update(db, db_obj=user, obj_in=user_data)
+    updated_user = await user_repository.update(db, db_obj=user, obj_in=user_data)
     
     return updated_user
 
@@ -747,13 +747,13 @@ async def update_user(
 @router.delete("/users/{user_id}", response_model=UserResponse)
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Remove um usuário (apenas para administradores).
     """
-    user = user_repository.get(db, id=user_id)
+    user = await user_repository.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -768,7 +768,7 @@ async def delete_user(
         )
     
     # Remove o usuário
-    user = user_repository.delete(db, id=user_id)
+    user = await user_repository.delete(db, id=user_id)
     
     return user
 
@@ -776,13 +776,13 @@ async def delete_user(
 # Gerenciamento de permissões
 @router.get("/permissions", response_model=List[PermissionSchema])
 async def read_permissions(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Retorna todas as permissões disponíveis (apenas para administradores).
     """
-    permissions = permission_repository.get_multi(db)
+    permissions = await permission_repository.get_multi(db)
     return permissions
 
 
@@ -790,13 +790,13 @@ async def read_permissions(
 async def add_user_permission(
     user_id: int,
     permission_name: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Adiciona uma permissão a um usuário (apenas para administradores).
     """
-    user = user_repository.get(db, id=user_id)
+    user = await user_repository.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -804,10 +804,10 @@ async def add_user_permission(
         )
     
     # Obtém ou cria a permissão
-    permission = permission_repository.create_if_not_exists(db, name=permission_name)
+    permission = await permission_repository.create_if_not_exists(db, name=permission_name)
     
     # Adiciona a permissão ao usuário
-    user = user_repository.add_permission(db, user, permission)
+    user = await user_repository.add_permission(db, user, permission)
     
     return user
 
@@ -816,13 +816,13 @@ async def add_user_permission(
 async def remove_user_permission(
     user_id: int,
     permission_name: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_role(Role.ADMIN))
 ):
     """
     Remove uma permissão de um usuário (apenas para administradores).
     """
-    user = user_repository.get(db, id=user_id)
+    user = await user_repository.get(db, id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -830,7 +830,7 @@ async def remove_user_permission(
         )
     
     # Obtém a permissão
-    permission = permission_repository.get_by_name(db, name=permission_name)
+    permission = await permission_repository.get_by_name(db, name=permission_name)
     if not permission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -838,6 +838,6 @@ async def remove_user_permission(
         )
     
     # Remove a permissão do usuário
-    user = user_repository.remove_permission(db, user, permission)
+    user = await user_repository.remove_permission(db, user, permission)
     
     return user
@@ -18,6 +18,7 @@ from app.api.schemas.dashboard import (
     MetricCreate,
     MetricUpdate,
     MetricValueUpdate,
+    MetricSampleBatch,
     MetricHistoryResponse,
     MetricAggregationRequest,
     MetricAggregationResponse,
@@ -92,7 +93,7 @@ async def create_metric(
         is_realtime=metric.is_realtime,
         threshold_warning=metric.threshold_warning,
         threshold_critical=metric.threshold_critical,
-        metadata=metric.metadata,
+        meta=metric.metadata,
         category=metric.category,
         user_id=metric.user_id or current_user.id,
     )
@@ -146,6 +147,8 @@ async def update_metric(
     
     # Atualiza apenas os campos fornecidos
     update_data = metric_update.dict(exclude_unset=True)
+    if "metadata" in update_data:
+        update_data["meta"] = update_data.pop("metadata")
     for key, value in update_data.items():
         setattr(metric, key, value)
     
@@ -191,6 +194,27 @@ async def update_metric_value(
         )
 
 
+@router.post("/metrics/values/bulk", status_code=status.HTTP_201_CREATED)
+async def record_metric_values(
+    batch: MetricSampleBatch,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Registra um lote de valores de métricas de uma só vez.
+    Indicado para ingestão em tempo real; as condições de alerta são
+    verificadas uma vez para o lote inteiro.
+    """
+    metrics_service = await get_metrics_service(db)
+    
+    recorded = await metrics_service.record_metric_values(
+        [sample.dict() for sample in batch.samples]
+    )
+    await db.commit()
+    
+    return {"recorded": recorded}
+
+
 @router.get("/metrics/{metric_id}/history", response_model=MetricHistoryResponse)
 async def get_metric_history(
     metric_id: int = Path(..., ge=1),
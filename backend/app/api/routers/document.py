@@ -10,9 +10,10 @@ from redis.asyncio import Redis
 
 from app.core.config import settings
 from app.db.session import get_async_session
-from app.db.redis import get_redis_client
+from app.db.redis import get_async_redis_client
 from app.api.deps import get_current_user
 from app.models.user import User
+from app.models.document import DOCUMENT_HASH_ALGO
 from app.db.repositories.document_repos import (
     document_repository, 
     document_tag_repository, 
@@ -41,7 +42,7 @@ async def upload_document(
     options: str = Form(...),  # JSON serializado das opções (DocumentUpload)
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_session),
-    redis: Redis = Depends(get_redis_client)
+    redis: Redis = Depends(get_async_redis_client)
 ):
     """
     Faz upload de um documento e inicia seu processamento.
@@ -97,7 +98,8 @@ async def upload_document(
             "file_size": file_size,
             "mime_type": file.content_type or "application/octet-stream",
             "extension": file_extension,
-            "md5_hash": "temp",  # Será atualizado após o upload
+            "content_hash": "temp",  # Será atualizado após o upload
+            "hash_algo": DOCUMENT_HASH_ALGO,
             "uploaded_by_id": current_user.id,
             "processed": False,
             "processing_error": False,
@@ -106,13 +108,13 @@ async def upload_document(
         # Cria o documento no banco
         document = await document_repository.create_document(db, document_data)
         
-        # Salva o arquivo e obtém o hash MD5 e caminho
-        file_path, md5_hash, file_size = await DocumentStorageService.save_file(
+        # Salva o arquivo e obtém o hash BLAKE2b e caminho
+        file_path, content_hash, file_size = await DocumentStorageService.save_file(
             file, current_user.id, document.id
         )
         
         # Verifica se já existe um documento com esse hash
-        existing_document = await document_repository.get_document_by_hash(db, md5_hash)
+        existing_document = await document_repository.get_document_by_hash(db, content_hash)
         
         if existing_document and existing_document.id != document.id:
             # Remove o arquivo que foi salvo
@@ -132,7 +134,7 @@ async def upload_document(
             document.id,
             {
                 "file_path": file_path,
-                "md5_hash": md5_hash,
+                "content_hash": content_hash,
                 "filename": os.path.basename(file_path)
             }
         )
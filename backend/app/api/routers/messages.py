@@ -189,18 +189,19 @@ async def create_message(
     
     # Process attachments if provided
     if files:
+        attachments = []
         for file in files:
             if file.filename:  # Skip empty file inputs
-                attachment_data = attachment_service.save_attachment(
+                attachment_data = await attachment_service.save_attachment(
                     file, conversation_id, message.id
                 )
-                repository.add_attachment(
-                    message_id=message.id,
-                    file_name=attachment_data["file_name"],
-                    file_type=attachment_data["file_type"],
-                    file_size=attachment_data["file_size"],
-                    file_path=attachment_data["file_path"]
-                )
+                attachments.append({
+                    "file_name": attachment_data["file_name"],
+                    "file_type": attachment_data["file_type"],
+                    "file_size": attachment_data["file_size"],
+                    "file_path": attachment_data["file_path"]
+                })
+        repository.add_attachments(message.id, attachments)
     
     # Send notifications
     message_service = MessageService(db)
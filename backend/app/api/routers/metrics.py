@@ -12,7 +12,7 @@ from app.db.session import get_async_session
 from app.models.user import User
 from app.models.metric import MetricType, AggregationType, TimeGranularity
 from app.services.metrics import MetricsService
-from app.services.alerts import AlertService
+from app.services.alerts import ALERTS_CACHE_TAG, AlertService
 from app.services.cache import cached, get_cache_service
 from app.services.advanced_cache import advanced_cached, get_advanced_cache_service
 from app.api.schemas.dashboard import (
@@ -381,7 +381,7 @@ async def metrics_time_comparison(
 
 
 @router.get("/alerts/summary", response_model=AlertSummaryResponse)
-@cached(key_prefix="alerts_summary", ttl_seconds=300)
+@cached(key_prefix="alerts_summary", ttl_seconds=300, tags=(ALERTS_CACHE_TAG,))
 async def get_alerts_summary(
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
@@ -391,29 +391,8 @@ async def get_alerts_summary(
     """
     alert_service = AlertService(db)
     
-    # Obtém todos os alertas
-    all_alerts = await alert_service.get_alerts()
-    
-    # Filtra alertas por diferentes critérios
-    active_alerts = [a for a in all_alerts if a.is_active]
-    critical_alerts = [a for a in active_alerts if a.severity == "critical"]
-    warning_alerts = [a for a in active_alerts if a.severity == "warning"]
-    acknowledged_alerts = [a for a in active_alerts if a.is_acknowledged]
-    unacknowledged_alerts = [a for a in active_alerts if not a.is_acknowledged]
-    
-    # Alertas nas últimas 24 horas
-    one_day_ago = datetime.utcnow() - timedelta(days=1)
-    recent_alerts = [a for a in all_alerts if a.created_at >= one_day_ago]
-    
-    return {
-        "total_active": len(active_alerts),
-        "critical": len(critical_alerts),
-        "warning": len(warning_alerts),
-        "acknowledged": len(acknowledged_alerts),
-        "unacknowledged": len(unacknowledged_alerts),
-        "recent_24h": len(recent_alerts),
-        "timestamp": datetime.utcnow().isoformat()
-    }
+    # Contagens agregadas no banco, sem carregar os alertas
+    return await alert_service.get_alert_summary()
 
 
 @router.get("/realtime", response_model=Dict[str, Any])
@@ -436,8 +415,8 @@ async def get_realtime_metrics(
     # Filtra apenas as marcadas como realtime
     realtime_metrics = [m for m in realtime_metrics if m.is_realtime]
     
-    # Obtém alertas ativos
-    active_alerts = await alert_service.get_alerts(is_active=True)
+    # Obtém alertas ativos (só as colunas, sem objetos ORM)
+    active_alerts = await alert_service.get_alert_rows(is_active=True)
     
     # Formata os resultados
     result = {
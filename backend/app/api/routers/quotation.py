@@ -3,7 +3,7 @@ API routes for quotation and risk analysis.
 """
 from datetime import datetime
 from typing import List, Optional, Any, Dict
-from fastapi import APIRouter, Depends, HTTPException, Body, Query, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Path, Response, status
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -15,7 +15,8 @@ from app.models.quotation import QuotationStatus
 from app.db.repositories.quotation import (
     quotation_repository, quotation_item_repository,
     quotation_tag_repository, historical_price_repository,
-    risk_factor_repository, quotation_history_repository
+    risk_factor_repository, quotation_history_repository,
+    decode_cursor, encode_cursor, next_cursor
 )
 
 from app.services.quotation import (
@@ -56,6 +57,22 @@ from app.api.schemas.quotation import (
 
 router = APIRouter(prefix="/quotations", tags=["quotations"])
 
+# Response header carrying the keyset cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _parse_cursor(cursor: Optional[str]):
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _set_next_cursor(response: Response, rows: List[Any], limit: int, sort_attr: str) -> None:
+    token = encode_cursor(next_cursor(rows, limit, sort_attr))
+    if token:
+        response.headers[NEXT_CURSOR_HEADER] = token
+
 
 # Quotation CRUD endpoints
 @router.post("", response_model=QuotationDetail, status_code=status.HTTP_201_CREATED)
@@ -90,7 +107,8 @@ async def create_quotation(
             db_session=db,
             quotation_id=quotation.id,
             include_items=True,
-            include_tags=True
+            include_tags=True,
+            include_users=True
         )
     except Exception as e:
         raise HTTPException(
@@ -101,13 +119,16 @@ async def create_quotation(
 
 @router.get("", response_model=List[Quotation])
 async def get_quotations(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     customer_id: Optional[int] = None,
     created_by_id: Optional[int] = None,
     assigned_to_id: Optional[int] = None,
     status: Optional[List[str]] = Query(None),
     tag_ids: Optional[List[int]] = Query(None),
+    match_all_tags: bool = False,
     search: Optional[str] = None,
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
@@ -116,23 +137,32 @@ async def get_quotations(
 ):
     """
     Get all quotations with filters.
+
+    Prefer ``cursor`` (taken from the ``X-Next-Cursor`` header of the previous
+    page) over ``skip``; offset pagination slows down on deep pages.
     """
     quotations, _ = await quotation_repository.get_quotations(
         db_session=db,
         skip=skip,
         limit=limit,
+        cursor=_parse_cursor(cursor),
         customer_id=customer_id,
         created_by_id=created_by_id,
         assigned_to_id=assigned_to_id,
         status=status,
         tag_ids=tag_ids,
+        match_all_tags=match_all_tags,
         search_term=search,
         from_date=from_date,
         to_date=to_date,
-        include_items=False,
-        include_tags=True
+        include_tags=True,
+        include_users=True,
+        # The list response carries no total, so skip counting altogether
+        with_count=False
     )
     
+    _set_next_cursor(response, quotations, limit, "created_at")
+    # Items are not loaded: totals come from the trigger-maintained columns
     return quotations
 
 
@@ -149,7 +179,8 @@ async def get_quotation(
         db_session=db,
         quotation_id=quotation_id,
         include_items=True,
-        include_tags=True
+        include_tags=True,
+        include_users=True
     )
     
     if not quotation:
@@ -206,7 +237,8 @@ async def update_quotation(
             db_session=db,
             quotation_id=quotation_id,
             include_items=True,
-            include_tags=True
+            include_tags=True,
+            include_users=True
         )
     except Exception as e:
         raise HTTPException(
@@ -278,14 +310,21 @@ async def update_quotation_status(
     
     # Update quotation
     try:
-        updated_quotation = await quotation_repository.update_quotation(
+        await quotation_repository.update_quotation(
             db_session=db,
             quotation_id=quotation_id,
             update_data=update_data,
             user_id=current_user.id
         )
         
-        return updated_quotation
+        # Get complete updated quotation
+        return await quotation_repository.get_quotation_by_id(
+            db_session=db,
+            quotation_id=quotation_id,
+            include_items=True,
+            include_tags=True,
+            include_users=True
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -529,6 +568,7 @@ async def create_historical_price(
 
 @router.get("/historical-prices", response_model=List[HistoricalPrice])
 async def get_historical_prices(
+    response: Response,
     item_name: Optional[str] = None,
     item_sku: Optional[str] = None,
     source: Optional[str] = None,
@@ -537,6 +577,7 @@ async def get_historical_prices(
     from_date: Optional[datetime] = None,
     to_date: Optional[datetime] = None,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_session)
 ):
@@ -552,9 +593,11 @@ async def get_historical_prices(
         region=region,
         from_date=from_date,
         to_date=to_date,
-        limit=limit
+        limit=limit,
+        cursor=_parse_cursor(cursor)
     )
     
+    _set_next_cursor(response, prices, limit, "date_recorded")
     return prices
 
 
@@ -591,7 +634,10 @@ async def get_risk_factors(
 # Quotation history endpoints
 @router.get("/{quotation_id}/history", response_model=List[QuotationHistoryEntry])
 async def get_quotation_history(
+    response: Response,
     quotation_id: int = Path(..., title="Quotation ID"),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_async_session)
 ):
@@ -613,9 +659,13 @@ async def get_quotation_history(
     # Get history entries
     history = await quotation_history_repository.get_history_by_quotation(
         db_session=db,
-        quotation_id=quotation_id
+        quotation_id=quotation_id,
+        limit=limit,
+        cursor=_parse_cursor(cursor)
     )
     
+    if limit:
+        _set_next_cursor(response, history, limit, "timestamp")
     return history
 
 
@@ -168,7 +168,7 @@ class UserResponse(BaseModel):
     is_superuser: bool
     role: RoleEnum
     auth_provider: ProviderEnum
-    last_login: Optional[str] = None
+    last_login: Optional[datetime] = None
     has_2fa: bool
     created_at: datetime
     updated_at: datetime
@@ -4,7 +4,7 @@ Schemas de dados para APIs de dashboard e métricas.
 from datetime import datetime
 from enum import Enum
 from typing import List, Dict, Any, Optional, Union
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 
 
 class MetricTypeEnum(str, Enum):
@@ -62,17 +62,21 @@ class WidgetTypeEnum(str, Enum):
 
 class MetricBase(BaseModel):
     """Schema base para criação/atualização de métricas."""
-    name: str
-    description: Optional[str] = None
+    # Limites iguais aos tamanhos das colunas (String(n)) do modelo
+    name: str = Field(..., max_length=120)
+    description: Optional[str] = Field(None, max_length=255)
     type: MetricTypeEnum
     value: Optional[float] = None
-    value_text: Optional[str] = None
-    unit: Optional[str] = None
+    value_text: Optional[str] = Field(None, max_length=255)
+    unit: Optional[str] = Field(None, max_length=16)
     is_realtime: bool = False
     threshold_warning: Optional[float] = None
     threshold_critical: Optional[float] = None
-    metadata: Optional[Dict[str, Any]] = None
-    category: Optional[str] = None
+    # No modelo o atributo é Metric.meta (coluna "metadata")
+    metadata: Optional[Dict[str, Any]] = Field(
+        None, validation_alias=AliasChoices("meta", "metadata")
+    )
+    category: Optional[str] = Field(None, max_length=24)
     user_id: Optional[int] = None
 
 
@@ -83,27 +87,41 @@ class MetricCreate(MetricBase):
 
 class MetricUpdate(BaseModel):
     """Schema para atualização parcial de uma métrica."""
-    name: Optional[str] = None
-    description: Optional[str] = None
+    name: Optional[str] = Field(None, max_length=120)
+    description: Optional[str] = Field(None, max_length=255)
     type: Optional[MetricTypeEnum] = None
     value: Optional[float] = None
-    value_text: Optional[str] = None
-    unit: Optional[str] = None
+    value_text: Optional[str] = Field(None, max_length=255)
+    unit: Optional[str] = Field(None, max_length=16)
     is_realtime: Optional[bool] = None
     threshold_warning: Optional[float] = None
     threshold_critical: Optional[float] = None
     metadata: Optional[Dict[str, Any]] = None
-    category: Optional[str] = None
+    category: Optional[str] = Field(None, max_length=24)
 
 
 class MetricValueUpdate(BaseModel):
     """Schema para atualização apenas do valor de uma métrica."""
     value: Optional[float] = None
-    value_text: Optional[str] = None
+    value_text: Optional[str] = Field(None, max_length=255)
     metadata: Optional[Dict[str, Any]] = None
     check_alerts: bool = True
 
 
+class MetricSample(BaseModel):
+    """Amostra de valor de uma métrica para ingestão em lote."""
+    metric_id: int
+    value: Optional[float] = None
+    value_text: Optional[str] = Field(None, max_length=255)
+    metadata: Optional[Dict[str, Any]] = None
+    timestamp: Optional[datetime] = None
+
+
+class MetricSampleBatch(BaseModel):
+    """Lote de amostras de métricas."""
+    samples: List[MetricSample]
+
+
 class MetricResponse(MetricBase):
     """Schema para resposta com dados de uma métrica."""
     id: int
@@ -240,7 +258,7 @@ class WidgetBase(BaseModel):
     """Schema base para widgets de dashboard."""
     metric_id: Optional[int] = None
     widget_type: WidgetTypeEnum
-    title: str
+    title: str = Field(..., max_length=120)
     config: Optional[WidgetConfig] = None
     position_x: Optional[int] = None
     position_y: Optional[int] = None
@@ -257,7 +275,7 @@ class WidgetUpdate(BaseModel):
     """Schema para atualização de um widget."""
     metric_id: Optional[int] = None
     widget_type: Optional[WidgetTypeEnum] = None
-    title: Optional[str] = None
+    title: Optional[str] = Field(None, max_length=120)
     config: Optional[WidgetConfig] = None
     position_x: Optional[int] = None
     position_y: Optional[int] = None
@@ -277,8 +295,8 @@ class WidgetResponse(WidgetBase):
 
 class DashboardBase(BaseModel):
     """Schema base para dashboards."""
-    name: str
-    description: Optional[str] = None
+    name: str = Field(..., max_length=120)
+    description: Optional[str] = Field(None, max_length=255)
     layout: Optional[Dict[str, Any]] = None
     is_default: bool = False
     user_id: Optional[int] = None
@@ -291,8 +309,8 @@ class DashboardCreate(DashboardBase):
 
 class DashboardUpdate(BaseModel):
     """Schema para atualização de um dashboard."""
-    name: Optional[str] = None
-    description: Optional[str] = None
+    name: Optional[str] = Field(None, max_length=120)
+    description: Optional[str] = Field(None, max_length=255)
     layout: Optional[Dict[str, Any]] = None
     is_default: Optional[bool] = None
 
@@ -61,7 +61,8 @@ class DocumentCreate(DocumentBase):
     file_size: int
     mime_type: str
     extension: str
-    md5_hash: str
+    content_hash: str
+    hash_algo: str
     uploaded_by_id: int
 
 
@@ -5,10 +5,10 @@ from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Dict, Any, Union
 from datetime import datetime, timedelta
 import time
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.session import get_db
+from app.db.session import get_async_session
 from app.db.repositories.user import user_repository
 from app.models.user import User, Role, Permission
 from app.services.security import has_role, has_permission, verify_totp
@@ -121,9 +121,9 @@ def decode_token(token: str) -> Dict[str, Any]:
         )
 
 
-def get_user_from_token(token_data: TokenData, db: Session) -> User:
+async def get_user_from_token(token_data: TokenData, db: AsyncSession) -> User:
     """Obtém o usuário a partir dos dados do token."""
-    user = user_repository.get(db, id=int(token_data.user_id))
+    user = await user_repository.get(db, id=int(token_data.user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -133,7 +133,7 @@ def get_user_from_token(token_data: TokenData, db: Session) -> User:
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_session)
 ) -> User:
     """Verifica o token JWT e retorna o usuário atual."""
     credentials_exception = HTTPException(
@@ -157,7 +157,7 @@ async def get_current_user(
         raise credentials_exception
     
     # Obtém o usuário do banco de dados
-    user = get_user_from_token(token_data, db)
+    user = await get_user_from_token(token_data, db)
     return user
 
 
@@ -2,6 +2,7 @@
 Configuração do Celery para processamento assíncrono de tarefas.
 """
 from celery import Celery
+from celery.schedules import crontab
 from app.core.config import settings
 
 celery_app = Celery(
@@ -9,7 +10,8 @@ celery_app = Celery(
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
     include=[
-        "app.tasks.document_processing"
+        "app.tasks.document_processing",
+        "app.tasks.maintenance"
     ]
 )
 
@@ -24,6 +26,13 @@ celery_app.conf.update(
     task_time_limit=3600,  # 1 hora de timeout para tarefas
     worker_max_memory_per_child=200000,  # 200MB por worker
     worker_prefetch_multiplier=1,  # Reduz multiplex para tarefas pesadas de processamento
+    beat_schedule={
+        # Diária e idempotente: as partições do mês seguinte existem bem antes da virada
+        "ensure-metric-history-partitions": {
+            "task": "ensure_metric_history_partitions",
+            "schedule": crontab(hour=3, minute=0),
+        },
+    },
 )
 
 # Exporta o app para ser importado em outros módulos
@@ -1,5 +1,6 @@
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import FrozenSet, List, Optional
 import secrets
 import os
 
@@ -10,9 +11,12 @@ class Settings(BaseSettings):
     # Core settings
     PROJECT_NAME: str = "CotAi API"
     DEBUG: bool = False
+    ENABLE_TELEMETRY: bool = True  # Logs de rate limiting e header X-Process-Time
     SECRET_KEY: str = secrets.token_urlsafe(32)
     API_V1_PREFIX: str = "/api/v1"
-    BACKEND_CORS_ORIGINS: List[str] = ["*"]
+    BACKEND_CORS_ORIGINS: FrozenSet[str] = frozenset({"*"})
+    # Só ative atrás de um proxy reverso que sobrescreva o X-Forwarded-For
+    RATE_LIMIT_TRUST_PROXY: bool = False
     
     # Database settings
     POSTGRES_USER: str
@@ -20,6 +24,9 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str
     POSTGRES_PORT: str
+    # Agrupa buscas de usuário por email concorrentes em uma única consulta
+    USER_EMAIL_BATCHING: bool = False
+    USER_EMAIL_BATCH_WINDOW_MS: int = 5
     
     # MongoDB settings
     MONGO_INITDB_ROOT_USERNAME: str
@@ -93,6 +100,15 @@ class Settings(BaseSettings):
     PASSWORD_REQUIRE_DIGITS: bool = True
     PASSWORD_REQUIRE_SPECIAL: bool = True
     
+    @field_validator("BACKEND_CORS_ORIGINS")
+    @classmethod
+    def normalize_cors_origins(cls, origins: FrozenSet[str]) -> FrozenSet[str]:
+        """
+        Normaliza as origens (sem barra final) num frozenset: o CORSMiddleware
+        testa `origin in allow_origins` a cada requisição, em O(1) num set.
+        """
+        return frozenset(str(origin).rstrip("/") for origin in origins)
+    
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         """Constrói a URI de conexão ao PostgreSQL."""
@@ -0,0 +1,116 @@
+"""
+Manutenção de partições mensais (PARTITION BY RANGE) no PostgreSQL.
+"""
+import logging
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Partições criadas à frente do mês corrente
+DEFAULT_MONTHS_AHEAD = 2
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def monthly_partition_name(table_name: str, month: date) -> str:
+    """Nome da partição de um mês, ex.: metric_history_y2026m10."""
+    return f"{table_name}_y{month.year:04d}m{month.month:02d}"
+
+
+def _create_monthly_partition(
+    connection: Connection,
+    table_name: str,
+    partition_column: str,
+    name: str,
+    month: date
+) -> None:
+    """
+    Cria a partição de um mês. Se a DEFAULT já tem linhas desse mês, o
+    Postgres recusa o CREATE ... PARTITION OF; nesse caso a DEFAULT é
+    desanexada, as linhas do mês passam para a partição nova e a DEFAULT
+    volta a ser anexada, tudo na mesma transação (o DETACH bloqueia os
+    inserts na tabela até o commit).
+    """
+    month_start = month.isoformat()
+    month_end = _add_months(month, 1).isoformat()
+    default_name = f"{table_name}_default"
+    create = (
+        f"CREATE TABLE {name} PARTITION OF {table_name} "
+        f"FOR VALUES FROM ('{month_start}') TO ('{month_end}')"
+    )
+    in_month = (
+        f'"{partition_column}" >= \'{month_start}\' '
+        f'AND "{partition_column}" < \'{month_end}\''
+    )
+
+    has_rows = connection.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {default_name} WHERE {in_month})"
+    )).scalar()
+    if not has_rows:
+        connection.execute(text(create))
+        return
+
+    connection.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {default_name}"))
+    connection.execute(text(create))
+    connection.execute(text(
+        f"WITH moved AS (DELETE FROM {default_name} WHERE {in_month} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    connection.execute(text(f"ALTER TABLE {table_name} ATTACH PARTITION {default_name} DEFAULT"))
+    logger.info(f"Linhas de {month_start} movidas de {default_name} para {name}")
+
+
+def ensure_monthly_partitions(
+    connection: Connection,
+    table_name: str,
+    months_ahead: int = DEFAULT_MONTHS_AHEAD,
+    start: Optional[date] = None,
+    partition_column: str = "timestamp"
+) -> List[str]:
+    """
+    Cria (se não existirem) a partição DEFAULT e as partições mensais do mês
+    de start (padrão: mês corrente) até months_ahead meses depois.
+
+    A partição DEFAULT recebe linhas fora dos meses criados, para que um
+    insert nunca falhe por falta de partição; consultas por intervalo de
+    tempo leem só as partições dos meses pedidos. Linhas que já estejam na
+    DEFAULT são movidas para a partição do seu mês quando ela é criada.
+
+    Cada mês é criado em um savepoint próprio: uma falha é registrada no log
+    e não impede os demais meses.
+
+    Returns:
+        Nomes das partições mensais garantidas
+    """
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {table_name}_default "
+        f"PARTITION OF {table_name} DEFAULT"
+    ))
+
+    first = (start or datetime.utcnow().date()).replace(day=1)
+    names = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(first, offset)
+        name = monthly_partition_name(table_name, month)
+        exists = connection.execute(
+            text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+        ).scalar()
+        if not exists:
+            try:
+                with connection.begin_nested():
+                    _create_monthly_partition(
+                        connection, table_name, partition_column, name, month
+                    )
+            except SQLAlchemyError:
+                logger.exception(f"Falha ao criar a partição {name}")
+                continue
+        names.append(name)
+    return names
@@ -2,36 +2,63 @@
 Inicializa a conexão com o Redis.
 """
 import redis
+import redis.asyncio
 from app.core.config import settings
 
+# Tamanho máximo de cada pool de conexões (por processo)
+REDIS_MAX_CONNECTIONS = 64
+
+_connection_kwargs = dict(
+    host=settings.REDIS_HOST,
+    port=int(settings.REDIS_PORT),
+    password=settings.REDIS_PASSWORD,
+    decode_responses=True,  # Decodifica automaticamente para string
+    socket_timeout=5,
+    socket_connect_timeout=5,
+    socket_keepalive=True,
+    max_connections=REDIS_MAX_CONNECTIONS,
+)
+
+# Pools globais: as conexões TCP são abertas sob demanda e reaproveitadas
+# entre requisições, sem novo handshake a cada uso
+_pool = redis.ConnectionPool(**_connection_kwargs)
+_async_pool = redis.asyncio.ConnectionPool(**_connection_kwargs)
+
 # Cliente Redis global
 _redis_client = None
 
 
 def get_redis_client() -> redis.Redis:
     """
-    Retorna uma instância de cliente Redis.
-    Reutiliza a conexão global se já existir.
+    Retorna uma instância de cliente Redis síncrono.
+    Reutiliza o cliente global, ligado ao pool de conexões.
     """
     global _redis_client
-    
+
     if _redis_client is None:
-        _redis_client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=int(settings.REDIS_PORT),
-            password=settings.REDIS_PASSWORD,
-            decode_responses=True,  # Decodifica automaticamente para string
-            socket_timeout=5,
-            socket_connect_timeout=5,
-        )
-    
+        _redis_client = redis.Redis(connection_pool=_pool)
+
     return _redis_client
 
 
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """
+    Retorna um cliente Redis assíncrono sobre o pool global.
+    O cliente em si é leve; as conexões vêm do pool compartilhado.
+    """
+    return redis.asyncio.Redis(connection_pool=_async_pool)
+
+
 def close_redis_connection():
     """Fecha a conexão com o Redis."""
     global _redis_client
-    
+
     if _redis_client is not None:
         _redis_client.close()
         _redis_client = None
+    _pool.disconnect()
+
+
+async def close_async_redis_pool():
+    """Fecha as conexões do pool assíncrono."""
+    await _async_pool.disconnect()
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.db.repositories import BaseRepository
-from app.models.document import Document, DocumentTag, ExtractedField, ProcessingJob
+from app.models.document import DOCUMENT_HASH_ALGO, Document, DocumentTag, ExtractedField, ProcessingJob
 
 
 class DocumentRepository(BaseRepository[Document]):
@@ -54,12 +54,16 @@ class DocumentRepository(BaseRepository[Document]):
     async def get_document_by_hash(
         self, 
         db_session: AsyncSession, 
-        md5_hash: str
+        content_hash: str,
+        hash_algo: str = DOCUMENT_HASH_ALGO
     ) -> Optional[Document]:
         """
-        Busca um documento pelo hash MD5, útil para evitar duplicatas.
+        Busca um documento pelo hash do conteúdo, útil para evitar duplicatas.
         """
-        query = select(Document).where(Document.md5_hash == md5_hash)
+        query = select(Document).where(
+            Document.hash_algo == hash_algo,
+            Document.content_hash == content_hash
+        )
         result = await db_session.execute(query)
         return result.scalar_one_or_none()
     
@@ -1,12 +1,29 @@
 from datetime import datetime
 from typing import List, Optional, Tuple, Dict, Any
 
-from sqlalchemy import desc, func
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import desc, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, joinedload, raiseload, selectinload
 
 from app.models.message import Conversation, Message, ReadReceipt, MessageAttachment
 from app.models.user import User
 
+# Receipts written per INSERT statement when marking many messages as read
+READ_RECEIPT_BATCH_SIZE = 500
+
+
+def message_loaders():
+    """
+    Loader options for everything the Message schema serializes.
+    Collections use selectinload so LIMIT/OFFSET apply to messages, not to
+    the joined rows.
+    """
+    return (
+        joinedload(Message.sender),
+        selectinload(Message.attachments),
+        selectinload(Message.read_receipts).joinedload(ReadReceipt.user),
+    )
+
 
 class MessageRepository:
     def __init__(self, db: Session):
@@ -44,32 +61,38 @@ class MessageRepository:
         ).first()
 
     def get_conversations_for_user(self, user_id: int, skip: int = 0, limit: int = 20) -> List[Conversation]:
-        # This query gets conversations with their last message
-        subquery = self.db.query(
-            Message.conversation_id,
-            func.max(Message.created_at).label('max_date')
-        ).group_by(Message.conversation_id).subquery('t')
-
+        # raiseload("*") turns any relationship the response would lazy-load
+        # into an error instead of one extra query per conversation
         conversations = self.db.query(Conversation).join(
             Conversation.members
         ).filter(
             User.id == user_id
         ).options(
-            joinedload(Conversation.members),
-            joinedload(Conversation.created_by)
+            selectinload(Conversation.members),
+            joinedload(Conversation.created_by),
+            raiseload("*")
         ).order_by(
             desc(Conversation.updated_at)
         ).offset(skip).limit(limit).all()
-        
-        # Get the last message for each conversation
+
+        if not conversations:
+            return conversations
+
+        # Get the last message of every conversation in a single query
+        # (DISTINCT ON keeps the first row per conversation_id)
+        last_messages = self.db.query(Message).filter(
+            Message.conversation_id.in_([conversation.id for conversation in conversations])
+        ).options(
+            *message_loaders(),
+            raiseload("*")
+        ).order_by(
+            Message.conversation_id,
+            desc(Message.created_at)
+        ).distinct(Message.conversation_id).all()
+
+        last_by_conversation = {message.conversation_id: message for message in last_messages}
         for conversation in conversations:
-            last_message = self.db.query(Message).filter(
-                Message.conversation_id == conversation.id
-            ).order_by(
-                desc(Message.created_at)
-            ).first()
-            
-            conversation.last_message = last_message
+            conversation.last_message = last_by_conversation.get(conversation.id)
 
         return conversations
     
@@ -122,18 +145,15 @@ class MessageRepository:
         return self.db.query(Message).filter(
             Message.id == message_id
         ).options(
-            joinedload(Message.sender),
-            joinedload(Message.attachments),
-            joinedload(Message.read_receipts).joinedload(ReadReceipt.user)
+            *message_loaders()
         ).first()
 
     def get_messages(self, conversation_id: int, skip: int = 0, limit: int = 50) -> List[Message]:
         return self.db.query(Message).filter(
             Message.conversation_id == conversation_id
         ).options(
-            joinedload(Message.sender),
-            joinedload(Message.attachments),
-            joinedload(Message.read_receipts).joinedload(ReadReceipt.user)
+            *message_loaders(),
+            raiseload("*")
         ).order_by(
             desc(Message.created_at)
         ).offset(skip).limit(limit).all()
@@ -162,6 +182,20 @@ class MessageRepository:
         self.db.refresh(attachment)
         return attachment
 
+    def add_attachments(self, message_id: int, attachments: List[Dict[str, Any]]) -> None:
+        """
+        Saves all attachments of a message with a single executemany INSERT.
+        Each dict carries file_name, file_type, file_size and file_path.
+        """
+        if not attachments:
+            return
+
+        self.db.execute(
+            insert(MessageAttachment),
+            [{**attachment, "message_id": message_id} for attachment in attachments]
+        )
+        self.db.commit()
+
     def get_attachment(self, attachment_id: int) -> Optional[MessageAttachment]:
         return self.db.query(MessageAttachment).filter(
             MessageAttachment.id == attachment_id
@@ -169,33 +203,30 @@ class MessageRepository:
     
     # Read receipt methods
     def mark_as_read(self, user_id: int, message_ids: List[int]) -> List[ReadReceipt]:
+        """
+        Create the missing read receipts and return only the new ones.
+
+        Deduplication is left to the (message_id, user_id) unique constraint:
+        ON CONFLICT DO NOTHING skips receipts that already exist, in the same
+        statement and without racing a concurrent request.
+        """
+        read_at = datetime.utcnow()
+        rows = [
+            {"user_id": user_id, "message_id": message_id, "read_at": read_at}
+            for message_id in set(message_ids)
+        ]
+        if not rows:
+            return []
+
         receipts = []
-        
-        # Check for existing read receipts
-        existing_receipts = self.db.query(ReadReceipt).filter(
-            ReadReceipt.user_id == user_id, 
-            ReadReceipt.message_id.in_(message_ids)
-        ).all()
-        
-        existing_message_ids = [receipt.message_id for receipt in existing_receipts]
-        
-        # Create new read receipts for messages that haven't been marked as read
-        for message_id in message_ids:
-            if message_id not in existing_message_ids:
-                receipt = ReadReceipt(
-                    user_id=user_id,
-                    message_id=message_id,
-                    read_at=datetime.utcnow()
-                )
-                self.db.add(receipt)
-                receipts.append(receipt)
-        
+        for start in range(0, len(rows), READ_RECEIPT_BATCH_SIZE):
+            stmt = pg_insert(ReadReceipt).values(
+                rows[start:start + READ_RECEIPT_BATCH_SIZE]
+            ).on_conflict_do_nothing(
+                index_elements=[ReadReceipt.message_id, ReadReceipt.user_id]
+            ).returning(ReadReceipt)
+            receipts.extend(self.db.scalars(stmt).all())
         self.db.commit()
-        
-        # Refresh created receipts
-        for receipt in receipts:
-            self.db.refresh(receipt)
-            
         return receipts
 
     def get_unread_count(self, user_id: int, conversation_id: Optional[int] = None) -> int:
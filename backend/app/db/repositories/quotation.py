@@ -1,19 +1,172 @@
 """
 Repository for quotation operations in the database.
+
+Sessions come from AsyncSessionLocal (expire_on_commit=False), so objects
+are returned after commit without a refresh round-trip. Most defaults are
+computed client-side; the exceptions are read back or left to a re-select:
+
+- snowflake ids (history entries, historical prices) are server defaults
+  that come back from the flush's INSERT ... RETURNING;
+- tag_ids_array and cached_total_cost/cached_total_price are maintained by
+  triggers on the link and item tables, so the in-memory values lag behind
+  item and tag writes. Callers that serialize totals or tags re-select with
+  get_quotation_by_id, as the routers do.
 """
+import base64
+import time
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Union, Tuple
-from sqlalchemy import select, update, delete, func, and_, or_
+from typing import AsyncIterator, Dict, List, Optional, Any, Union, Tuple
+from sqlalchemy import select, insert, update, delete, exists, func, inspect, and_, or_, lambda_stmt, literal, text, tuple_
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.orm import aliased, selectinload, joinedload, raiseload
 
 from app.db.repositories import BaseRepository
 from app.models.quotation import (
     Quotation, QuotationItem, QuotationTag, 
-    HistoricalPrice, RiskFactor, QuotationHistoryEntry
+    HistoricalPrice, RiskFactor, QuotationHistoryEntry, quotation_tag
 )
 
 
+# Keyset cursor: (sort timestamp, id) of the last row of the previous page
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(cursor: Optional[Cursor]) -> Optional[str]:
+    """
+    Encodes a keyset cursor as an opaque URL-safe string for API clients.
+    """
+    if cursor is None:
+        return None
+    raw = f"{cursor[0].isoformat()}|{cursor[1]}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Cursor]:
+    """
+    Decodes a cursor produced by encode_cursor. Raises ValueError if malformed.
+    """
+    if not token:
+        return None
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(token.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+
+# Rows fetched per round-trip by the streaming iter_* methods
+STREAM_BATCH_SIZE = 1000
+
+# Columns callers may write through update_quotation; keys and
+# database-maintained columns are left out
+_QUOTATION_COLS = frozenset(c.name for c in Quotation.__table__.columns) - {
+    "id", "created_at", "updated_at", "tag_ids_array"
+}
+_ITEM_COLS = frozenset(c.name for c in QuotationItem.__table__.columns) - {
+    "id", "quotation_id"
+}
+
+
+def search_pattern(term: str) -> str:
+    """
+    Builds the ILIKE substring pattern for a search term.
+
+    Terms of 3+ characters are served by the pg_trgm GIN indexes; shorter ones
+    have no trigram to seek, so Postgres scans, but they still match anywhere
+    in the text.
+    """
+    return f"%{term.strip()}%"
+
+
+# Small, rarely-changing reference tables (tags, risk factors) are cached per
+# process for a short TTL; each worker sees writes from others within the TTL
+REFERENCE_CACHE_TTL = 60.0
+_reference_cache: Dict[str, Tuple[float, List[Any]]] = {}
+
+
+def _get_cached_reference(key: str) -> Optional[List[Any]]:
+    entry = _reference_cache.get(key)
+    if entry and time.monotonic() - entry[0] < REFERENCE_CACHE_TTL:
+        return list(entry[1])
+    return None
+
+
+def _set_cached_reference(key: str, rows: List[Any]) -> None:
+    _reference_cache[key] = (time.monotonic(), list(rows))
+
+
+def invalidate_reference_cache(key: str) -> None:
+    """
+    Drops a cached reference table so the next read goes to the database.
+    """
+    _reference_cache.pop(key, None)
+
+
+def quotation_user_loaders() -> List[Any]:
+    """
+    Loader options for the to-one user relationships; a JOIN on the same
+    query is cheaper than a second SELECT per relationship.
+    """
+    return [
+        joinedload(Quotation.customer),
+        joinedload(Quotation.created_by),
+        joinedload(Quotation.assigned_to),
+    ]
+
+
+def unfiltered_page_stmt(
+    with_total: bool,
+    skip: int,
+    limit: int,
+    cursor: Optional[Cursor] = None,
+    include_tags: bool = False,
+    include_users: bool = False,
+) -> StatementLambdaElement:
+    """
+    Newest-first page of quotations with no filters.
+
+    Built from lambdas so SQLAlchemy caches the statement by code location and
+    only swaps in the cursor, ``skip`` and ``limit`` as bound parameters. Each
+    optional step is its own lambda, so every combination gets its own cache
+    entry.
+    """
+    if with_total:
+        stmt = lambda_stmt(lambda: select(Quotation, func.count().over().label("total_count")))
+    else:
+        stmt = lambda_stmt(lambda: select(Quotation))
+    if include_tags:
+        stmt += lambda s: s.options(selectinload(Quotation.tags))
+    if include_users:
+        stmt += lambda s: s.options(
+            joinedload(Quotation.customer),
+            joinedload(Quotation.created_by),
+            joinedload(Quotation.assigned_to),
+        )
+    stmt += lambda s: s.options(raiseload("*")).order_by(
+        Quotation.created_at.desc(), Quotation.id.desc()
+    )
+    if cursor:
+        cursor_created_at, cursor_id = cursor
+        stmt += lambda s: s.where(
+            tuple_(Quotation.created_at, Quotation.id) < tuple_(cursor_created_at, cursor_id)
+        )
+        stmt += lambda s: s.limit(limit)
+    else:
+        stmt += lambda s: s.offset(skip).limit(limit)
+    return stmt
+
+
+def next_cursor(rows: List[Any], limit: int, sort_attr: str) -> Optional[Cursor]:
+    """
+    Builds the cursor for the page following ``rows``, or None on the last page.
+    """
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return getattr(last, sort_attr), last.id
+
+
 class QuotationRepository(BaseRepository[Quotation]):
     """
     Repository for quotation operations.
@@ -35,18 +188,26 @@ class QuotationRepository(BaseRepository[Quotation]):
         db_session.add(quotation)
         await db_session.flush()  # Flush to get the ID
         
-        # Add items if provided
+        # Add items if provided, as a single multi-row INSERT
         if items_data:
-            for item_data in items_data:
-                item = QuotationItem(**item_data, quotation_id=quotation.id)
-                db_session.add(item)
+            await db_session.execute(
+                insert(QuotationItem).values([
+                    {**item_data, "quotation_id": quotation.id}
+                    for item_data in items_data
+                ])
+            )
         
-        # Add tags if provided
+        # Link tags if provided; INSERT ... SELECT skips unknown tag ids in the
+        # same statement instead of loading the tags first
         if tag_ids:
-            tag_query = select(QuotationTag).where(QuotationTag.id.in_(tag_ids))
-            result = await db_session.execute(tag_query)
-            tags = result.scalars().all()
-            quotation.tags = tags
+            await db_session.execute(
+                insert(quotation_tag).from_select(
+                    ["quotation_id", "tag_id"],
+                    select(literal(quotation.id), QuotationTag.id).where(
+                        QuotationTag.id.in_(tag_ids)
+                    )
+                )
+            )
         
         # Create history entry for creation
         if user_id:
@@ -59,7 +220,6 @@ class QuotationRepository(BaseRepository[Quotation]):
             db_session.add(history_entry)
         
         await db_session.commit()
-        await db_session.refresh(quotation)
         return quotation
     
     async def get_quotation_by_id(
@@ -68,10 +228,14 @@ class QuotationRepository(BaseRepository[Quotation]):
         quotation_id: int, 
         include_items: bool = False,
         include_tags: bool = False,
-        include_history: bool = False
+        include_history: bool = False,
+        include_users: bool = False
     ) -> Optional[Quotation]:
         """
         Gets a quotation by ID with optional relationships.
+
+        Relationships that were not requested raise on access instead of
+        lazy loading.
         """
         query = select(Quotation).where(Quotation.id == quotation_id)
         
@@ -85,6 +249,11 @@ class QuotationRepository(BaseRepository[Quotation]):
         if include_history:
             query = query.options(selectinload(Quotation.history_entries))
         
+        if include_users:
+            query = query.options(*quotation_user_loaders())
+        
+        query = query.options(raiseload("*"))
+        
         result = await db_session.execute(query)
         return result.scalar_one_or_none()
     
@@ -96,7 +265,9 @@ class QuotationRepository(BaseRepository[Quotation]):
         """
         Gets a quotation by its reference ID.
         """
-        query = select(Quotation).where(Quotation.reference_id == reference_id)
+        query = select(Quotation).where(
+            Quotation.reference_id == reference_id
+        ).options(raiseload("*"))
         result = await db_session.execute(query)
         return result.scalar_one_or_none()
     
@@ -113,15 +284,32 @@ class QuotationRepository(BaseRepository[Quotation]):
         search_term: Optional[str] = None,
         from_date: Optional[datetime] = None,
         to_date: Optional[datetime] = None,
+        match_all_tags: bool = False,
         include_items: bool = False,
         include_tags: bool = False,
-    ) -> Tuple[List[Quotation], int]:
+        include_users: bool = False,
+        cursor: Optional[Cursor] = None,
+        exact_count: bool = True,
+        with_count: bool = True,
+    ) -> Tuple[List[Quotation], Optional[int]]:
         """
         Gets quotations with pagination and filtering.
+
+        Pass ``cursor`` (the ``(created_at, id)`` of the last row seen, see
+        ``next_cursor``) for keyset pagination, which costs O(limit) per page.
+        ``skip`` is kept for backward compatibility only: Postgres still has to
+        scan and discard every skipped row, so deep pages get linearly slower.
+
+        The total is computed in the same round-trip as the page with
+        ``COUNT(*) OVER ()``; with a cursor it counts the rows from the cursor
+        onwards. Pages past the end report a total of 0. With
+        ``exact_count=False`` and no filters, the total is the ``pg_class``
+        row estimate instead of an exact count. With ``with_count=False``
+        nothing is counted at all and the total is None.
+
+        ``tag_ids`` matches quotations with any of the tags, or with all of
+        them when ``match_all_tags`` is set.
         """
-        # Base query
-        query = select(Quotation)
-        
         # Apply filters
         filters = []
         if customer_id:
@@ -142,42 +330,90 @@ class QuotationRepository(BaseRepository[Quotation]):
         if to_date:
             filters.append(Quotation.created_at <= to_date)
             
-        if search_term:
+        if search_term and search_term.strip():
+            pattern = search_pattern(search_term)
             search_filter = or_(
-                Quotation.reference_id.ilike(f"%{search_term}%"),
-                Quotation.title.ilike(f"%{search_term}%"),
-                Quotation.description.ilike(f"%{search_term}%")
+                Quotation.reference_id.ilike(pattern),
+                Quotation.title.ilike(pattern),
+                Quotation.description.ilike(pattern)
             )
             filters.append(search_filter)
             
-        # Apply all filters
-        if filters:
-            query = query.where(and_(*filters))
-            
         # Handle tag filtering
         if tag_ids:
-            query = query.join(Quotation.tags).filter(QuotationTag.id.in_(tag_ids)).distinct()
+            if match_all_tags:
+                # All tags present: containment on the trigger-maintained array (GIN)
+                filters.append(Quotation.tag_ids_array.contains(tag_ids))
+            else:
+                # Any tag present: EXISTS on the link table stops at the first
+                # match and keeps one row per quotation, no DISTINCT
+                filters.append(
+                    exists().where(
+                        quotation_tag.c.quotation_id == Quotation.id,
+                        quotation_tag.c.tag_id.in_(tag_ids)
+                    )
+                )
         
-        # Include relationships as requested
-        if include_items:
-            query = query.options(selectinload(Quotation.items))
+        # Without filters an exact total is a full count of the table; callers
+        # that can live with an estimate get the planner's row count instead
+        estimate_total = with_count and not exact_count and not filters
+        window_total = with_count and not estimate_total
         
-        if include_tags:
-            query = query.options(selectinload(Quotation.tags))
+        if not (filters or include_items):
+            # The default listing, as the list endpoint requests it: a cached
+            # lambda statement skips rebuilding and recompiling the same SQL
+            query = unfiltered_page_stmt(
+                window_total, skip, limit, cursor, include_tags, include_users
+            )
+        else:
+            # Base query; the total rides along with the page as a window column
+            if window_total:
+                query = select(Quotation, func.count().over().label("total_count"))
+            else:
+                query = select(Quotation)
             
-        # Count total before pagination
-        count_query = select(func.count()).select_from(query.subquery())
-        total_count = await db_session.execute(count_query)
-        total = total_count.scalar_one()
+            # Apply all filters
+            if filters:
+                query = query.where(and_(*filters))
+        
+            # Include relationships as requested
+            if include_items:
+                query = query.options(selectinload(Quotation.items))
+        
+            if include_tags:
+                query = query.options(selectinload(Quotation.tags))
+        
+            if include_users:
+                query = query.options(*quotation_user_loaders())
+        
+            query = query.options(raiseload("*"))
         
-        # Apply pagination and order
-        query = query.order_by(Quotation.created_at.desc()).offset(skip).limit(limit)
+            # Apply pagination and order
+            query = query.order_by(Quotation.created_at.desc(), Quotation.id.desc())
+            if cursor:
+                query = query.where(tuple_(Quotation.created_at, Quotation.id) < tuple_(*cursor))
+            elif skip:
+                query = query.offset(skip)
+            query = query.limit(limit)
         
         # Execute query
         result = await db_session.execute(query)
-        quotations = result.scalars().all()
         
-        return list(quotations), total
+        if window_total:
+            rows = result.all()
+            quotations = [row[0] for row in rows]
+            total = rows[0].total_count if rows else 0
+        else:
+            quotations = list(result.scalars().all())
+            total = None
+            if estimate_total:
+                estimate = await db_session.execute(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+                    {"table": Quotation.__tablename__}
+                )
+                total = max(estimate.scalar_one_or_none() or 0, len(quotations))
+        
+        return quotations, total
     
     async def update_quotation(
         self,
@@ -192,7 +428,11 @@ class QuotationRepository(BaseRepository[Quotation]):
         Updates a quotation.
         """
         # Get the quotation
-        quotation = await self.get_quotation_by_id(db_session, quotation_id, include_items=True)
+        quotation = await self.get_quotation_by_id(
+            db_session,
+            quotation_id,
+            include_tags=tag_ids is not None
+        )
         if not quotation:
             return None
         
@@ -201,40 +441,63 @@ class QuotationRepository(BaseRepository[Quotation]):
         
         # Update quotation fields
         for field, value in update_data.items():
-            if hasattr(quotation, field):
+            if field in _QUOTATION_COLS:
                 setattr(quotation, field, value)
         
         # Update items if provided
         if items_data is not None:
-            # Keep track of processed items to detect removed ones
+            # Collect the changes in one pass and apply them as bulk statements
+            to_insert = []
+            to_update = []
             processed_item_ids = set()
             
+            # Only the ids of the current items are needed; reuse the collection
+            # if this session already has it, otherwise select just the ids
+            if "items" in inspect(quotation).unloaded:
+                result = await db_session.execute(
+                    select(QuotationItem.id).where(QuotationItem.quotation_id == quotation.id)
+                )
+                existing_item_ids = set(result.scalars())
+            else:
+                existing_item_ids = {item.id for item in quotation.items}
+            
             for item_data in items_data:
                 item_id = item_data.pop("id", None)
                 
                 if item_id:  # Update existing item
-                    # Find existing item
-                    existing_item = next(
-                        (item for item in quotation.items if item.id == item_id), 
-                        None
-                    )
-                    
-                    if existing_item:
+                    if item_id in existing_item_ids:
                         processed_item_ids.add(item_id)
-                        # Update fields
-                        for field, value in item_data.items():
-                            if hasattr(existing_item, field):
-                                setattr(existing_item, field, value)
+                        values = {
+                            field: value for field, value in item_data.items()
+                            if field in _ITEM_COLS
+                        }
+                        if values:
+                            to_update.append({**values, "id": item_id})
                 else:  # New item
-                    item = QuotationItem(**item_data, quotation_id=quotation.id)
-                    db_session.add(item)
-                    await db_session.flush()
-                    processed_item_ids.add(item.id)
+                    values = {
+                        field: value for field, value in item_data.items()
+                        if field in _ITEM_COLS
+                    }
+                    to_insert.append({**values, "quotation_id": quotation.id})
             
             # Remove items that were not in the update
-            for item in quotation.items:
-                if item.id not in processed_item_ids:
-                    await db_session.delete(item)
+            to_delete_ids = existing_item_ids - processed_item_ids
+            
+            if to_insert:
+                await db_session.execute(insert(QuotationItem), to_insert)
+            
+            if to_update:
+                # Bulk UPDATE by primary key (executemany)
+                await db_session.execute(update(QuotationItem), to_update)
+            
+            if to_delete_ids:
+                await db_session.execute(
+                    delete(QuotationItem).where(QuotationItem.id.in_(to_delete_ids))
+                )
+            
+            # The bulk statements bypass the loaded collection; drop it so the
+            # next load with selectinload(Quotation.items) reads it back
+            db_session.expire(quotation, ["items"])
         
         # Update tags if provided
         if tag_ids is not None:
@@ -266,7 +529,6 @@ class QuotationRepository(BaseRepository[Quotation]):
             db_session.add(history_entry)
         
         await db_session.commit()
-        await db_session.refresh(quotation)
         return quotation
     
     async def update_risk_analysis(
@@ -281,31 +543,52 @@ class QuotationRepository(BaseRepository[Quotation]):
         """
         Updates the risk analysis for a quotation.
         """
-        # Get the quotation
-        quotation = await self.get_quotation_by_id(db_session, quotation_id)
-        if not quotation:
-            return None
-        
-        # Update risk analysis fields
-        quotation.risk_score = risk_score
-        quotation.risk_level = risk_level
-        quotation.risk_factors = risk_factors
+        # Update risk analysis fields in place; RETURNING hands back the row
+        stmt = (
+            update(Quotation)
+            .where(Quotation.id == quotation_id)
+            .values(
+                risk_score=risk_score,
+                risk_level=risk_level,
+                risk_factors=risk_factors
+            )
+            .returning(*Quotation.__table__.c)
+        )
         
-        # Create history entry
         if user_id:
-            history_entry = QuotationHistoryEntry(
-                quotation_id=quotation.id,
-                user_id=user_id,
-                action="risk_analysis_updated",
-                details={
-                    "risk_score": risk_score,
-                    "risk_level": risk_level
-                }
+            # Write the history entry from the same statement: the INSERT reads
+            # the id off the UPDATE's RETURNING, so nothing is logged when the
+            # quotation does not exist and the whole thing is one round-trip
+            updated = stmt.cte("updated_quotation")
+            history = insert(QuotationHistoryEntry).from_select(
+                ["quotation_id", "user_id", "timestamp", "action", "details"],
+                select(
+                    updated.c.id,
+                    literal(user_id),
+                    literal(datetime.utcnow()),
+                    literal("risk_analysis_updated"),
+                    literal(
+                        {"risk_score": risk_score, "risk_level": risk_level},
+                        QuotationHistoryEntry.details.type
+                    )
+                )
+            ).cte("history_entry")
+            query = select(aliased(Quotation, updated)).add_cte(history).execution_options(
+                populate_existing=True
             )
-            db_session.add(history_entry)
+        else:
+            # analyze_risk has already loaded this quotation into the session;
+            # populate_existing overwrites it instead of returning the stale copy
+            query = select(Quotation).from_statement(stmt).execution_options(
+                populate_existing=True
+            )
+        
+        result = await db_session.execute(query)
+        quotation = result.scalar_one_or_none()
+        if not quotation:
+            return None
         
         await db_session.commit()
-        await db_session.refresh(quotation)
         return quotation
     
     async def delete_quotation(
@@ -316,14 +599,17 @@ class QuotationRepository(BaseRepository[Quotation]):
         """
         Deletes a quotation.
         """
-        quotation = await self.get_quotation_by_id(db_session, quotation_id)
-        if not quotation:
-            return False
-        
-        # Delete the quotation (cascades to items and history entries)
-        await db_session.delete(quotation)
+        # Items and history entries are removed by the database ON DELETE cascade
+        stmt = (
+            delete(Quotation)
+            .where(Quotation.id == quotation_id)
+            .returning(Quotation.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db_session.execute(stmt)
+        deleted_id = result.scalar_one_or_none()
         await db_session.commit()
-        return True
+        return deleted_id is not None
 
 
 class QuotationItemRepository(BaseRepository[QuotationItem]):
@@ -339,7 +625,9 @@ class QuotationItemRepository(BaseRepository[QuotationItem]):
         """
         Gets a quotation item by ID.
         """
-        query = select(QuotationItem).where(QuotationItem.id == item_id)
+        query = select(QuotationItem).where(
+            QuotationItem.id == item_id
+        ).options(raiseload("*"))
         result = await db_session.execute(query)
         return result.scalar_one_or_none()
     
@@ -353,7 +641,7 @@ class QuotationItemRepository(BaseRepository[QuotationItem]):
         """
         query = select(QuotationItem).where(
             QuotationItem.quotation_id == quotation_id
-        )
+        ).options(raiseload("*"))
         result = await db_session.execute(query)
         return list(result.scalars().all())
     
@@ -374,7 +662,7 @@ class QuotationTagRepository(BaseRepository[QuotationTag]):
         tag = QuotationTag(**tag_data)
         db_session.add(tag)
         await db_session.commit()
-        await db_session.refresh(tag)
+        invalidate_reference_cache("tags")
         return tag
     
     async def get_tag_by_id(
@@ -406,11 +694,21 @@ class QuotationTagRepository(BaseRepository[QuotationTag]):
         db_session: AsyncSession
     ) -> List[QuotationTag]:
         """
-        Gets all tags.
+        Gets all tags. Served from the in-process reference cache when fresh.
         """
-        query = select(QuotationTag).order_by(QuotationTag.name)
+        tags = _get_cached_reference("tags")
+        if tags is not None:
+            return tags
+        
+        query = select(QuotationTag).order_by(QuotationTag.name).options(raiseload("*"))
         result = await db_session.execute(query)
-        return list(result.scalars().all())
+        tags = list(result.scalars().all())
+        
+        # Detach so the cached instances outlive this session
+        for tag in tags:
+            db_session.expunge(tag)
+        _set_cached_reference("tags", tags)
+        return tags
     
 
 class HistoricalPriceRepository(BaseRepository[HistoricalPrice]):
@@ -429,12 +727,10 @@ class HistoricalPriceRepository(BaseRepository[HistoricalPrice]):
         price = HistoricalPrice(**price_data)
         db_session.add(price)
         await db_session.commit()
-        await db_session.refresh(price)
         return price
     
-    async def get_historical_prices(
+    def _historical_prices_query(
         self,
-        db_session: AsyncSession,
         item_name: Optional[str] = None,
         item_sku: Optional[str] = None,
         source: Optional[str] = None,
@@ -442,17 +738,21 @@ class HistoricalPriceRepository(BaseRepository[HistoricalPrice]):
         region: Optional[str] = None,
         from_date: Optional[datetime] = None,
         to_date: Optional[datetime] = None,
-        limit: int = 100
-    ) -> List[HistoricalPrice]:
+        limit: Optional[int] = None,
+        cursor: Optional[Cursor] = None
+    ):
         """
-        Gets historical prices with filtering.
+        Builds the filtered historical price query, newest first.
         """
         query = select(HistoricalPrice)
         
         # Apply filters
         filters = []
-        if item_name:
-            filters.append(HistoricalPrice.item_name.ilike(f"%{item_name}%"))
+        if item_name and item_name.strip():
+            # Case-insensitive match via LIKE on the stored lowercase column
+            filters.append(
+                HistoricalPrice.item_name_lc.like(search_pattern(item_name.lower()))
+            )
             
         if item_sku:
             filters.append(HistoricalPrice.item_sku == item_sku)
@@ -472,17 +772,119 @@ class HistoricalPriceRepository(BaseRepository[HistoricalPrice]):
         if to_date:
             filters.append(HistoricalPrice.date_recorded <= to_date)
         
+        if cursor:
+            filters.append(
+                tuple_(HistoricalPrice.date_recorded, HistoricalPrice.id) < tuple_(*cursor)
+            )
+        
         # Apply all filters
         if filters:
             query = query.where(and_(*filters))
         
         # Apply ordering and limit
-        query = query.order_by(HistoricalPrice.date_recorded.desc()).limit(limit)
+        query = query.order_by(
+            HistoricalPrice.date_recorded.desc(), HistoricalPrice.id.desc()
+        )
+        if limit:
+            query = query.limit(limit)
+        return query
+    
+    async def get_historical_prices(
+        self,
+        db_session: AsyncSession,
+        item_name: Optional[str] = None,
+        item_sku: Optional[str] = None,
+        source: Optional[str] = None,
+        customer_type: Optional[str] = None,
+        region: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[Cursor] = None
+    ) -> List[HistoricalPrice]:
+        """
+        Gets historical prices with filtering.
+
+        ``cursor`` is the ``(date_recorded, id)`` of the last row of the
+        previous page.
+        """
+        query = self._historical_prices_query(
+            item_name=item_name,
+            item_sku=item_sku,
+            source=source,
+            customer_type=customer_type,
+            region=region,
+            from_date=from_date,
+            to_date=to_date,
+            limit=limit,
+            cursor=cursor
+        )
         
         # Execute query
         result = await db_session.execute(query)
         return list(result.scalars().all())
     
+    async def get_historical_unit_prices(
+        self,
+        db_session: AsyncSession,
+        item_name: Optional[str] = None,
+        item_sku: Optional[str] = None,
+        customer_type: Optional[str] = None,
+        region: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> List[float]:
+        """
+        Gets only the unit prices matching the filters, newest first.
+
+        Selecting just the price lets a SKU lookup be answered from the covering
+        (item_sku, date_recorded, id) index without reading the table.
+        """
+        query = self._historical_prices_query(
+            item_name=item_name,
+            item_sku=item_sku,
+            customer_type=customer_type,
+            region=region,
+            from_date=from_date,
+            limit=limit
+        ).with_only_columns(HistoricalPrice.unit_price)
+        
+        result = await db_session.scalars(query)
+        return list(result.all())
+    
+    async def iter_historical_prices(
+        self,
+        db_session: AsyncSession,
+        item_name: Optional[str] = None,
+        item_sku: Optional[str] = None,
+        source: Optional[str] = None,
+        customer_type: Optional[str] = None,
+        region: Optional[str] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[HistoricalPrice]:
+        """
+        Streams historical prices through a server-side cursor.
+
+        Rows arrive in batches of ``STREAM_BATCH_SIZE``, so memory stays flat
+        however many rows match; meant for callers that only iterate.
+        """
+        query = self._historical_prices_query(
+            item_name=item_name,
+            item_sku=item_sku,
+            source=source,
+            customer_type=customer_type,
+            region=region,
+            from_date=from_date,
+            to_date=to_date,
+            limit=limit
+        ).execution_options(yield_per=STREAM_BATCH_SIZE)
+        
+        result = await db_session.stream_scalars(query)
+        async for price in result:
+            yield price
+    
     
 class RiskFactorRepository(BaseRepository[RiskFactor]):
     """
@@ -500,7 +902,7 @@ class RiskFactorRepository(BaseRepository[RiskFactor]):
         factor = RiskFactor(**factor_data)
         db_session.add(factor)
         await db_session.commit()
-        await db_session.refresh(factor)
+        invalidate_reference_cache("risk_factors")
         return factor
     
     async def get_risk_factor_by_id(
@@ -520,11 +922,21 @@ class RiskFactorRepository(BaseRepository[RiskFactor]):
         db_session: AsyncSession
     ) -> List[RiskFactor]:
         """
-        Gets all risk factors.
+        Gets all risk factors. Served from the in-process reference cache when fresh.
         """
+        factors = _get_cached_reference("risk_factors")
+        if factors is not None:
+            return factors
+        
         query = select(RiskFactor).order_by(RiskFactor.name)
         result = await db_session.execute(query)
-        return list(result.scalars().all())
+        factors = list(result.scalars().all())
+        
+        # Detach so the cached instances outlive this session
+        for factor in factors:
+            db_session.expunge(factor)
+        _set_cached_reference("risk_factors", factors)
+        return factors
 
 
 class QuotationHistoryRepository(BaseRepository[QuotationHistoryEntry]):
@@ -532,20 +944,62 @@ class QuotationHistoryRepository(BaseRepository[QuotationHistoryEntry]):
     Repository for quotation history operations.
     """
     
+    def _history_query(
+        self,
+        quotation_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[Cursor] = None
+    ):
+        """
+        Builds the history query for a quotation, newest first.
+        """
+        query = select(QuotationHistoryEntry).where(
+            QuotationHistoryEntry.quotation_id == quotation_id
+        ).options(joinedload(QuotationHistoryEntry.user), raiseload("*"))
+        if cursor:
+            query = query.where(
+                tuple_(QuotationHistoryEntry.timestamp, QuotationHistoryEntry.id) < tuple_(*cursor)
+            )
+        query = query.order_by(
+            QuotationHistoryEntry.timestamp.desc(), QuotationHistoryEntry.id.desc()
+        )
+        if limit:
+            query = query.limit(limit)
+        return query
+    
     async def get_history_by_quotation(
         self,
         db_session: AsyncSession,
-        quotation_id: int
+        quotation_id: int,
+        limit: Optional[int] = None,
+        cursor: Optional[Cursor] = None
     ) -> List[QuotationHistoryEntry]:
         """
-        Gets all history entries for a quotation.
+        Gets history entries for a quotation, newest first.
+
+        ``cursor`` is the ``(timestamp, id)`` of the last entry of the previous
+        page; ``limit`` defaults to returning every entry.
         """
-        query = select(QuotationHistoryEntry).where(
-            QuotationHistoryEntry.quotation_id == quotation_id
-        ).order_by(QuotationHistoryEntry.timestamp.desc())
-        
-        result = await db_session.execute(query)
+        result = await db_session.execute(
+            self._history_query(quotation_id, limit=limit, cursor=cursor)
+        )
         return list(result.scalars().all())
+    
+    async def iter_history_by_quotation(
+        self,
+        db_session: AsyncSession,
+        quotation_id: int
+    ) -> AsyncIterator[QuotationHistoryEntry]:
+        """
+        Streams every history entry for a quotation, newest first, through a
+        server-side cursor in batches of ``STREAM_BATCH_SIZE``.
+        """
+        query = self._history_query(quotation_id).execution_options(
+            yield_per=STREAM_BATCH_SIZE
+        )
+        result = await db_session.stream_scalars(query)
+        async for entry in result:
+            yield entry
 
 
 # Initialize repository instances
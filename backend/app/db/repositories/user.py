@@ -1,73 +1,283 @@
 """
 Repositório para operações com usuários, incluindo autenticação.
 """
+import asyncio
 from typing import List, Optional, Dict, Any, Union
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from fastapi.encoders import jsonable_encoder
 from datetime import datetime
 
+from app.core.config import settings
 from app.db.repositories import BaseRepository
-from app.models.user import User, Role, Provider, Permission
+from app.db.session import AsyncSessionLocal
+from app.models.base import ModelType
+from app.models.user import User, Role, Provider, Permission, user_permission
 from app.services.security import (
-    get_password_hash, 
-    verify_password, 
+    get_password_hash,
+    verify_password,
     generate_totp_secret
 )
 
 
-class UserRepository(BaseRepository[User, int]):
+class AsyncRepository(BaseRepository[ModelType, int]):
+    """
+    Versão assíncrona das operações CRUD do repositório base,
+    usando select() do SQLAlchemy 2.0 sobre AsyncSession.
+    """
+    def _select(self):
+        """
+        Query base do modelo; subclasses podem adicionar loaders.
+        """
+        return select(self.model)
+
+    async def get(self, db: AsyncSession, id: int) -> Optional[ModelType]:
+        """
+        Obtém um registro pelo ID.
+        """
+        result = await db.execute(self._select().where(self.model.id == id))
+        return result.scalar_one_or_none()
+
+    async def get_multi(
+        self,
+        db: AsyncSession,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        order_by: str = "id",
+        order_dir: str = "asc"
+    ) -> List[ModelType]:
+        """
+        Obtém múltiplos registros com paginação e ordenação.
+        """
+        query = self._select()
+
+        # Aplica ordenação
+        if hasattr(self.model, order_by):
+            order_column = getattr(self.model, order_by)
+            if order_dir.lower() == "desc":
+                query = query.order_by(order_column.desc())
+            else:
+                query = query.order_by(order_column.asc())
+
+        # Aplica paginação
+        query = query.offset(skip).limit(limit)
+
+        result = await db.execute(query)
+        return list(result.scalars().all())
+
+    async def create(self, db: AsyncSession, *, obj_in: Dict[str, Any]) -> ModelType:
+        """
+        Cria um novo registro a partir de um dicionário.
+        """
+        columns = self.model.__table__.columns.keys()
+        db_obj = self.model(**{k: v for k, v in obj_in.items() if k in columns})
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[Dict[str, Any], ModelType]
+    ) -> ModelType:
+        """
+        Atualiza um registro existente.
+        """
+        update_data = obj_in if isinstance(obj_in, dict) else jsonable_encoder(obj_in)
+
+        for field in self.model.__table__.columns.keys():
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+
+        db.add(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def delete(self, db: AsyncSession, *, id: int) -> Optional[ModelType]:
+        """
+        Remove um registro pelo ID.
+        """
+        obj = await self.get(db, id)
+        if obj is not None:
+            await db.delete(obj)
+            await db.commit()
+        return obj
+
+    async def count(self, db: AsyncSession) -> int:
+        """
+        Conta o número total de registros.
+        """
+        result = await db.execute(select(func.count(self.model.id)))
+        return result.scalar_one()
+
+
+class UserEmailLoader:
+    """
+    Agrupa buscas por email concorrentes (ex.: rajadas de login) em uma única
+    consulta: as chamadas que chegam dentro da janela aguardam o mesmo
+    SELECT ... WHERE email IN (...), feito em sessão própria.
+
+    Os usuários retornados ficam desanexados; UserRepository.get_by_email
+    os incorpora à sessão da requisição com merge(load=False).
+    """
+    def __init__(self, window: float):
+        self.window = window
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def load(self, email: str) -> Optional[User]:
+        """
+        Obtém um usuário pelo email, entrando no próximo lote.
+        """
+        future = self._pending.get(email)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[email] = future
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush())
+        # shield: o cancelamento de uma requisição não cancela o resultado das outras
+        return await asyncio.shield(future)
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(self.window)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None
+
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(User)
+                    .options(selectinload(User.permissions))
+                    .where(User.email.in_(pending.keys()))
+                )
+                users = {user.email: user for user in result.scalars()}
+        except Exception as exc:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for email, future in pending.items():
+            if not future.done():
+                future.set_result(users.get(email))
+
+
+class UserRepository(AsyncRepository[User]):
     """
     Repositório para operações com usuários.
     Estende o repositório base com métodos específicos para usuários e autenticação.
     """
     def __init__(self):
         super().__init__(User)
+        self.email_loader = (
+            UserEmailLoader(settings.USER_EMAIL_BATCH_WINDOW_MS / 1000)
+            if settings.USER_EMAIL_BATCHING else None
+        )
+
+    def _select(self):
+        # As permissões vão para o token JWT; carregá-las junto evita lazy load em contexto async
+        return select(User).options(selectinload(User.permissions))
 
-    def get_by_email(self, db: Session, email: str) -> Optional[User]:
+    async def create(self, db: AsyncSession, *, obj_in: Dict[str, Any]) -> User:
         """
-        Obtém um usuário pelo email.
+        Cria um usuário e o devolve com as permissões carregadas.
+
+        O refresh do create genérico não carrega relacionamentos; o token JWT
+        lê user.permissions logo depois (registro, primeiro login OAuth), e em
+        contexto async esse acesso não pode virar lazy load.
+        """
+        user = await super().create(db, obj_in=obj_in)
+        result = await db.execute(
+            self._select()
+            .where(User.id == user.id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one()
+
+    async def get_user_by_id(self, db: AsyncSession, user_id: int) -> Optional[User]:
+        """
+        Obtém um usuário pelo ID.
         """
-        return db.query(User).filter(User.email == email).first()
+        return await self.get(db, user_id)
 
-    def get_by_username(self, db: Session, username: str) -> Optional[User]:
+    async def get_by_email(self, db: AsyncSession, email: str, active_only: bool = False) -> Optional[User]:
+        """
+        Obtém um usuário pelo email.
+        Com active_only, ignora usuários inativos (usa o índice parcial ix_users_email_active).
+        Com USER_EMAIL_BATCHING, a busca entra no lote do UserEmailLoader.
+        """
+        if self.email_loader is not None:
+            user = await self.email_loader.load(email)
+            if user is None or (active_only and not user.is_active):
+                return None
+            # O mesmo objeto pode ter sido entregue a várias requisições;
+            # cada sessão recebe sua própria cópia, sem nova consulta
+            return await db.merge(user, load=False)
+
+        query = self._select().where(User.email == email)
+        if active_only:
+            query = query.where(User.is_active == True)
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+
+    async def get_by_username(self, db: AsyncSession, username: str) -> Optional[User]:
         """
         Obtém um usuário pelo username.
         """
-        return db.query(User).filter(User.username == username).first()
+        result = await db.execute(self._select().where(User.username == username))
+        return result.scalar_one_or_none()
 
-    def get_by_oauth_id(self, db: Session, provider: Provider, oauth_id: str) -> Optional[User]:
+    async def get_by_oauth_id(self, db: AsyncSession, provider: Provider, oauth_id: str) -> Optional[User]:
         """
         Obtém um usuário pelo ID do provedor OAuth.
         """
-        return db.query(User).filter(
-            User.auth_provider == provider, 
-            User.oauth_id == oauth_id
-        ).first()
+        result = await db.execute(
+            self._select().where(
+                and_(User.auth_provider == provider, User.oauth_id == oauth_id)
+            )
+        )
+        return result.scalar_one_or_none()
 
-    def get_active_users(self, db: Session, skip: int = 0, limit: int = 100) -> List[User]:
+    async def get_active_users(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[User]:
         """
         Obtém todos os usuários ativos.
         """
-        return db.query(User).filter(User.is_active == True).offset(skip).limit(limit).all()
+        result = await db.execute(
+            select(User).where(User.is_active == True).order_by(User.id).offset(skip).limit(limit)
+        )
+        return list(result.scalars().all())
 
-    def get_superusers(self, db: Session) -> List[User]:
+    async def get_superusers(self, db: AsyncSession) -> List[User]:
         """
         Obtém todos os super usuários.
         """
-        return db.query(User).filter(User.is_superuser == True).all()
+        result = await db.execute(select(User).where(User.is_superuser == True).order_by(User.id))
+        return list(result.scalars().all())
 
-    def authenticate(self, db: Session, email: str, password: str) -> Optional[User]:
+    async def authenticate(self, db: AsyncSession, email: str, password: str) -> Optional[User]:
         """
         Autentica um usuário verificando email e senha.
         """
-        user = self.get_by_email(db, email)
-        if not user or not verify_password(password, user.hashed_password):
+        user = await self.get_by_email(db, email)
+        if not user:
+            return None
+        # bcrypt é CPU-bound; roda em thread para não bloquear o event loop
+        if not await asyncio.to_thread(verify_password, password, user.hashed_password):
             return None
         return user
 
-    def create_user(
-        self, 
-        db: Session, 
-        user_data: Dict[str, Any], 
+    async def create_user(
+        self,
+        db: AsyncSession,
+        user_data: Dict[str, Any],
         plain_password: Optional[str] = None,
         auth_provider: Provider = Provider.LOCAL
     ) -> User:
@@ -75,132 +285,159 @@ class UserRepository(BaseRepository[User, int]):
         Cria um novo usuário, gerando hash de senha se fornecida.
         """
         user_dict = user_data.copy()
-        
+
         # Se fornecida senha e provider local, gera hash
         if plain_password and auth_provider == Provider.LOCAL:
-            user_dict["hashed_password"] = get_password_hash(plain_password)
+            user_dict["hashed_password"] = await asyncio.to_thread(get_password_hash, plain_password)
         elif auth_provider != Provider.LOCAL:
             user_dict["auth_provider"] = auth_provider
-        
+
         # Garantir que superuser só pode ser criado explicitamente
         if "is_superuser" not in user_dict:
             user_dict["is_superuser"] = False
-            
+
         # Definir papel/role padrão se não fornecido
         if "role" not in user_dict:
             user_dict["role"] = Role.USER
-            
+
         # Gerar segredo TOTP se 2FA requerido
         if user_dict.get("require_2fa", False):
             user_dict["totp_secret"] = generate_totp_secret()
-            
+
         # Remove campos extras que não são colunas do modelo
         if "require_2fa" in user_dict:
             del user_dict["require_2fa"]
-            
+
         if "password" in user_dict:
             del user_dict["password"]
-            
-        return self.create(db, obj_in=user_dict)
 
-    def update_password(self, db: Session, user: User, plain_password: str) -> User:
+        return await self.create(db, obj_in=user_dict)
+
+    async def update_password(self, db: AsyncSession, user: User, plain_password: str) -> User:
         """
         Atualiza a senha de um usuário.
         """
-        hashed_password = get_password_hash(plain_password)
-        return self.update(db, db_obj=user, obj_in={"hashed_password": hashed_password})
+        hashed_password = await asyncio.to_thread(get_password_hash, plain_password)
+        return await self.update(db, db_obj=user, obj_in={"hashed_password": hashed_password})
 
-    def update_last_login(self, db: Session, user: User) -> User:
+    async def update_last_login(self, db: AsyncSession, user: User) -> User:
         """
         Atualiza o timestamp do último login e reseta tentativas de login.
         """
         update_data = {
-            "last_login": datetime.utcnow().isoformat(),
+            "last_login": datetime.utcnow(),
             "failed_login_attempts": 0
         }
-        return self.update(db, db_obj=user, obj_in=update_data)
+        return await self.update(db, db_obj=user, obj_in=update_data)
 
-    def increment_failed_login(self, db: Session, user: User) -> User:
+    async def increment_failed_login(self, db: AsyncSession, user: User) -> User:
         """
         Incrementa o contador de tentativas de login falhas.
         """
         update_data = {"failed_login_attempts": user.failed_login_attempts + 1}
-        return self.update(db, db_obj=user, obj_in=update_data)
+        return await self.update(db, db_obj=user, obj_in=update_data)
 
-    def enable_2fa(self, db: Session, user: User) -> Dict[str, str]:
+    async def enable_2fa(self, db: AsyncSession, user: User) -> Dict[str, str]:
         """
         Ativa 2FA para um usuário e retorna segredo TOTP.
         """
         if not user.totp_secret:
             totp_secret = generate_totp_secret()
-            self.update(db, db_obj=user, obj_in={"totp_secret": totp_secret})
+            await self.update(db, db_obj=user, obj_in={"totp_secret": totp_secret})
         else:
             totp_secret = user.totp_secret
-            
+
         return {"totp_secret": totp_secret}
 
-    def disable_2fa(self, db: Session, user: User) -> User:
+    async def disable_2fa(self, db: AsyncSession, user: User) -> User:
         """
         Desativa 2FA para um usuário.
         """
-        return self.update(db, db_obj=user, obj_in={"totp_secret": None})
+        return await self.update(db, db_obj=user, obj_in={"totp_secret": None})
 
-    def verify_email(self, db: Session, user: User) -> User:
+    async def verify_email(self, db: AsyncSession, user: User) -> User:
         """
         Marca o email do usuário como verificado.
         """
-        return self.update(db, db_obj=user, obj_in={"is_verified": True})
+        return await self.update(db, db_obj=user, obj_in={"is_verified": True})
 
-    def assign_role(self, db: Session, user: User, role: Role) -> User:
+    async def assign_role(self, db: AsyncSession, user: User, role: Role) -> User:
         """
         Atribui um papel/role ao usuário.
         """
-        return self.update(db, db_obj=user, obj_in={"role": role})
+        return await self.update(db, db_obj=user, obj_in={"role": role})
 
-    def add_permission(self, db: Session, user: User, permission: Permission) -> User:
+    async def add_permission(self, db: AsyncSession, user: User, permission: Permission) -> User:
         """
         Adiciona uma permissão ao usuário.
         """
-        user.permissions.append(permission)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+        # Escreve direto na tabela de associação, sem flush da coleção nem refresh do usuário
+        await db.execute(
+            pg_insert(user_permission)
+            .values(user_id=user.id, permission_id=permission.id)
+            .on_conflict_do_nothing()
+        )
+        await db.commit()
+
+        if permission not in user.permissions:
+            set_committed_value(user, "permissions", [*user.permissions, permission])
         return user
 
-    def remove_permission(self, db: Session, user: User, permission: Permission) -> User:
+    async def remove_permission(self, db: AsyncSession, user: User, permission: Permission) -> User:
         """
         Remove uma permissão do usuário.
         """
-        user.permissions.remove(permission)
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.execute(
+            delete(user_permission).where(
+                and_(
+                    user_permission.c.user_id == user.id,
+                    user_permission.c.permission_id == permission.id
+                )
+            )
+        )
+        await db.commit()
+
+        set_committed_value(
+            user, "permissions", [p for p in user.permissions if p.id != permission.id]
+        )
         return user
 
 
-class PermissionRepository(BaseRepository[Permission, int]):
+class PermissionRepository(AsyncRepository[Permission]):
     """
     Repositório para gerenciamento de permissões.
     """
     def __init__(self):
         super().__init__(Permission)
 
-    def get_by_name(self, db: Session, name: str) -> Optional[Permission]:
+    async def get_by_name(self, db: AsyncSession, name: str) -> Optional[Permission]:
         """
         Obtém uma permissão pelo nome.
         """
-        return db.query(Permission).filter(Permission.name == name).first()
+        result = await db.execute(select(Permission).where(Permission.name == name))
+        return result.scalar_one_or_none()
 
-    def create_if_not_exists(self, db: Session, name: str, description: Optional[str] = None) -> Permission:
+    async def create_if_not_exists(self, db: AsyncSession, name: str, description: Optional[str] = None) -> Permission:
         """
         Cria uma permissão se ela não existir e a retorna.
         """
-        permission = self.get_by_name(db, name)
-        if not permission:
-            permission_data = {"name": name}
-            if description:
-                permission_data["description"] = description
-            permission = self.create(db, obj_in=permission_data)
+        permission_data = {"name": name}
+        if description:
+            permission_data["description"] = description
+
+        # Upsert atômico: uma ida ao banco e sem corrida entre workers concorrentes
+        result = await db.execute(
+            pg_insert(Permission)
+            .values(**permission_data)
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(Permission)
+        )
+        permission = result.scalar_one_or_none()
+        await db.commit()
+
+        # Já existia: ON CONFLICT não retorna linha
+        if permission is None:
+            permission = await self.get_by_name(db, name)
         return permission
 
 
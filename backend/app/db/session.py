@@ -1,27 +1,44 @@
 """
 Inicializa a conexão com o banco de dados PostgreSQL usando SQLAlchemy.
 """
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from contextlib import contextmanager
 
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import QueuePool
 
 from app.core.config import settings
 
-# Configuração do pool de conexões
+# Parâmetros de sessão enviados no handshake de cada conexão física, então
+# toda query herda os limites sem uma ida extra ao banco por query
+CONNECT_ARGS = {
+    "application_name": settings.PROJECT_NAME,
+    "options": (
+        "-c jit=off"
+        " -c statement_timeout=30s"
+        " -c idle_in_transaction_session_timeout=60s"
+    ),
+    # Sem prepared statements implícitos do psycopg 3 (incompatíveis com pgbouncer)
+    "prepare_threshold": None,
+}
+
+# Configuração do pool de conexões; LIFO mantém quentes só as conexões em uso
+# e deixa as ociosas expirarem
 engine = create_engine(
     settings.SQLALCHEMY_DATABASE_URI,
     echo=settings.DEBUG,
     echo_pool=settings.DEBUG,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=20,
+    max_overflow=40,
     pool_timeout=30,
     pool_recycle=1800,
     pool_pre_ping=True,
-    poolclass=QueuePool
+    pool_use_lifo=True,
+    poolclass=QueuePool,
+    connect_args=CONNECT_ARGS
 )
 
 # Evento para log de conexões
@@ -38,9 +55,30 @@ if settings.DEBUG:
     def checkin(dbapi_connection, connection_record):
         print("Conexão devolvida ao pool")
 
+# Engine assíncrona (psycopg 3 atende sync e async com a mesma URI)
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_DATABASE_URI,
+    echo=settings.DEBUG,
+    pool_size=20,
+    max_overflow=40,
+    pool_timeout=30,
+    pool_recycle=1800,
+    pool_pre_ping=True,
+    pool_use_lifo=True,
+    connect_args=CONNECT_ARGS
+)
+
 # Cria a sessão
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Sessão assíncrona; expire_on_commit=False evita lazy loads após o commit
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base para os modelos
 Base = declarative_base()
 
@@ -57,6 +95,15 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency para obter uma sessão assíncrona do banco de dados.
+    Libera o event loop durante o I/O com o banco.
+    """
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
 @contextmanager
 def get_db_transaction() -> Generator[Session, None, None]:
     """
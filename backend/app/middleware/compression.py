@@ -1,67 +1,152 @@
 """
 Middleware para compressão de respostas HTTP.
 """
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from typing import Callable
-import gzip
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import zlib
 
+# wbits=31: deflate com cabeçalho/trailer gzip (CRC32 incluso) gerados pelo
+# próprio zlib em C; o cabeçalho sai com mtime zerado, saída determinística
+GZIP_WBITS = 31
+# Sem dicionário pré-definido (zdict): o formato gzip não tem como sinalizá-lo,
+# e nenhum navegador descomprime deflate com dicionário que ele não conhece
 
-class CompressionMiddleware(BaseHTTPMiddleware):
+# Abaixo de ~4 KB a resposta já cabe em poucos segmentos TCP: comprimir quase
+# não economiza pacotes, mas custa deflate e atrasa o primeiro byte (TTFB)
+DEFAULT_MIN_SIZE = 4096
+
+# Só tipos textuais valem a compressão; imagens, vídeos, PDFs e zips já vêm
+# comprimidos e encolheriam menos de 1% ao custo de CPU
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "application/x-yaml",
+    "image/svg+xml",
+)
+
+
+class CompressionMiddleware:
     """
-    Middleware para aplicar compressão gzip nas respostas HTTP.
+    Middleware ASGI para aplicar compressão gzip nas respostas HTTP.
     Comprime respostas apenas quando:
     1. O cliente suporta gzip (cabeçalho Accept-Encoding contém 'gzip')
     2. A resposta não está já comprimida (não tem Content-Encoding)
-    3. O tamanho da resposta é maior que min_size
+    3. O Content-Type é textual (COMPRESSIBLE_CONTENT_TYPES)
+    4. O tamanho da resposta é maior que min_size
+
+    Trabalha direto sobre as mensagens ASGI, então também comprime
+    StreamingResponse, bloco a bloco. Mantido no lugar do GZipMiddleware do
+    Starlette por filtrar tipos não compressíveis e descarregar cada bloco
+    de streaming (Z_SYNC_FLUSH).
     """
     def __init__(
-        self, 
-        app: ASGIApp, 
-        min_size: int = 500,
+        self,
+        app: ASGIApp,
+        min_size: int = DEFAULT_MIN_SIZE,
         compression_level: int = 6
     ):
-        super().__init__(app)
+        self.app = app
         self.min_size = min_size
         self.compression_level = compression_level
-    
-    async def dispatch(
-        self, request: Request, call_next: Callable
-    ) -> Response:
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         # Verifica se o cliente aceita compressão gzip
-        accept_encoding = request.headers.get("Accept-Encoding", "")
-        
-        response = await call_next(request)
-        
-        # Não comprime se:
-        # - O cliente não aceita gzip
-        # - A resposta já tem um Content-Encoding
-        # - Não há corpo na resposta
-        # - A resposta é muito pequena para valer a pena comprimir
-        if (
-            "gzip" not in accept_encoding
-            or response.headers.get("Content-Encoding")
-            or not hasattr(response, "body")
-            or len(response.body) < self.min_size
-        ):
-            return response
-            
-        # Comprime o corpo da resposta
-        compressed_body = gzip.compress(
-            response.body, 
-            compresslevel=self.compression_level
-        )
-        
-        # Atualiza os cabeçalhos da resposta
-        response.headers["Content-Encoding"] = "gzip"
-        response.headers["Content-Length"] = str(len(compressed_body))
-        response.body = compressed_body
-        
-        return response
-
-
-def setup_compression(app: ASGIApp, min_size: int = 1000):
+        if "gzip" not in Headers(scope=scope).get("Accept-Encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        responder = GzipResponder(self.app, self.min_size, self.compression_level)
+        await responder(scope, receive, send)
+
+
+class GzipResponder:
+    """
+    Envolve o send de uma única requisição, comprimindo o corpo da resposta.
+    """
+    def __init__(self, app: ASGIApp, min_size: int, compression_level: int):
+        self.app = app
+        self.min_size = min_size
+        self.compression_level = compression_level
+        self.send: Send = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        # Criado só quando o corpo vai de fato ser comprimido
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_gzip)
+
+    async def send_with_gzip(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # Segura o início da resposta até saber se o corpo será comprimido
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            content_length = headers.get("Content-Length")
+            # Não comprime se a resposta já tem Content-Encoding, se o tipo não
+            # é compressível ou se o Content-Length declarado é pequeno demais
+            self.passthrough = (
+                "content-encoding" in headers
+                or not headers.get("Content-Type", "").startswith(COMPRESSIBLE_CONTENT_TYPES)
+                or (content_length is not None and int(content_length) < self.min_size)
+            )
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = None
+
+        if not self.started:
+            self.started = True
+
+            if not more_body and len(body) < self.min_size:
+                # Resposta completa e pequena: envia sem comprimir
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.initial_message["headers"])
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            self.compressor = zlib.compressobj(
+                self.compression_level, zlib.DEFLATED, GZIP_WBITS
+            )
+
+        if more_body:
+            # Z_SYNC_FLUSH entrega o bloco inteiro já comprimido, para que
+            # streams (SSE, chunked) não fiquem parados no buffer do zlib
+            message["body"] = self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        else:
+            message["body"] = self.compressor.compress(body) + self.compressor.flush(zlib.Z_FINISH)
+
+        if headers is not None:
+            if more_body:
+                # Tamanho final desconhecido: a resposta segue em chunks
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(self.initial_message)
+
+        await self.send(message)
+
+
+def setup_compression(app: ASGIApp, min_size: int = DEFAULT_MIN_SIZE):
     """
     Configura a compressão para o aplicativo.
     
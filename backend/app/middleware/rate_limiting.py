@@ -2,12 +2,50 @@
 Middleware para rate limiting e proteção contra ataques de força bruta.
 """
 from fastapi import Request, Response, HTTPException, status
+from functools import lru_cache
+from starlette.types import Scope
 import time
 import redis
 from typing import Dict, Any, Optional, Callable, Tuple
 
 from app.core.config import settings
-from app.db.redis import get_redis_client
+from app.db.redis import get_async_redis_client
+
+
+def get_client_ip(scope: Scope) -> str:
+    """
+    Obtém o IP do cliente direto do scope ASGI, sem criar Request/Address.
+    Atrás de proxy reverso (RATE_LIMIT_TRUST_PROXY), usa o primeiro IP do
+    X-Forwarded-For; sem proxy confiável o cabeçalho é ignorado, pois o
+    cliente poderia forjá-lo para escapar do limite.
+    """
+    if settings.RATE_LIMIT_TRUST_PROXY:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",", 1)[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+# Verifica o bloqueio, incrementa o contador e bloqueia ao exceder o limite
+# numa única ida ao Redis (e de forma atômica).
+# KEYS: contador, chave de bloqueio; ARGV: janela, limite, duração do bloqueio
+# Retorna {bloqueado, valor}: TTL do bloqueio se bloqueado, senão o contador
+RATE_LIMIT_SCRIPT = """
+local blocked = redis.call('GET', KEYS[2])
+if blocked then
+    return {1, redis.call('TTL', KEYS[2])}
+end
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if current > tonumber(ARGV[2]) then
+    redis.call('SET', KEYS[2], 1, 'EX', ARGV[3])
+    return {1, 0}
+end
+return {0, current}
+"""
 
 
 class RateLimiter:
@@ -28,16 +66,20 @@ class RateLimiter:
         self.prefix = prefix
         self.key_func = key_func or self._default_key_func
         self.block_duration = block_duration
-        self.redis = get_redis_client()
+        # Prefixos já codificados: as chaves são montadas direto em bytes,
+        # que o Redis aceita sem a etapa de codificação do redis-py
+        self._key_prefix = prefix.encode()
+        self._block_prefix = b"block:" + self._key_prefix
+        self.redis = get_async_redis_client()
+        self._check = self.redis.register_script(RATE_LIMIT_SCRIPT)
 
     async def _default_key_func(self, request: Request) -> str:
         """
         Cria uma chave baseada no IP do cliente e path da requisição.
         Por padrão, limita por IP + path.
         """
-        client_ip = request.client.host if request.client else "unknown"
-        path = request.url.path
-        return f"{client_ip}:{path}"
+        scope = request.scope
+        return f"{get_client_ip(scope)}:{scope['path']}"
 
     async def is_rate_limited(self, request: Request) -> Tuple[bool, int]:
         """
@@ -45,37 +87,26 @@ class RateLimiter:
         Retorna (is_limited, remaining)
         """
         key = await self.key_func(request)
-        redis_key = f"{self.prefix}{key}"
+        return await self.is_key_rate_limited(key)
+
+    async def is_key_rate_limited(self, key: str) -> Tuple[bool, int]:
+        """
+        Verifica o limite de taxa para uma chave já calculada.
+        Retorna (is_limited, remaining)
+        """
+        key_bytes = key.encode()
+        redis_key = self._key_prefix + key_bytes
+        block_key = self._block_prefix + key_bytes
         
-        # Verifica se o IP está bloqueado
-        block_key = f"block:{self.prefix}{key}"
-        is_blocked = await self.redis.get(block_key)
-        if is_blocked:
-            ttl = await self.redis.ttl(block_key)
-            return True, ttl
-            
-        # Obtém o contador atual
-        current = await self.redis.get(redis_key)
-        if current is None:
-            # Primeira requisição para esta chave
-            await self.redis.setex(redis_key, self.seconds, 1)
-            return False, self.times - 1
-            
-        # Incrementa o contador
-        current = int(current)
-        if current >= self.times:
-            # Excedeu o limite, bloqueia
-            await self.redis.setex(block_key, self.block_duration, 1)
-            return True, 0
-            
-        # Incrementa o contador
-        await self.redis.incr(redis_key)
-        ttl = await self.redis.ttl(redis_key)
-        if ttl == -1:
-            # Se o TTL for -1, a chave não tem expiração definida
-            await self.redis.expire(redis_key, self.seconds)
-            
-        return False, self.times - (current + 1)
+        blocked, value = await self._check(
+            keys=[redis_key, block_key],
+            args=[self.seconds, self.times, self.block_duration]
+        )
+        if blocked:
+            # Bloqueado: value é o tempo restante de bloqueio
+            return True, int(value)
+        
+        return False, self.times - int(value)
 
     async def __call__(self, request: Request, call_next):
         """
@@ -98,14 +129,32 @@ class RateLimiter:
         return response
         
 
+# Limitadores reutilizados entre requisições, um por configuração; o LRU
+# limita quantos ficam vivos se houver muitas combinações de limites
+@lru_cache(maxsize=64)
+def get_rate_limiter(prefix: str, times: int, seconds: int) -> RateLimiter:
+    """
+    Retorna o limitador compartilhado para (prefix, times, seconds).
+    """
+    return RateLimiter(times=times, seconds=seconds, prefix=prefix)
+
+
+async def check_rate_limit_ip(request: Request, times: int = 5, seconds: int = 60) -> Tuple[bool, int]:
+    """
+    Verifica o rate limiting por IP sem lançar exceção.
+    Retorna (is_limited, remaining); usado pelo middleware.
+    """
+    limiter = get_rate_limiter("ip:", times, seconds)
+    return await limiter.is_rate_limited(request)
+
+
 # Funções de utilidade para aplicar rate limiting diretamente nas rotas
 async def rate_limit_ip(request: Request, times: int = 5, seconds: int = 60):
     """
     Rate limiting por IP para proteger endpoints sensíveis.
     Útil para rotas como login, registro, reset de senha.
     """
-    limiter = RateLimiter(times=times, seconds=seconds, prefix="ip:")
-    is_limited, remaining = await limiter.is_rate_limited(request)
+    is_limited, remaining = await check_rate_limit_ip(request, times=times, seconds=seconds)
     
     if is_limited:
         raise HTTPException(
@@ -119,17 +168,11 @@ async def rate_limit_user(request: Request, user_id: int, times: int = 20, secon
     Rate limiting por usuário autenticado.
     Útil para limitar ações de usuários específicos.
     """
-    # Cria uma chave baseada no ID do usuário
-    async def user_key_func(req: Request) -> str:
-        return f"user:{user_id}:{req.url.path}"
-    
-    limiter = RateLimiter(
-        times=times, 
-        seconds=seconds, 
-        prefix="user:", 
-        key_func=user_key_func
+    limiter = get_rate_limiter("user:", times, seconds)
+    # Chave baseada no ID do usuário
+    is_limited, remaining = await limiter.is_key_rate_limited(
+        f"user:{user_id}:{request.scope['path']}"
     )
-    is_limited, remaining = await limiter.is_rate_limited(request)
     
     if is_limited:
         raise HTTPException(
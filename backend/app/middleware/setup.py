@@ -1,21 +1,23 @@
 """
 Configuração adicional do FastAPI para aplicar middleware de rate limiting.
 """
-from fastapi import FastAPI, Request, Response, Depends
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
-from typing import Callable, List, Dict, Any, Optional, Tuple
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, Any, Optional
+import re
 import time
 import logging
 
 from app.core.config import settings
-from app.middleware.rate_limiting import rate_limit_ip, rate_limit_user, RateLimiter
+from app.middleware.rate_limiting import check_rate_limit_ip, get_client_ip, rate_limit_user, RateLimiter
 
 logger = logging.getLogger(__name__)
 
-class RateLimitingMiddleware(BaseHTTPMiddleware):
+class RateLimitingMiddleware:
     """
-    Middleware para aplicar rate limiting por path.
+    Middleware ASGI para aplicar rate limiting por path.
     """
     def __init__(
         self, 
@@ -23,55 +25,63 @@ class RateLimitingMiddleware(BaseHTTPMiddleware):
         sensitive_paths: Dict[str, Dict[str, Any]] = None,
         enable_logging: bool = True
     ):
-        super().__init__(app)
+        self.app = app
         self.sensitive_paths = sensitive_paths or {}
         self.enable_logging = enable_logging
+        # Todos os padrões numa única regex: um probe em C por requisição em vez
+        # de um loop de substrings em Python
+        self._path_pattern: Optional[re.Pattern] = (
+            re.compile("|".join(re.escape(pattern) for pattern in self.sensitive_paths))
+            if self.sensitive_paths else None
+        )
     
-    async def dispatch(
-        self, request: Request, call_next: Callable
-    ) -> Response:
-        path = request.url.path
-        client_ip = request.client.host if request.client else "unknown"
-        start_time = time.time()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Verificação de rate limiting
-        limited = False
-        remaining = 0
+        path = scope["path"]
+        start_time = time.time()
         
         # Verifica se o path atual está na lista de paths sensíveis
-        for pattern, limits in self.sensitive_paths.items():
-            if pattern in path:
-                # Aplica rate limiting com os limites específicos para este path
-                try:
-                    await rate_limit_ip(
-                        request, 
-                        times=limits.get("times", 5), 
-                        seconds=limits.get("seconds", 60)
+        match = self._path_pattern.search(path) if self._path_pattern else None
+        if match:
+            limits = self.sensitive_paths[match.group(0)]
+            request = Request(scope)
+            # Aplica rate limiting com os limites específicos para este path
+            is_limited, remaining = await check_rate_limit_ip(
+                request, 
+                times=limits.get("times", 5), 
+                seconds=limits.get("seconds", 60)
+            )
+            if is_limited:
+                if self.enable_logging:
+                    logger.warning(
+                        "Rate limit exceeded for IP %s on path %s (retry in %ss)",
+                        get_client_ip(scope), path, remaining
                     )
-                except Exception as e:
-                    limited = True
-                    if self.enable_logging:
-                        logger.warning(
-                            f"Rate limit exceeded for IP {client_ip} on path {path}: {str(e)}"
-                        )
-                    # Propagar a exceção para que a resposta 429 seja retornada
-                    raise e
-                
-                break
-                
-        # Continua com a requisição se não for limitada
-        response = await call_next(request)
+                response = JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content={
+                        "detail": f"Muitas requisições. Tente novamente em {remaining} segundos."
+                    },
+                    headers={"X-Rate-Limited": "true"}
+                )
+                await response(scope, receive, send)
+                return
+        
+        if not self.enable_logging:
+            await self.app(scope, receive, send)
+            return
         
-        # Adiciona headers de telemetria se o logging estiver ativado
-        if self.enable_logging:
-            process_time = time.time() - start_time
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            if limited:
-                response.headers["X-Rate-Limited"] = "true"
-                response.headers["X-Rate-Limit-Remaining"] = str(remaining)
+        # Adiciona headers de telemetria no início da resposta
+        async def send_with_telemetry(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Process-Time"] = str(time.time() - start_time)
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_telemetry)
 
 
 def setup_rate_limiting(app: FastAPI):
@@ -79,12 +89,19 @@ def setup_rate_limiting(app: FastAPI):
     Configura rate limiting para paths sensíveis com diferentes limites baseados
     na criticidade da operação.
     """
+    # Registra o middleware uma única vez: cada instância faria sua própria
+    # ida ao Redis nos paths sensíveis
+    if any(m.cls is RateLimitingMiddleware for m in app.user_middleware):
+        return
+    
     # Define paths sensíveis e seus limites
     sensitive_paths = {
         # Autenticação - mais restritivo
         "/auth/login": {"times": 5, "seconds": 300},  # 5 tentativas a cada 5 minutos
         "/auth/register": {"times": 3, "seconds": 3600},  # 3 registros por hora
         "/auth/reset-password": {"times": 3, "seconds": 3600},  # 3 resets por hora
+        "/auth/verify-2fa": {"times": 5, "seconds": 300},  # 5 tentativas em 5 minutos
+        "/auth/oauth": {"times": 10, "seconds": 600},  # 10 tentativas em 10 minutos
         
         # APIs que podem ser computacionalmente intensivas
         "/metrics": {"times": 30, "seconds": 60},  # 30 chamadas por minuto
@@ -107,16 +124,3 @@ def setup_rate_limiting(app: FastAPI):
     if settings.ENABLE_TELEMETRY:
         paths_config = ", ".join([f"{k}:{v['times']}/{v['seconds']}s" for k, v in sensitive_paths.items()])
         logger.info(f"Rate limiting configurado para paths: {paths_config}")
-    sensitive_paths = {
-        "/api/v1/auth/login": {"times": 5, "seconds": 300},  # 5 tentativas em 5 minutos
-        "/api/v1/auth/register": {"times": 3, "seconds": 3600},  # 3 registros por hora
-        "/api/v1/auth/reset-password": {"times": 3, "seconds": 3600},  # 3 resets por hora
-        "/api/v1/auth/verify-2fa": {"times": 5, "seconds": 300},  # 5 tentativas em 5 minutos
-        "/api/v1/auth/oauth": {"times": 10, "seconds": 600},  # 10 tentativas em 10 minutos
-    }
-    
-    # Adiciona o middleware à aplicação
-    app.add_middleware(
-        RateLimitingMiddleware,
-        sensitive_paths=sensitive_paths
-    )
@@ -2,17 +2,110 @@
 Modelos base para SQLAlchemy com mixin de timestamps.
 """
 from datetime import datetime
-from typing import Any, Dict, TypeVar
+from enum import Enum
+from typing import Any, Dict, Mapping, Tuple, Type, TypeVar
 
-from sqlalchemy import Column, DateTime, func
+from sqlalchemy import DDL, JSON, Column, DateTime, Enum as SQLAEnum, SmallInteger, event, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import Session
+from sqlalchemy.types import TypeDecorator
 
 from app.db.session import Base
 
 # Tipo para o modelo genérico
 ModelType = TypeVar("ModelType", bound=Base)
 
+# JSON binário (JSONB) no PostgreSQL: não é reinterpretado a cada leitura e
+# aceita índice GIN para consultas de contenção (@>); JSON comum nos demais bancos
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
+# IDs "snowflake" (BIGINT) para tabelas de escrita intensa: milissegundos desde
+# SNOWFLAKE_EPOCH_MS nos bits altos (41 bits, até 2093), shard (2 bits) e
+# sequência (10 bits) nos baixos. Crescem com o tempo, então inserts sempre vão
+# para o fim do índice e a chave serve para particionar por intervalo de tempo.
+# O total de 53 bits mantém os IDs abaixo de 2^53: a API os serializa como
+# número JSON e o navegador não os arredonda
+SNOWFLAKE_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+SNOWFLAKE_SHARD_BITS = 2
+SNOWFLAKE_SEQUENCE_BITS = 10
+SNOWFLAKE_ID_DEFAULT = text("next_snowflake_id()")
+
+# Também criada pela migração 0020; aqui para que create_all (testes e tabelas
+# fora do Alembic) não dependa dela
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE SEQUENCE IF NOT EXISTS snowflake_id_seq").execute_if(dialect="postgresql"),
+)
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL(
+        "CREATE OR REPLACE FUNCTION next_snowflake_id(shard integer DEFAULT 0) "
+        "RETURNS bigint AS $$ "
+        "SELECT ((floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint "
+        f"- {SNOWFLAKE_EPOCH_MS}) << {SNOWFLAKE_SHARD_BITS + SNOWFLAKE_SEQUENCE_BITS}) "
+        f"| ((shard & {(1 << SNOWFLAKE_SHARD_BITS) - 1})::bigint << {SNOWFLAKE_SEQUENCE_BITS}) "
+        f"| (nextval('snowflake_id_seq') & {(1 << SNOWFLAKE_SEQUENCE_BITS) - 1}) "
+        "$$ LANGUAGE sql VOLATILE"
+    ).execute_if(dialect="postgresql"),
+)
+
+
+def string_enum(enum_class: Type[Enum], name: str, length: int = 20) -> SQLAEnum:
+    """
+    Enum gravado como VARCHAR com CHECK (sem tipo ENUM nativo do PostgreSQL).
+    
+    Filtros e índices parciais por status comparam texto simples, e incluir um
+    valor novo não exige ALTER TYPE. No Python a coluna continua devolvendo
+    membros do enum; no banco fica o valor (ex.: 'draft'), não o nome.
+    """
+    return SQLAEnum(
+        enum_class,
+        name=name,
+        native_enum=False,
+        create_constraint=True,
+        length=length,
+        values_callable=lambda members: [member.value for member in members],
+    )
+
+
+class SmallIntEnum(TypeDecorator):
+    """
+    Enum gravado como SMALLINT, com um código fixo por membro.
+
+    Para colunas comparadas a cada requisição (papel e provedor do usuário):
+    2 bytes por linha e igualdade de inteiros no WHERE, em vez de texto. No
+    Python a coluna continua recebendo e devolvendo membros do enum; os códigos
+    nunca devem ser reaproveitados, pois são o que fica gravado no banco.
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class: Type[Enum], codes: Mapping[Enum, int]):
+        super().__init__()
+        self.enum_class = enum_class
+        # Tupla (hashable) para compor a chave de cache do tipo
+        self.codes = tuple((member.value, code) for member, code in codes.items())
+        self._code_by_value = dict(self.codes)
+        self._member_by_code = {code: enum_class(value) for value, code in self.codes}
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Any:
+        if value is None:
+            return None
+        return self._code_by_value[self.enum_class(value).value]
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        if value is None:
+            return None
+        return self._member_by_code[value]
+
+    def check_sql(self, column_name: str) -> str:
+        """Expressão do CHECK que restringe a coluna aos códigos conhecidos."""
+        codes = ", ".join(str(code) for _, code in self.codes)
+        return f"{column_name} IN ({codes})"
+
 
 class TimestampMixin:
     """
@@ -49,21 +142,30 @@ class BaseModel(Base):
         nullable=False
     )
 
+    @classmethod
+    def _column_names(cls) -> Tuple[str, ...]:
+        """
+        Nomes das colunas da tabela, calculados uma vez por classe.
+        """
+        # Busca em cls.__dict__ para que cada subclasse tenha o próprio cache
+        names = cls.__dict__.get("_column_names_cache")
+        if names is None:
+            names = tuple(column.name for column in cls.__table__.columns)
+            cls._column_names_cache = names
+            cls._column_names_set = frozenset(names)
+        return names
+
     def to_dict(self) -> Dict[str, Any]:
         """
         Converte o modelo para um dicionário.
         """
-        return {
-            column.name: getattr(self, column.name)
-            for column in self.__table__.columns
-        }
+        return {name: getattr(self, name) for name in self._column_names()}
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "BaseModel":
         """
         Cria uma instância do modelo a partir de um dicionário.
         """
-        return cls(**{
-            k: v for k, v in data.items()
-            if k in [c.name for c in cls.__table__.columns]
-        })
+        cls._column_names()
+        columns = cls._column_names_set
+        return cls(**{k: v for k, v in data.items() if k in columns})
@@ -1,9 +1,13 @@
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Text, Boolean, Float, Table
+from sqlalchemy import Column, String, DateTime, Integer, ForeignKey, Text, Boolean, Float, Table, Index
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 
+# Algoritmo do hash de integridade gravado em novos documentos (BLAKE2b de
+# 32 bytes); documentos antigos continuam com hash_algo = "md5"
+DOCUMENT_HASH_ALGO = "blake2b"
+
 # Tabela de associação para tags de documentos
 document_tag = Table(
     "document_tag",
@@ -15,6 +19,10 @@ document_tag = Table(
 class Document(Base):
     """Modelo para armazenar documentos e seus metadados básicos"""
     __tablename__ = "documents"
+    __table_args__ = (
+        # Busca de duplicatas a cada upload (get_document_by_hash)
+        Index("ix_documents_hash", "hash_algo", "content_hash"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String(255), nullable=False)
@@ -23,7 +31,8 @@ class Document(Base):
     file_size = Column(Integer, nullable=False)  # tamanho em bytes
     mime_type = Column(String(100), nullable=False)
     extension = Column(String(10), nullable=False)
-    md5_hash = Column(String(32), nullable=False)  # hash para verificar integridade
+    content_hash = Column(String(64), nullable=False)  # hash para verificar integridade (hex)
+    hash_algo = Column(String(16), default=DOCUMENT_HASH_ALGO, nullable=False)  # algoritmo de content_hash
     
     # Metadados do processo
     uploaded_by_id = Column(Integer, ForeignKey("users.id"), nullable=False)
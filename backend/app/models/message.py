@@ -1,10 +1,12 @@
 from datetime import datetime
 from typing import List, Optional
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Table, Text
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Table, Text, UniqueConstraint, text
+)
 from sqlalchemy.orm import relationship
 
-from app.models.base import Base
+from app.models.base import Base, SNOWFLAKE_ID_DEFAULT
 from app.models.user import User
 
 
@@ -12,8 +14,8 @@ from app.models.user import User
 conversation_members = Table(
     "conversation_members",
     Base.metadata,
-    Column("conversation_id", Integer, ForeignKey("conversations.id")),
-    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("conversation_id", Integer, ForeignKey("conversations.id", ondelete="CASCADE")),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE")),
 )
 
 
@@ -29,8 +31,10 @@ class Conversation(Base):
 
     # Relationships
     created_by = relationship("User", foreign_keys=[created_by_id])
-    members = relationship("User", secondary=conversation_members, backref="conversations")
-    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
+    members = relationship("User", secondary=conversation_members, back_populates="conversations", lazy="selectin")
+    # ON DELETE CASCADE on the foreign keys removes the children in the same
+    # DELETE: passive_deletes keeps the ORM from loading them first
+    messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<Conversation(id={self.id}, name={self.name}, is_group={self.is_group})>"
@@ -38,9 +42,14 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
-
-    id = Column(Integer, primary_key=True, index=True)
-    conversation_id = Column(Integer, ForeignKey("conversations.id"), nullable=False)
+    __table_args__ = (
+        # A conversation's messages, newest first, with no sort step
+        Index("ix_messages_conversation_created", "conversation_id", text("created_at DESC")),
+    )
+
+    # Snowflake ID: ordered by creation time, no contention on a shared sequence
+    id = Column(BigInteger, primary_key=True, server_default=SNOWFLAKE_ID_DEFAULT)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -48,9 +57,13 @@ class Message(Base):
 
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
-    sender = relationship("User", foreign_keys=[sender_id])
-    attachments = relationship("MessageAttachment", back_populates="message", cascade="all, delete-orphan")
-    read_receipts = relationship("ReadReceipt", back_populates="message", cascade="all, delete-orphan")
+    sender = relationship("User", foreign_keys=[sender_id], lazy="selectin")
+    attachments = relationship(
+        "MessageAttachment", back_populates="message", cascade="all, delete-orphan", lazy="selectin", passive_deletes=True
+    )
+    read_receipts = relationship(
+        "ReadReceipt", back_populates="message", cascade="all, delete-orphan", lazy="selectin", passive_deletes=True
+    )
 
     def __repr__(self):
         return f"<Message(id={self.id}, sender_id={self.sender_id}, created_at={self.created_at})>"
@@ -60,7 +73,7 @@ class MessageAttachment(Base):
     __tablename__ = "message_attachments"
 
     id = Column(Integer, primary_key=True, index=True)
-    message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    message_id = Column(BigInteger, ForeignKey("messages.id", ondelete="CASCADE"), nullable=False)
     file_name = Column(String(255), nullable=False)
     file_type = Column(String(50), nullable=False)
     file_size = Column(Integer, nullable=False)  # Size in bytes
@@ -76,9 +89,13 @@ class MessageAttachment(Base):
 
 class ReadReceipt(Base):
     __tablename__ = "read_receipts"
+    __table_args__ = (
+        # Created by migration 0003; one receipt per user and message
+        UniqueConstraint("message_id", "user_id", name="uq_read_receipt_message_user"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    message_id = Column(BigInteger, ForeignKey("messages.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     read_at = Column(DateTime, default=datetime.utcnow)
 
@@ -2,10 +2,11 @@ from datetime import datetime
 from enum import Enum
 from typing import Optional, List
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import BigInteger, Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index, event
 from sqlalchemy.orm import relationship
 
-from app.models.base import Base
+from app.db.partitions import ensure_monthly_partitions
+from app.models.base import Base, JSONType, SNOWFLAKE_ID_DEFAULT
 
 
 class MetricType(str, Enum):
@@ -43,19 +44,25 @@ class TimeGranularity(str, Enum):
 class Metric(Base):
     """Modelo para métricas do dashboard."""
     __tablename__ = "metrics"
+    __table_args__ = (
+        # Filtros de contenção (metadata @> '{...}') sem varrer a tabela
+        Index("ix_metrics_metadata", "metadata", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
-    description = Column(String, nullable=True)
-    type = Column(String, nullable=False)
+    name = Column(String(120), nullable=False)
+    description = Column(String(255), nullable=True)
+    type = Column(String(24), nullable=False)
     value = Column(Float, nullable=True)
-    value_text = Column(String, nullable=True)  # Para valores não numéricos
-    unit = Column(String, nullable=True)  # ex: %, R$, unidades
+    value_text = Column(String(255), nullable=True)  # Para valores não numéricos
+    unit = Column(String(16), nullable=True)  # ex: %, R$, unidades
     is_realtime = Column(Boolean, default=False)  # Se a métrica é atualizada em tempo real
     threshold_warning = Column(Float, nullable=True)  # Limite para alerta de aviso
     threshold_critical = Column(Float, nullable=True)  # Limite para alerta crítico
-    metadata = Column(JSON, nullable=True)  # Dados adicionais específicos do tipo de métrica
-    category = Column(String, nullable=True)  # Categoria da métrica
+    # "metadata" é reservado pelo Declarative (Base.metadata): o atributo se
+    # chama meta e a coluna no banco mantém o nome metadata
+    meta = Column("metadata", JSONType, nullable=True)  # Dados adicionais específicos do tipo de métrica
+    category = Column(String(24), nullable=True)  # Categoria da métrica
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Opcional: métricas podem ser específicas de usuários
@@ -64,26 +71,73 @@ class Metric(Base):
     user = relationship("User", back_populates="metrics")
     historical_data = relationship("MetricHistory", back_populates="metric")
     alerts = relationship("MetricAlert", back_populates="metric")
+    widgets = relationship("DashboardWidget", back_populates="metric")
 
 
 class MetricHistory(Base):
-    """Histórico de valores de uma métrica ao longo do tempo."""
-    __tablename__ = "metric_history"
+    """
+    Histórico de valores de uma métrica ao longo do tempo.
 
-    id = Column(Integer, primary_key=True, index=True)
+    Particionada por mês em timestamp: consultas por período leem só as
+    partições do intervalo. O PostgreSQL exige a chave de partição na chave
+    primária, por isso ela é (id, timestamp).
+    """
+    __tablename__ = "metric_history"
+    __table_args__ = (
+        # Séries por métrica em ordem de tempo; INCLUDE (value) deixa as
+        # consultas dos dashboards só no índice (index-only scan)
+        Index(
+            "ix_metric_history_metric_timestamp",
+            "metric_id",
+            "timestamp",
+            postgresql_include=["value"],
+        ),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
+
+    id = Column(BigInteger, primary_key=True, server_default=SNOWFLAKE_ID_DEFAULT)
     metric_id = Column(Integer, ForeignKey("metrics.id"), nullable=False)
     value = Column(Float, nullable=True)
-    value_text = Column(String, nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
-    metadata = Column(JSON, nullable=True)  # Contexto adicional para o valor da métrica
+    value_text = Column(String(255), nullable=True)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow, nullable=False)
+    meta = Column("metadata", JSONType, nullable=True)  # Contexto adicional para o valor da métrica
     
     # Relacionamentos
     metric = relationship("Metric", back_populates="historical_data")
 
 
+@event.listens_for(MetricHistory.__table__, "after_create")
+def _create_metric_history_partitions(target, connection, **kw):
+    """Partições iniciais; as seguintes vêm da tarefa periódica do Celery."""
+    if connection.dialect.name == "postgresql":
+        ensure_monthly_partitions(connection, target.name)
+
+
+class MetricHistoryRollup(Base):
+    """
+    Estatísticas suficientes do histórico de uma métrica por intervalo de tempo
+    (hora, dia ou semana). Mantida pelo MetricHistoryAggregator a cada novo valor,
+    para que os dashboards leiam uma linha por intervalo em vez de todos os pontos.
+    """
+    __tablename__ = "metric_history_rollups"
+
+    metric_id = Column(Integer, ForeignKey("metrics.id", ondelete="CASCADE"), primary_key=True)
+    granularity = Column(String(10), primary_key=True)  # hour, day, week
+    bucket_start = Column(DateTime, primary_key=True)  # Início do intervalo (date_trunc)
+    value_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0.0)
+    value_sum_sq = Column(Float, nullable=False, default=0.0)  # Permite calcular a variância
+    value_min = Column(Float, nullable=True)
+    value_max = Column(Float, nullable=True)
+
+
 class MetricAlert(Base):
     """Alertas gerados para métricas que atingiram limiares de aviso ou críticos."""
     __tablename__ = "metric_alerts"
+    __table_args__ = (
+        # Alertas ativos de uma métrica, mais recentes primeiro
+        Index("ix_metric_alerts_metric_active_created", "metric_id", "is_active", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     metric_id = Column(Integer, ForeignKey("metrics.id"), nullable=False)
@@ -106,9 +160,9 @@ class Dashboard(Base):
     __tablename__ = "dashboards"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
-    description = Column(String, nullable=True)
-    layout = Column(JSON, nullable=True)  # Layout dos widgets do dashboard
+    name = Column(String(120), nullable=False)
+    description = Column(String(255), nullable=True)
+    layout = Column(JSONType, nullable=True)  # Layout dos widgets do dashboard
     is_default = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -126,9 +180,9 @@ class DashboardWidget(Base):
     id = Column(Integer, primary_key=True, index=True)
     dashboard_id = Column(Integer, ForeignKey("dashboards.id"), nullable=False)
     metric_id = Column(Integer, ForeignKey("metrics.id"), nullable=True)  # Pode ser nulo se for um widget informativo
-    widget_type = Column(String, nullable=False)  # card, chart, table, etc.
-    title = Column(String, nullable=False)
-    config = Column(JSON, nullable=True)  # Configurações específicas do widget
+    widget_type = Column(String(24), nullable=False)  # card, chart, table, etc.
+    title = Column(String(120), nullable=False)
+    config = Column(JSONType, nullable=True)  # Configurações específicas do widget
     position_x = Column(Integer, nullable=True)
     position_y = Column(Integer, nullable=True)
     width = Column(Integer, nullable=True)
@@ -136,4 +190,4 @@ class DashboardWidget(Base):
     
     # Relacionamentos
     dashboard = relationship("Dashboard", back_populates="widgets")
-    metric = relationship("Metric", backref="widgets")
\ No newline at end of file
+    metric = relationship("Metric", back_populates="widgets")
\ No newline at end of file
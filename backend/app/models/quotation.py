@@ -4,16 +4,18 @@ Models for quotations and risk analysis.
 from datetime import datetime
 from enum import Enum
 import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 
+import numpy as np
 from sqlalchemy import (
-    Boolean, Column, DateTime, Float, ForeignKey, Integer, 
-    String, Text, Table, JSON, Enum as SQLAEnum
+    BigInteger, Boolean, Column, Computed, DateTime, Float, ForeignKey, Integer, 
+    Index, String, Text, Table, and_, case, event, inspect, text
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import deferred, reconstructor, relationship, validates
 from sqlalchemy.ext.hybrid import hybrid_property
 
-from app.models.base import Base
+from app.models.base import Base, JSONType, SNOWFLAKE_ID_DEFAULT, string_enum
 
 
 class QuotationStatus(str, Enum):
@@ -46,7 +48,7 @@ class RiskLevel(str, Enum):
 quotation_tag = Table(
     "quotation_tag", 
     Base.metadata,
-    Column("quotation_id", Integer, ForeignKey("quotations.id"), primary_key=True),
+    Column("quotation_id", Integer, ForeignKey("quotations.id", ondelete="CASCADE"), primary_key=True),
     Column("tag_id", Integer, ForeignKey("quotation_tags.id"), primary_key=True),
 )
 
@@ -71,9 +73,41 @@ class QuotationTag(Base):
         return f"<QuotationTag {self.name}>"
 
 
+# Below this many items the plain Python sums are faster than building arrays
+VECTORIZED_TOTALS_MIN_ITEMS = 256
+
+
 class Quotation(Base):
     """Main quotation entity model"""
     __tablename__ = "quotations"
+    __table_args__ = (
+        # Containment filters on risk details (risk_factors @> '{...}')
+        Index("ix_quotations_risk_factors", "risk_factors", postgresql_using="gin"),
+        # Only the in-flight statuses are filtered often; a partial index over
+        # them stays small
+        Index(
+            "ix_quotations_status_active",
+            "status",
+            postgresql_where=text("status IN ('submitted', 'approved')"),
+        ),
+        # "My quotations" lists: user + status, newest first; INCLUDE covers the
+        # summary columns so the list is served from the index
+        Index(
+            "ix_quotations_customer_status_created",
+            "customer_id", "status", text("created_at DESC"),
+            postgresql_include=["title", "risk_level"],
+        ),
+        Index(
+            "ix_quotations_assigned_status",
+            "assigned_to_id", "status",
+            postgresql_include=["title", "risk_level"],
+        ),
+        Index(
+            "ix_quotations_created_by_status",
+            "created_by_id", "status",
+            postgresql_include=["title", "risk_level"],
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     reference_id = Column(String(50), nullable=False, unique=True, index=True)
@@ -89,7 +123,7 @@ class Quotation(Base):
     expiration_date = Column(DateTime, nullable=True)
     
     # Status and details
-    status = Column(SQLAEnum(QuotationStatus), default=QuotationStatus.DRAFT, nullable=False)
+    status = Column(string_enum(QuotationStatus, "quotation_status"), default=QuotationStatus.DRAFT, nullable=False)
     description = Column(Text, nullable=True)
     notes = Column(Text, nullable=True)
     
@@ -103,47 +137,146 @@ class Quotation(Base):
     
     # Risk analysis
     risk_score = Column(Float, nullable=True)  
-    risk_level = Column(SQLAEnum(RiskLevel), nullable=True)
-    risk_factors = Column(JSON, nullable=True)  # JSON field to store risk factor details
+    risk_level = Column(string_enum(RiskLevel, "risk_level"), nullable=True)
+    risk_factors = Column(JSONType, nullable=True)  # JSON field to store risk factor details
     
     # Margins
     target_profit_margin = Column(Float, nullable=True)
     actual_profit_margin = Column(Float, nullable=True)
     
+    # Denormalized tag ids, maintained by a trigger on quotation_tag; only used
+    # for "has all tags" filtering through its GIN index, so never loaded
+    tag_ids_array = deferred(Column(ARRAY(Integer), nullable=False, server_default="{}"))
+    
+    # Item totals, kept up to date by a trigger on quotation_items so list
+    # queries can read and sort by them without aggregating the items
+    cached_total_cost = Column(Float, nullable=False, default=0.0, server_default="0")
+    cached_total_price = Column(Float, nullable=False, default=0.0, server_default="0")
+    
     # Relationships
-    customer = relationship("User", foreign_keys=[customer_id], backref="customer_quotations")
-    created_by = relationship("User", foreign_keys=[created_by_id], backref="created_quotations")
-    assigned_to = relationship("User", foreign_keys=[assigned_to_id], backref="assigned_quotations")
-    items = relationship("QuotationItem", back_populates="quotation", cascade="all, delete-orphan")
+    customer = relationship("User", foreign_keys=[customer_id], back_populates="customer_quotations")
+    created_by = relationship("User", foreign_keys=[created_by_id], back_populates="created_quotations")
+    assigned_to = relationship("User", foreign_keys=[assigned_to_id], back_populates="assigned_quotations")
+    # Items and tags are needed wherever a quotation is shown: load them with
+    # one extra SELECT per query instead of one per quotation. Deleting a
+    # quotation leaves the items to the ON DELETE CASCADE foreign key
+    items = relationship(
+        "QuotationItem",
+        back_populates="quotation",
+        cascade="all, delete-orphan",
+        lazy="selectin",
+        passive_deletes=True
+    )
     bid_document = relationship("Document", foreign_keys=[bid_document_id])
     tags = relationship(
         "QuotationTag",
         secondary=quotation_tag,
-        back_populates="quotations"
+        back_populates="quotations",
+        lazy="selectin"
+    )
+    # Audit trail is rarely needed: touching it without an explicit
+    # selectinload raises instead of querying. The database cascades deletes,
+    # so deleting a quotation never has to load it
+    history_entries = relationship(
+        "QuotationHistoryEntry",
+        back_populates="quotation",
+        lazy="raise_on_sql",
+        passive_deletes=True
     )
     
+    def _loaded_items(self) -> Optional[List["QuotationItem"]]:
+        """
+        Items already in memory, or None when they were not loaded; never
+        triggers a lazy load, since a total per row would otherwise cost one
+        query per quotation.
+        """
+        state = inspect(self)
+        if state.has_identity and "items" in state.unloaded:
+            return None
+        return self.items
+    
+    @staticmethod
+    def _vectorized_totals(items: List["QuotationItem"]) -> Tuple[float, float]:
+        """
+        (total cost, total price) of the items computed with NumPy over one
+        array per column; same arithmetic as QuotationItem.total_cost/total_price.
+        """
+        count = len(items)
+        
+        def column(name: str) -> np.ndarray:
+            return np.fromiter((getattr(item, name) for item in items), dtype=np.float64, count=count)
+        
+        unit_cost = column("unit_cost")
+        unit_price = column("unit_price")
+        quantity = column("quantity")
+        tax = column("tax_percentage")
+        discount = column("discount_percentage")
+        
+        base_price = unit_price * quantity
+        price_after_discount = base_price - base_price * (discount / 100)
+        price = price_after_discount + price_after_discount * (tax / 100)
+        cost = unit_cost * quantity
+        return float(cost.sum()), float(price.sum())
+    
+    def _item_totals(self) -> Tuple[float, float]:
+        """(total cost, total price) from the loaded items, or the cached columns"""
+        items = self._loaded_items()
+        if items is None:
+            return self.cached_total_cost or 0.0, self.cached_total_price or 0.0
+        if len(items) >= VECTORIZED_TOTALS_MIN_ITEMS:
+            return self._vectorized_totals(items)
+        return (
+            sum(item.total_cost for item in items),
+            sum(item.total_price for item in items)
+        )
+    
     @hybrid_property
     def total_cost(self) -> float:
         """Calculate total cost of all items"""
-        return sum(item.total_cost for item in self.items)
+        return self._item_totals()[0]
+    
+    @total_cost.expression
+    def total_cost(cls):
+        """Trigger-maintained total, usable in WHERE/ORDER BY without a join"""
+        return cls.cached_total_cost
     
     @hybrid_property
     def total_price(self) -> float:
         """Calculate total price of all items"""
-        return sum(item.total_price for item in self.items)
+        return self._item_totals()[1]
+    
+    @total_price.expression
+    def total_price(cls):
+        """Trigger-maintained total (after discount and tax)"""
+        return cls.cached_total_price
     
     @hybrid_property
     def profit(self) -> float:
         """Calculate total profit"""
-        return self.total_price - self.total_cost
+        total_cost, total_price = self._item_totals()
+        return total_price - total_cost
+    
+    @profit.expression
+    def profit(cls):
+        """Total profit from the cached totals"""
+        return cls.total_price - cls.total_cost
     
     @hybrid_property
     def profit_margin_percentage(self) -> float:
         """Calculate profit margin as a percentage"""
-        if self.total_price > 0:
-            return (self.profit / self.total_price) * 100
+        total_cost, total_price = self._item_totals()
+        if total_price > 0:
+            return ((total_price - total_cost) / total_price) * 100
         return 0.0
     
+    @profit_margin_percentage.expression
+    def profit_margin_percentage(cls):
+        """Profit margin as a percentage, 0 when there is no price"""
+        return case(
+            (cls.total_price > 0, cls.profit / cls.total_price * 100),
+            else_=0.0
+        )
+    
     def __repr__(self):
         return f"<Quotation {self.reference_id} ({self.status.value})>"
 
@@ -153,7 +286,7 @@ class QuotationItem(Base):
     __tablename__ = "quotation_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    quotation_id = Column(Integer, ForeignKey("quotations.id"), nullable=False)
+    quotation_id = Column(Integer, ForeignKey("quotations.id", ondelete="CASCADE"), nullable=False)
     
     # Item details
     sku = Column(String(50), nullable=True)
@@ -169,9 +302,9 @@ class QuotationItem(Base):
     discount_percentage = Column(Float, nullable=False, default=0.0)
     
     # Price source and suggestion data
-    price_source = Column(SQLAEnum(PriceSource), default=PriceSource.MANUAL, nullable=False)
+    price_source = Column(string_enum(PriceSource, "price_source"), default=PriceSource.MANUAL, nullable=False)
     suggested_unit_price = Column(Float, nullable=True)
-    price_suggestion_data = Column(JSON, nullable=True)  # Store details about price suggestion
+    price_suggestion_data = Column(JSONType, nullable=True)  # Store details about price suggestion
     
     # Risk and competitiveness
     market_average_price = Column(Float, nullable=True)
@@ -180,50 +313,134 @@ class QuotationItem(Base):
     # Relationships
     quotation = relationship("Quotation", back_populates="items")
     
+    # Columns the derived values below are computed from
+    DERIVED_INPUTS = (
+        "unit_cost", "unit_price", "quantity",
+        "discount_percentage", "tax_percentage", "market_average_price",
+    )
+    
+    @reconstructor
+    def _init_on_load(self):
+        """Compute the derived values once when the item is loaded"""
+        self._derived = self._compute_derived()
+    
+    @validates(*DERIVED_INPUTS)
+    def _invalidate_derived(self, key, value):
+        """Any change to an input makes the cached derived values stale"""
+        self._derived = None
+        return value
+    
+    def _compute_derived(self) -> Dict[str, Any]:
+        total_cost = self.unit_cost * self.quantity
+        base_price = self.unit_price * self.quantity
+        discount_amount = base_price * (self.discount_percentage / 100)
+        price_after_discount = base_price - discount_amount
+        tax_amount = price_after_discount * (self.tax_percentage / 100)
+        total_price = price_after_discount + tax_amount
+        profit = total_price - total_cost
+        
+        is_competitive = None
+        if self.market_average_price and self.unit_price:
+            is_competitive = self.unit_price <= self.market_average_price * 1.05  # Within 5% of market avg
+        
+        return {
+            "total_cost": total_cost,
+            "total_price": total_price,
+            "profit": profit,
+            "profit_margin_percentage": (profit / total_price) * 100 if total_price > 0 else 0.0,
+            "is_competitive": is_competitive,
+        }
+    
+    def _derived_values(self) -> Dict[str, Any]:
+        derived = self.__dict__.get("_derived")
+        if derived is None:
+            derived = self._derived = self._compute_derived()
+        return derived
+    
     @hybrid_property
     def total_cost(self) -> float:
         """Calculate total cost for this item"""
-        return self.unit_cost * self.quantity
+        return self._derived_values()["total_cost"]
+    
+    @total_cost.expression
+    def total_cost(cls):
+        return cls.unit_cost * cls.quantity
     
     @hybrid_property
     def total_price(self) -> float:
         """Calculate total price including tax and discount"""
-        base_price = self.unit_price * self.quantity
-        discount_amount = base_price * (self.discount_percentage / 100)
-        price_after_discount = base_price - discount_amount
-        tax_amount = price_after_discount * (self.tax_percentage / 100)
-        return price_after_discount + tax_amount
+        return self._derived_values()["total_price"]
+    
+    @total_price.expression
+    def total_price(cls):
+        price_after_discount = cls.unit_price * cls.quantity * (1 - cls.discount_percentage / 100)
+        return price_after_discount * (1 + cls.tax_percentage / 100)
     
     @hybrid_property
     def profit(self) -> float:
         """Calculate profit for this item"""
-        return self.total_price - self.total_cost
+        return self._derived_values()["profit"]
+    
+    @profit.expression
+    def profit(cls):
+        return cls.total_price - cls.total_cost
     
     @hybrid_property
     def profit_margin_percentage(self) -> float:
         """Calculate profit margin as a percentage"""
-        if self.total_price > 0:
-            return (self.profit / self.total_price) * 100
-        return 0.0
+        return self._derived_values()["profit_margin_percentage"]
+    
+    @profit_margin_percentage.expression
+    def profit_margin_percentage(cls):
+        return case(
+            (cls.total_price > 0, cls.profit / cls.total_price * 100),
+            else_=0.0
+        )
     
     @hybrid_property
     def is_competitive(self) -> bool:
         """Determine if the price is competitive compared to market average"""
-        if self.market_average_price and self.unit_price:
-            return self.unit_price <= self.market_average_price * 1.05  # Within 5% of market avg
-        return None
+        return self._derived_values()["is_competitive"]
+    
+    @is_competitive.expression
+    def is_competitive(cls):
+        return case(
+            (
+                and_(cls.market_average_price != 0, cls.unit_price != 0),
+                cls.unit_price <= cls.market_average_price * 1.05
+            ),
+            else_=None
+        )
     
     def __repr__(self):
         return f"<QuotationItem {self.name} (Qty: {self.quantity})>"
 
 
+@event.listens_for(QuotationItem, "expire")
+def _expire_quotation_item_derived(target, attrs):
+    """Expired attributes are reloaded without validators: drop the cache too"""
+    target._derived = None
+
+
 class HistoricalPrice(Base):
     """Historical prices for items to aid in price suggestions"""
     __tablename__ = "historical_prices"
+    __table_args__ = (
+        # Price history of one SKU in (date, id) order; INCLUDE carries what the
+        # price suggestion reads and filters on, for index-only scans
+        Index(
+            "ix_historical_prices_sku_date",
+            "item_sku", text("date_recorded DESC"), text("id DESC"),
+            postgresql_include=["unit_price", "region", "customer_type"],
+        ),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    # Append-only and write-heavy: time-ordered snowflake ID instead of a sequence
+    id = Column(BigInteger, primary_key=True, server_default=SNOWFLAKE_ID_DEFAULT)
     item_sku = Column(String(50), nullable=True, index=True)
     item_name = Column(String(200), nullable=False, index=True)
+    # Lowercased copy kept by the database; name searches use LIKE against it
+    item_name_lc = Column(Text, Computed("lower(item_name)", persisted=True))
     unit_price = Column(Float, nullable=False)
     date_recorded = Column(DateTime, default=datetime.utcnow, nullable=False)
     source = Column(String(50), nullable=False)  # e.g. "internal", "market", "competitor"
@@ -236,7 +453,7 @@ class HistoricalPrice(Base):
     bid_result = Column(String(20), nullable=True)  # "won", "lost", "pending"
     
     # Optional link to a specific quotation item
-    quotation_item_id = Column(Integer, ForeignKey("quotation_items.id"), nullable=True)
+    quotation_item_id = Column(Integer, ForeignKey("quotation_items.id", ondelete="SET NULL"), nullable=True)
     
     def __repr__(self):
         return f"<HistoricalPrice {self.item_name} ${self.unit_price}>"
@@ -252,7 +469,7 @@ class RiskFactor(Base):
     weight = Column(Float, nullable=False, default=1.0)  # Weight in risk calculation
     
     # Risk calculation parameters stored as JSON
-    parameters = Column(JSON, nullable=True)
+    parameters = Column(JSONType, nullable=True)
     
     def __repr__(self):
         return f"<RiskFactor {self.name}>"
@@ -261,16 +478,24 @@ class RiskFactor(Base):
 class QuotationHistoryEntry(Base):
     """Track changes to quotations over time"""
     __tablename__ = "quotation_history"
+    __table_args__ = (
+        # Created by migration 0006; audit views page by (timestamp, id)
+        Index(
+            "ix_quotation_history_quotation_timestamp_id",
+            "quotation_id", text("timestamp DESC"), text("id DESC"),
+        ),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    quotation_id = Column(Integer, ForeignKey("quotations.id"), nullable=False)
+    # Append-only audit log: time-ordered snowflake ID instead of a sequence
+    id = Column(BigInteger, primary_key=True, server_default=SNOWFLAKE_ID_DEFAULT)
+    quotation_id = Column(Integer, ForeignKey("quotations.id", ondelete="CASCADE"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
     action = Column(String(50), nullable=False)  # e.g. "created", "updated", "status_change"
-    details = Column(JSON, nullable=True)  # JSON with specific changes
+    details = Column(JSONType, nullable=True)  # JSON with specific changes
     
     # Relationships
-    quotation = relationship("Quotation")
+    quotation = relationship("Quotation", back_populates="history_entries")
     user = relationship("User")
     
     def __repr__(self):
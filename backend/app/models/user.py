@@ -1,12 +1,12 @@
 """
 Modelo de exemplo para demonstrar o uso do ORM.
 """
-from sqlalchemy import Column, Integer, String, Text, Boolean, ForeignKey, Table, Enum
+from sqlalchemy import CheckConstraint, Column, Integer, SmallInteger, String, Text, Boolean, DateTime, ForeignKey, Table, Index, text
 from sqlalchemy.orm import relationship
 from uuid import uuid4
 import enum
 
-from app.models.base import BaseModel
+from app.models.base import BaseModel, SmallIntEnum
 
 
 class Role(enum.Enum):
@@ -25,6 +25,14 @@ class Provider(enum.Enum):
     GITHUB = "github"
 
 
+# Códigos gravados no banco (SMALLINT); nunca reaproveitar um código removido
+ROLE_CODES = {Role.ADMIN: 1, Role.MANAGER: 2, Role.STAFF: 3, Role.USER: 4}
+PROVIDER_CODES = {Provider.LOCAL: 1, Provider.GOOGLE: 2, Provider.MICROSOFT: 3, Provider.GITHUB: 4}
+
+RoleType = SmallIntEnum(Role, ROLE_CODES)
+ProviderType = SmallIntEnum(Provider, PROVIDER_CODES)
+
+
 # Tabela de associação para relacionamento many-to-many entre usuários e permissões
 user_permission = Table(
     "user_permission",
@@ -56,6 +64,23 @@ class User(BaseModel):
     Modelo para usuários do sistema.
     """
     __tablename__ = "users"
+    __table_args__ = (
+        # Busca de login OAuth (get_by_oauth_id); parcial porque usuários LOCAL
+        # não têm oauth_id, e única: uma conta por identidade no provedor
+        Index(
+            "ix_users_oauth",
+            "auth_provider",
+            "oauth_id",
+            unique=True,
+            postgresql_where=text("oauth_id IS NOT NULL"),
+        ),
+        # Índices parciais: só contêm as linhas que as consultas frequentes buscam
+        Index("ix_users_active", "id", postgresql_where=text("is_active = true")),
+        Index("ix_users_superuser", "id", postgresql_where=text("is_superuser = true")),
+        Index("ix_users_email_active", "email", unique=True, postgresql_where=text("is_active = true")),
+        CheckConstraint(RoleType.check_sql("role"), name="role"),
+        CheckConstraint(ProviderType.check_sql("auth_provider"), name="provider"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
@@ -66,17 +91,26 @@ class User(BaseModel):
     is_superuser = Column(Boolean, default=False)
     
     # Novos campos para autenticação e autorização
-    role = Column(Enum(Role), default=Role.USER, nullable=False)
-    auth_provider = Column(Enum(Provider), default=Provider.LOCAL, nullable=False)
+    role = Column(RoleType, default=Role.USER, nullable=False)
+    auth_provider = Column(ProviderType, default=Provider.LOCAL, nullable=False)
     oauth_id = Column(String(255))  # ID no provedor externo para usuários OAuth
     totp_secret = Column(String(255))  # Segredo para 2FA/TOTP
     is_verified = Column(Boolean, default=False)  # Email verificado
-    failed_login_attempts = Column(Integer, default=0)  # Controle de tentativas de login
-    last_login = Column(String(255))  # Último login bem-sucedido
+    failed_login_attempts = Column(SmallInteger, default=0)  # Controle de tentativas de login
+    last_login = Column(DateTime)  # Último login bem-sucedido
 
     # Relacionamentos
     items = relationship("Item", back_populates="owner")
     permissions = relationship("Permission", secondary=user_permission, back_populates="users")
+    # Lados inversos declarados explicitamente (back_populates), em vez de
+    # backref criado implicitamente ao importar o outro modelo
+    conversations = relationship("Conversation", secondary="conversation_members", back_populates="members")
+    customer_quotations = relationship("Quotation", foreign_keys="Quotation.customer_id", back_populates="customer")
+    created_quotations = relationship("Quotation", foreign_keys="Quotation.created_by_id", back_populates="created_by")
+    assigned_quotations = relationship("Quotation", foreign_keys="Quotation.assigned_to_id", back_populates="assigned_to")
+    documents = relationship("Document", foreign_keys="Document.uploaded_by_id", back_populates="uploaded_by")
+    metrics = relationship("Metric", back_populates="user")
+    dashboards = relationship("Dashboard", back_populates="user")
 
     def __repr__(self):
         return f"<User {self.username}>"
@@ -1,23 +1,42 @@
 """
 Serviço avançado de cache para armazenar resultados de consultas pesadas e relatórios.
 """
-import json
+import asyncio
+from collections import OrderedDict
 import logging
-from typing import Any, Dict, List, Optional, TypeVar, Generic, Callable, Union, Tuple
+import time
+from typing import Any, Dict, List, Optional, TypeVar, Callable, Tuple
 import hashlib
-import pickle
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import wraps
 
+import orjson
 from redis.asyncio import Redis
 
-from app.db.redis import get_redis_client
-from app.services.cache import CacheService
+from app.db.redis import get_async_redis_client
+from app.services.cache import (
+    CacheService,
+    decode_cache_value,
+    dump_cache_value,
+    encode_cache_value,
+    load_cache_value,
+    skips_first_arg,
+)
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# Relatórios recentes mantidos por usuário e por quanto tempo a lista vive
+USER_REPORTS_LIMIT = 10
+USER_REPORTS_TTL_SECONDS = 86400  # 24 horas
+
+# Limite de entradas do cache em memória; acima dele sai a menos usada (LRU)
+DEFAULT_MEMORY_MAX_ENTRIES = 10_000
+
+# Por quanto tempo um miss no Redis é lembrado: evita repetir o GET em rajadas
+NEGATIVE_CACHE_TTL_SECONDS = 1.0
+
 
 class AdvancedCacheService:
     """
@@ -29,26 +48,42 @@ class AdvancedCacheService:
     - Cache com múltiplos níveis (memória e redis)
     """
     
-    def __init__(self, redis_client: Redis):
+    def __init__(self, redis_client: Redis, max_entries: int = DEFAULT_MEMORY_MAX_ENTRIES):
         self.redis = redis_client
         self.base_cache = CacheService(redis_client)
-        self._memory_cache: Dict[str, Tuple[Any, datetime]] = {}
+        self._max_entries = max_entries
+        # Valor e prazo de expiração em time.monotonic(), na ordem de uso
+        # (menos recente primeiro): acesso e despejo LRU em O(1)
+        self._memory_cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        # Chaves que deram miss no Redis há pouco -> prazo em time.monotonic()
+        self._negative_cache: "OrderedDict[str, float]" = OrderedDict()
+        # Cálculos em andamento por chave (single-flight)
+        self._inflight: Dict[str, asyncio.Future] = {}
     
-    async def get_from_memory(self, key: str) -> Optional[Any]:
-        """Recupera um valor do cache em memória."""
-        if key in self._memory_cache:
-            value, expiry = self._memory_cache[key]
-            if expiry > datetime.now():
-                return value
-            else:
-                # Remove itens expirados
-                del self._memory_cache[key]
+    def get_from_memory(self, key: str) -> Optional[Any]:
+        """
+        Recupera um valor do cache em memória.
+        Síncrono: não faz I/O, e um acerto não aloca nem uma corrotina.
+        """
+        entry = self._memory_cache.get(key)
+        if entry is None:
+            return None
+
+        value, expiry = entry
+        if expiry > time.monotonic():
+            self._memory_cache.move_to_end(key)
+            return value
+
+        # Remove itens expirados
+        del self._memory_cache[key]
         return None
     
     def set_in_memory(self, key: str, value: Any, ttl_seconds: int = 60) -> None:
-        """Armazena um valor no cache em memória."""
-        expiry = datetime.now() + timedelta(seconds=ttl_seconds)
-        self._memory_cache[key] = (value, expiry)
+        """Armazena um valor no cache em memória, descartando os menos usados acima do limite."""
+        self._memory_cache[key] = (value, time.monotonic() + ttl_seconds)
+        self._memory_cache.move_to_end(key)
+        while len(self._memory_cache) > self._max_entries:
+            self._memory_cache.popitem(last=False)
     
     async def get_or_set_multi_level(
         self,
@@ -65,43 +100,103 @@ class AdvancedCacheService:
         """
         if not force_refresh:
             # Primeiro tenta do cache em memória (mais rápido)
-            memory_value = await self.get_from_memory(key)
+            memory_value = self.get_from_memory(key)
             if memory_value is not None:
-                logger.debug(f"Cache hit (memory): {key}")
+                logger.debug("Cache hit (memory): %s", key)
                 return memory_value
             
-            # Depois tenta do Redis
-            redis_value = await self.base_cache.get(key)
-            if redis_value:
-                try:
-                    parsed_value = json.loads(redis_value)
+            # Depois tenta do Redis, a menos que ele tenha dado miss há pouco
+            if not self._recent_miss(key):
+                redis_value = await self.base_cache.get(key)
+                if redis_value:
+                    parsed_value = decode_cache_value(redis_value)
                     # Atualiza também o cache em memória
                     self.set_in_memory(key, parsed_value, memory_ttl)
-                    logger.debug(f"Cache hit (redis): {key}")
+                    logger.debug("Cache hit (redis): %s", key)
                     return parsed_value
-                except json.JSONDecodeError:
-                    return redis_value
-        
-        # Executa o callback para obter o valor
-        logger.debug(f"Cache miss: {key}")
-        value = await callback()
+                self._record_miss(key)
         
-        # Armazena no redis
-        await self.base_cache.set(key, value, redis_ttl)
-        
-        # Armazena em memória
-        self.set_in_memory(key, value, memory_ttl)
+        # Chamadas concorrentes para a mesma chave aguardam o cálculo já em
+        # andamento em vez de executar o callback de novo (proteção contra stampede)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            # Executa o callback para obter o valor
+            logger.debug("Cache miss: %s", key)
+            value = await callback()
+            
+            # Armazena no redis
+            await self.base_cache.set(key, value, redis_ttl)
+            
+            # Armazena em memória
+            self.set_in_memory(key, value, memory_ttl)
+            self._negative_cache.pop(key, None)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Marca a exceção como lida: quem chamou já a recebe pelo raise
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            del self._inflight[key]
         
         return value
+
+    def _recent_miss(self, key: str) -> bool:
+        """Indica se a chave deu miss no Redis há menos de NEGATIVE_CACHE_TTL_SECONDS."""
+        expiry = self._negative_cache.get(key)
+        if expiry is None:
+            return False
+        if expiry > time.monotonic():
+            return True
+        del self._negative_cache[key]
+        return False
+
+    def _record_miss(self, key: str) -> None:
+        """Registra um miss no Redis, com o mesmo limite de entradas do cache em memória."""
+        self._negative_cache[key] = time.monotonic() + NEGATIVE_CACHE_TTL_SECONDS
+        self._negative_cache.move_to_end(key)
+        while len(self._negative_cache) > self._max_entries:
+            self._negative_cache.popitem(last=False)
     
+    @staticmethod
+    def user_reports_key(user_id: int) -> str:
+        """
+        Chave do ZSET Redis com os relatórios recentes do usuário: membro
+        {"id", "type"}, score = momento da última geração (epoch).
+        Nome diferente das versões anteriores (blob JSON e LIST) para não
+        colidir com elas (WRONGTYPE) enquanto as chaves antigas não expiram.
+        """
+        return f"user:{user_id}:report_index"
+
+    @staticmethod
+    def report_content_id(report_type: str, user_id: Optional[int], content: bytes) -> str:
+        """
+        ID de relatório derivado do conteúdo: relatórios idênticos do mesmo
+        tipo e usuário caem na mesma chave em vez de gravar cópias.
+        """
+        hasher = hashlib.sha1(f"{report_type}:{user_id}:".encode('utf-8'), usedforsecurity=False)
+        hasher.update(content)
+        return hasher.hexdigest()[:32]
+
     @staticmethod
     def hash_params(*args, **kwargs) -> str:
         """
         Cria um hash único baseado nos parâmetros fornecidos.
         Útil para gerar chaves de cache para funções com parâmetros complexos.
         """
-        # Converter argumentos para string e fazer hash
-        hasher = hashlib.md5()
+        # Converter argumentos para string e fazer hash. Chave de cache não é
+        # uso criptográfico: SHA-1 (acelerado por hardware) custa cerca de
+        # metade do MD5 tanto para argumentos curtos quanto longos
+        hasher = hashlib.sha1(usedforsecurity=False)
         
         # Adiciona args ao hash
         for arg in args:
@@ -111,7 +206,8 @@ class AdvancedCacheService:
         for k, v in sorted(kwargs.items()):
             hasher.update(f"{k}:{v}".encode('utf-8'))
             
-        return hasher.hexdigest()
+        # 32 caracteres, mesmo tamanho das chaves geradas com MD5
+        return hasher.hexdigest()[:32]
     
     async def cache_report(
         self, 
@@ -124,9 +220,14 @@ class AdvancedCacheService:
         Armazena os resultados de um relatório em cache.
         Retorna um ID único para recuperar o relatório posteriormente.
         """
-        # Gera um ID único para o relatório
-        timestamp = datetime.now().isoformat()
-        report_id = self.hash_params(report_type, user_id, timestamp)
+        # Gera o ID a partir do conteúdo (chaves ordenadas: mesmo dado, mesmo ID)
+        now = datetime.now()
+        timestamp = now.isoformat()
+        report_id = self.report_content_id(
+            report_type,
+            user_id,
+            orjson.dumps(report_data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS)
+        )
         
         # Cria a chave do cache
         cache_key = f"report:{report_type}:{report_id}"
@@ -140,36 +241,27 @@ class AdvancedCacheService:
             "data": report_data
         }
         
-        # Armazena no Redis com TTL
-        await self.base_cache.set(cache_key, report_cache, ttl_seconds)
-        
-        # Também adiciona à lista de relatórios do usuário, se aplicável
-        if user_id:
-            user_reports_key = f"user:{user_id}:reports"
-            try:
-                # Obtém a lista atual de relatórios do usuário
-                user_reports = await self.base_cache.get(user_reports_key)
-                if user_reports:
-                    reports_list = json.loads(user_reports)
-                else:
-                    reports_list = []
-                
-                # Adiciona o novo relatório ao início da lista (mais recente primeiro)
-                reports_list.insert(0, {
-                    "id": report_id,
-                    "type": report_type,
-                    "generated_at": timestamp
-                })
-                
-                # Limita a quantidade de relatórios na lista (manter apenas os 10 mais recentes)
-                if len(reports_list) > 10:
-                    reports_list = reports_list[:10]
-                    
-                # Atualiza a lista no cache
-                await self.base_cache.set(user_reports_key, reports_list, 86400)  # 24 horas
-                
-            except Exception as e:
-                logger.error(f"Erro ao atualizar lista de relatórios do usuário: {e}")
+        # Relatório e índice do usuário são gravados juntos, em um único round-trip.
+        # Todos os comandos são idempotentes: repetir um relatório idêntico não
+        # regrava o blob (SET NX) nem duplica a entrada do índice (ZADD), mas
+        # renova o TTL (EXPIRE), já que o cliente recebe expires_in = ttl_seconds
+        try:
+            async with self.base_cache.pipeline() as pipe:
+                pipe.set(cache_key, encode_cache_value(report_cache), ex=ttl_seconds, nx=True)
+                pipe.expire(cache_key, ttl_seconds)
+
+                # Também adiciona ao índice de relatórios do usuário, se aplicável
+                if user_id:
+                    user_reports_key = self.user_reports_key(user_id)
+                    # Um relatório repetido só tem o score atualizado (volta ao topo)
+                    pipe.zadd(user_reports_key, {
+                        dump_cache_value({"id": report_id, "type": report_type}): now.timestamp()
+                    })
+                    # Mantém apenas os USER_REPORTS_LIMIT mais recentes
+                    pipe.zremrangebyrank(user_reports_key, 0, -(USER_REPORTS_LIMIT + 1))
+                    pipe.expire(user_reports_key, USER_REPORTS_TTL_SECONDS)
+        except Exception as e:
+            logger.error(f"Erro ao armazenar relatório no cache: {e}")
         
         return report_id
     
@@ -189,7 +281,7 @@ class AdvancedCacheService:
             return None
             
         try:
-            report = json.loads(report_data)
+            report = decode_cache_value(report_data)
             
             # Verifica se o relatório pertence ao usuário, se um ID de usuário for fornecido
             if user_id and report.get("user_id") and int(report["user_id"]) != int(user_id):
@@ -197,7 +289,7 @@ class AdvancedCacheService:
                 return None
                 
             return report
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error(f"Erro ao decodificar relatório do cache: {report_id}")
             return None
     
@@ -208,17 +300,24 @@ class AdvancedCacheService:
         """
         Lista todos os relatórios em cache para um usuário específico.
         """
-        user_reports_key = f"user:{user_id}:reports"
-        reports_data = await self.base_cache.get(user_reports_key)
-        
-        if not reports_data:
-            return []
-            
         try:
-            return json.loads(reports_data)
-        except json.JSONDecodeError:
+            reports_data = await self.redis.zrevrange(
+                self.user_reports_key(user_id), 0, -1, withscores=True
+            )
+            # Mais recente primeiro; generated_at vem do score
+            return [
+                {
+                    **load_cache_value(report),
+                    "generated_at": datetime.fromtimestamp(generated_at).isoformat()
+                }
+                for report, generated_at in reports_data
+            ]
+        except orjson.JSONDecodeError:
             logger.error(f"Erro ao decodificar lista de relatórios do usuário: {user_id}")
             return []
+        except Exception as e:
+            logger.error(f"Erro ao obter lista de relatórios do usuário: {e}")
+            return []
 
 
 # Decorator para cache multinível
@@ -232,21 +331,20 @@ def advanced_cached(
     Muito mais eficiente para funções chamadas frequentemente.
     """
     def decorator(func):
+        # Resolvido na decoração: ignorar o parâmetro self/cls de métodos
+        first_arg = 1 if skips_first_arg(func) else 0
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Ignorar o parâmetro self para métodos de classe
-            args_to_use = args[1:] if args and hasattr(args[0], '__class__') else args
+            # Verifica se force_refresh foi passado como parâmetro (não faz parte da chave)
+            force_refresh = kwargs.pop('force_refresh', False)
             
             # Gera um hash dos argumentos para criar uma chave única
-            params_hash = AdvancedCacheService.hash_params(*args_to_use, **kwargs)
+            params_hash = AdvancedCacheService.hash_params(*args[first_arg:], **kwargs)
             cache_key = f"{key_prefix}:{params_hash}"
             
-            # Obtém cliente redis
-            redis_client = await get_redis_client()
-            advanced_cache = AdvancedCacheService(redis_client)
-            
-            # Verifica se force_refresh foi passado como parâmetro
-            force_refresh = kwargs.pop('force_refresh', False) if 'force_refresh' in kwargs else False
+            # Serviço compartilhado: o cache em memória persiste entre chamadas
+            advanced_cache = await get_advanced_cache_service()
             
             # Função para obter o valor real
             async def fetch_value():
@@ -266,7 +364,18 @@ def advanced_cached(
     return decorator
 
 
+# Instância global do serviço avançado de cache
+_advanced_cache_service: Optional[AdvancedCacheService] = None
+
+
 async def get_advanced_cache_service() -> AdvancedCacheService:
-    """Cria e retorna uma instância do serviço avançado de cache."""
-    redis_client = await get_redis_client()
-    return AdvancedCacheService(redis_client)
\ No newline at end of file
+    """
+    Retorna a instância global do serviço avançado de cache.
+    Uma única instância por processo, para que o nível em memória seja
+    de fato compartilhado entre chamadas (antes cada chamada criava um
+    cache em memória novo e vazio).
+    """
+    global _advanced_cache_service
+    if _advanced_cache_service is None:
+        _advanced_cache_service = AdvancedCacheService(get_async_redis_client())
+    return _advanced_cache_service
\ No newline at end of file
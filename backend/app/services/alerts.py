@@ -2,10 +2,11 @@
 Serviço para gerenciamento de alertas de métricas.
 """
 import logging
-from datetime import datetime
+from math import copysign
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 
-from sqlalchemy import select, update
+from sqlalchemy import Row, Select, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.metric import Metric, MetricAlert
@@ -13,6 +14,19 @@ from app.services.cache import cached, get_cache_service
 
 logger = logging.getLogger(__name__)
 
+# Tag das entradas de cache derivadas de alertas (resumos); invalidada a cada mudança
+ALERTS_CACHE_TAG = "alerts"
+
+
+def _exceeds(threshold: Optional[float], value: float) -> bool:
+    """
+    Indica se o valor atingiu o limiar. Limiar positivo é atingido por
+    valores >= limiar; negativo, por valores <= limiar; zero ou None nunca.
+    Uma única comparação: multiplicar pelo sinal do limiar (±1.0, exato)
+    transforma "<=" em ">=".
+    """
+    return bool(threshold) and (value - threshold) * copysign(1.0, threshold) >= 0
+
 
 class AlertService:
     """Serviço para gerenciamento de alertas de métricas."""
@@ -43,8 +57,52 @@ class AlertService:
         Returns:
             Lista de alertas que atendem aos critérios
         """
-        query = select(MetricAlert)
-        
+        query = self._filter_alerts(
+            select(MetricAlert), is_active, is_acknowledged, severity, metric_id, user_id, limit
+        )
+        result = await self.db.execute(query)
+        return result.scalars().all()
+
+    async def get_alert_rows(
+        self,
+        is_active: Optional[bool] = None,
+        is_acknowledged: Optional[bool] = None,
+        severity: Optional[str] = None,
+        metric_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[Row]:
+        """
+        Como get_alerts, mas retorna só as colunas usadas em contagens e
+        listagens (id, metric_id, severity, is_active, is_acknowledged,
+        created_at), sem hidratar objetos ORM. Use get_alerts quando o
+        alerta for alterado.
+        """
+        query = self._filter_alerts(
+            select(
+                MetricAlert.id,
+                MetricAlert.metric_id,
+                MetricAlert.severity,
+                MetricAlert.is_active,
+                MetricAlert.is_acknowledged,
+                MetricAlert.created_at,
+            ),
+            is_active, is_acknowledged, severity, metric_id, user_id, limit
+        )
+        result = await self.db.execute(query)
+        return result.all()
+
+    @staticmethod
+    def _filter_alerts(
+        query: Select,
+        is_active: Optional[bool],
+        is_acknowledged: Optional[bool],
+        severity: Optional[str],
+        metric_id: Optional[int],
+        user_id: Optional[int],
+        limit: int,
+    ) -> Select:
+        """Aplica os filtros de get_alerts/get_alert_rows, a ordenação e o limite."""
         if is_active is not None:
             query = query.where(MetricAlert.is_active == is_active)
         if is_acknowledged is not None:
@@ -57,10 +115,7 @@ class AlertService:
             query = query.where(MetricAlert.acknowledged_by == user_id)
             
         # Ordena por criação (mais recentes primeiro)
-        query = query.order_by(MetricAlert.created_at.desc()).limit(limit)
-        
-        result = await self.db.execute(query)
-        return result.scalars().all()
+        return query.order_by(MetricAlert.created_at.desc()).limit(limit)
     
     async def get_alert_by_id(self, alert_id: int) -> Optional[MetricAlert]:
         """Recupera um alerta pelo ID."""
@@ -68,6 +123,24 @@ class AlertService:
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
     
+    @staticmethod
+    def _alert_condition(metric: Metric, current_value: float) -> Optional[Tuple[str, str]]:
+        """
+        Avalia os limiares da métrica para um valor.
+
+        Returns:
+            (severidade, mensagem) da condição atingida, ou None se nenhuma foi atingida
+        """
+        # Verifica condições de alerta crítico
+        if _exceeds(metric.threshold_critical, current_value):
+            return "critical", f"Valor crítico atingido para {metric.name}: {current_value} {metric.unit or ''}"
+
+        # Verifica condições de alerta de aviso
+        if _exceeds(metric.threshold_warning, current_value):
+            return "warning", f"Valor de aviso atingido para {metric.name}: {current_value} {metric.unit or ''}"
+
+        return None
+
     async def check_metric_alert_conditions(
         self, 
         metric: Metric, 
@@ -83,73 +156,103 @@ class AlertService:
         Returns:
             Alerta criado ou None se nenhuma condição foi atingida
         """
-        # Verifica se existe um alerta ativo para esta métrica
+        alerts = await self.check_metric_alerts_batch([(metric, current_value)])
+        return alerts[0]
+
+    async def check_metric_alerts_batch(
+        self,
+        items: List[Tuple[Metric, float]]
+    ) -> List[Optional[MetricAlert]]:
+        """
+        Verifica as condições de alerta de várias métricas de uma vez.
+
+        Os alertas ativos de todas as métricas vêm de uma única consulta;
+        alertas novos, promovidos a crítico ou resolvidos são gravados com um
+        único flush, e o cache de alertas é invalidado uma só vez.
+
+        Args:
+            items: Pares (métrica, valor atual)
+
+        Returns:
+            Para cada item, na mesma ordem, o alerta ativo resultante ou None
+        """
+        if not items:
+            return []
+
+        # Alertas ativos das métricas do lote, indexados por metric_id
         existing_alert_query = select(MetricAlert).where(
-            (MetricAlert.metric_id == metric.id) & 
+            MetricAlert.metric_id.in_({metric.id for metric, _ in items}) &
             (MetricAlert.is_active == True)
         )
         existing_alert_result = await self.db.execute(existing_alert_query)
-        existing_alert = existing_alert_result.scalar_one_or_none()
-        
-        # Se não temos limiares configurados, não há nada a verificar
-        if metric.threshold_critical is None and metric.threshold_warning is None:
-            # Se existir um alerta ativo, podemos resolvê-lo
-            if existing_alert:
-                await self.resolve_alert(existing_alert.id)
-            return None
-        
-        # Verifica condições de alerta crítico
-        if (metric.threshold_critical is not None and 
-            ((metric.threshold_critical > 0 and current_value >= metric.threshold_critical) or
-             (metric.threshold_critical < 0 and current_value <= metric.threshold_critical))):
-            
-            # Temos uma condição crítica
-            severity = "critical"
-            message = f"Valor crítico atingido para {metric.name}: {current_value} {metric.unit or ''}"
-            
-            # Se já existe um alerta crítico, não criamos outro
-            if existing_alert and existing_alert.severity == "critical":
-                return existing_alert
-                
+        active_alerts = {alert.metric_id: alert for alert in existing_alert_result.scalars()}
+
+        now = datetime.utcnow()
+        results: List[Optional[MetricAlert]] = []
+        new_alerts: List[MetricAlert] = []
+        changed = False
+
+        for metric, current_value in items:
+            existing_alert = active_alerts.get(metric.id)
+            condition = self._alert_condition(metric, current_value)
+
+            if condition is None:
+                # Sem limiares ou sem condição atingida: resolve o alerta ativo, se houver
+                if existing_alert:
+                    existing_alert.is_active = False
+                    existing_alert.resolved_at = now
+                    del active_alerts[metric.id]
+                    changed = True
+                results.append(None)
+                continue
+
+            severity, message = condition
+
+            if existing_alert is None:
+                alert = MetricAlert(
+                    metric_id=metric.id,
+                    severity=severity,
+                    message=message,
+                    value=current_value,
+                    is_active=True,
+                    is_acknowledged=False,
+                    created_at=now
+                )
+                new_alerts.append(alert)
+                # Uma métrica repetida no lote reaproveita o alerta recém-criado
+                active_alerts[metric.id] = alert
+                changed = True
+                results.append(alert)
+                continue
+
             # Se existe um alerta de warning, atualizamos para crítico
-            if existing_alert and existing_alert.severity == "warning":
+            if severity == "critical" and existing_alert.severity == "warning":
                 existing_alert.severity = "critical"
                 existing_alert.message = message
                 existing_alert.value = current_value
                 existing_alert.is_acknowledged = False  # Desmarca o reconhecimento
-                self.db.add(existing_alert)
-                await self.db.flush()
-                
-                # Invalida cache relacionado
-                cache_service = await get_cache_service()
-                await cache_service.invalidate_pattern(f"alert:*")
-                
-                return existing_alert
-            
-            # Cria um novo alerta crítico
-            return await self.create_alert(metric.id, severity, message, current_value)
-            
-        # Verifica condições de alerta de aviso
-        elif (metric.threshold_warning is not None and 
-              ((metric.threshold_warning > 0 and current_value >= metric.threshold_warning) or
-               (metric.threshold_warning < 0 and current_value <= metric.threshold_warning))):
-            
-            # Temos uma condição de aviso
-            severity = "warning"
-            message = f"Valor de aviso atingido para {metric.name}: {current_value} {metric.unit or ''}"
-            
-            # Se já existe um alerta, não criamos outro
-            if existing_alert:
-                return existing_alert
-                
-            # Cria um novo alerta de aviso
-            return await self.create_alert(metric.id, severity, message, current_value)
-            
-        # Se não atingiu nenhuma condição, mas temos um alerta ativo, podemos resolvê-lo
-        elif existing_alert:
-            await self.resolve_alert(existing_alert.id)
-            
-        return None
+                changed = True
+
+            # Caso contrário já existe um alerta ativo: não criamos outro
+            results.append(existing_alert)
+
+        if not changed:
+            return results
+
+        self.db.add_all(new_alerts)
+        await self.db.flush()
+
+        # Invalida cache relacionado
+        cache_service = await get_cache_service()
+        await cache_service.invalidate_tag(ALERTS_CACHE_TAG)
+
+        for alert in new_alerts:
+            logger.info(f"Alerta criado: {alert.message} [severity={alert.severity}]")
+            # Notifica via Webhook ou outros canais para alertas críticos
+            if alert.severity == "critical":
+                await self._notify_critical_alert(alert)
+
+        return results
     
     async def create_alert(
         self, 
@@ -185,7 +288,7 @@ class AlertService:
         
         # Invalida cache relacionado
         cache_service = await get_cache_service()
-        await cache_service.invalidate_pattern(f"alert:*")
+        await cache_service.invalidate_tag(ALERTS_CACHE_TAG)
         
         logger.info(f"Alerta criado: {message} [severity={severity}]")
         
@@ -255,7 +358,7 @@ class AlertService:
         
         # Invalida cache relacionado
         cache_service = await get_cache_service()
-        await cache_service.invalidate_pattern(f"alert:*")
+        await cache_service.invalidate_tag(ALERTS_CACHE_TAG)
         
         return alert
     
@@ -284,11 +387,11 @@ class AlertService:
         
         # Invalida cache relacionado
         cache_service = await get_cache_service()
-        await cache_service.invalidate_pattern(f"alert:*")
+        await cache_service.invalidate_tag(ALERTS_CACHE_TAG)
         
         return alert
     
-    @cached(key_prefix="alert_summary", ttl_seconds=60)
+    @cached(key_prefix="alert_summary", ttl_seconds=60, tags=(ALERTS_CACHE_TAG,))
     async def get_alert_summary(self) -> Dict[str, Any]:
         """
         Retorna um resumo dos alertas ativos no sistema.
@@ -296,31 +399,28 @@ class AlertService:
         Returns:
             Resumo com contagem de alertas por severidade e status
         """
-        # Total de alertas ativos
-        active_alerts_query = select(MetricAlert).where(MetricAlert.is_active == True)
-        active_alerts_result = await self.db.execute(active_alerts_query)
-        active_alerts = active_alerts_result.scalars().all()
-        
-        # Contagem por severidade
-        critical_count = sum(1 for alert in active_alerts if alert.severity == "critical")
-        warning_count = sum(1 for alert in active_alerts if alert.severity == "warning")
-        
-        # Contagem por status de reconhecimento
-        acknowledged_count = sum(1 for alert in active_alerts if alert.is_acknowledged)
-        unacknowledged_count = len(active_alerts) - acknowledged_count
-        
         # Alertas recentes (criados nas últimas 24h)
         now = datetime.utcnow()
-        recent_cutoff = now - datetime.timedelta(hours=24)
-        recent_count = sum(1 for alert in active_alerts if alert.created_at >= recent_cutoff)
+        recent_cutoff = now - timedelta(hours=24)
+
+        # Todas as contagens agregadas no banco, em uma única consulta
+        # (COUNT(*) FILTER), sem carregar os alertas ativos
+        summary_query = select(
+            func.count().label("total_active"),
+            func.count().filter(MetricAlert.severity == "critical").label("critical"),
+            func.count().filter(MetricAlert.severity == "warning").label("warning"),
+            func.count().filter(MetricAlert.is_acknowledged == True).label("acknowledged"),
+            func.count().filter(MetricAlert.created_at >= recent_cutoff).label("recent_24h"),
+        ).where(MetricAlert.is_active == True)
+        summary = (await self.db.execute(summary_query)).one()
         
         return {
-            "total_active": len(active_alerts),
-            "critical": critical_count,
-            "warning": warning_count,
-            "acknowledged": acknowledged_count,
-            "unacknowledged": unacknowledged_count,
-            "recent_24h": recent_count,
+            "total_active": summary.total_active,
+            "critical": summary.critical,
+            "warning": summary.warning,
+            "acknowledged": summary.acknowledged,
+            "unacknowledged": summary.total_active - summary.acknowledged,
+            "recent_24h": summary.recent_24h,
             "timestamp": now.isoformat()
         }
 
@@ -1,19 +1,147 @@
-from datetime import datetime, timedelta
-import json
+import base64
 import logging
-import hashlib
-import pickle
-from typing import Any, Dict, List, Optional, TypeVar, Generic, Callable, Union, Tuple
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Sequence, TypeVar, Callable, Union, Tuple
 
+from contextlib import asynccontextmanager
 from functools import wraps
+import inspect
+import orjson
 from redis.asyncio import Redis
 
-from app.db.redis import get_redis_client
+from app.db.redis import get_async_redis_client
 
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
+# Chaves removidas por round-trip (SCAN COUNT e UNLINK em pipeline)
+INVALIDATION_BATCH_SIZE = 500
+
+# Chaves não-string (ex.: dicts indexados por id) viram texto, como no json da stdlib
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def dump_cache_value(value: Any) -> bytes:
+    """
+    Serializa um valor para o cache. orjson gera os bytes em C, bem mais
+    rápido que json.dumps; o formato continua JSON, então as chaves gravadas
+    antes seguem legíveis e o cliente com decode_responses=True não quebra.
+    """
+    return orjson.dumps(value, option=_ORJSON_OPTIONS)
+
+
+def load_cache_value(raw: Union[str, bytes]) -> Any:
+    """Desserializa um valor do cache. Levanta orjson.JSONDecodeError se não for JSON."""
+    return orjson.loads(raw)
+
+
+# Primeiro byte dos valores gravados por encode_cache_value: diz como ler o resto
+CACHE_TYPE_JSON = "J"
+CACHE_TYPE_RAW = "R"
+CACHE_TYPE_COMPRESSED = "Z"
+
+# Valores codificados acima deste tamanho são comprimidos (relatórios, agregados).
+# Nível 1 do zlib: JSON de relatório encolhe ~4x já com o base64, a ~80 MB/s;
+# níveis maiores ganham pouco e custam o dobro. O base64 é necessário porque
+# o cliente usa decode_responses=True e devolveria bytes binários como texto
+COMPRESS_MIN_BYTES = 4096
+COMPRESSION_LEVEL = 1
+
+
+def encode_cache_value(value: Any) -> bytes:
+    """
+    Codifica um valor para o cache com um byte de tipo na frente: texto e
+    bytes vão crus (R); os demais, inclusive números, como JSON (J), para
+    voltarem com o mesmo tipo. Acima de COMPRESS_MIN_BYTES o resultado é
+    comprimido (Z).
+    """
+    if isinstance(value, str):
+        encoded = b"R" + value.encode("utf-8")
+    elif isinstance(value, bytes):
+        encoded = b"R" + value
+    else:
+        encoded = b"J" + dump_cache_value(value)
+
+    if len(encoded) > COMPRESS_MIN_BYTES:
+        # Z + base64(zlib(valor já com seu byte de tipo))
+        return b"Z" + base64.b64encode(zlib.compress(encoded, COMPRESSION_LEVEL))
+    return encoded
+
+
+def decode_cache_value(raw: Union[str, bytes]) -> Any:
+    """
+    Decodifica um valor gravado por encode_cache_value, escolhendo o caminho
+    pelo byte de tipo, sem usar exceção como controle de fluxo.
+    """
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8")
+    type_code = raw[:1]
+    if type_code == CACHE_TYPE_JSON:
+        return load_cache_value(raw[1:])
+    if type_code == CACHE_TYPE_RAW:
+        return raw[1:]
+    if type_code == CACHE_TYPE_COMPRESSED:
+        return decode_cache_value(zlib.decompress(base64.b64decode(raw[1:])))
+    # Valor legado, gravado antes do byte de tipo: JSON puro ou texto cru.
+    # Nenhum JSON começa com "J" ou "R", então não há ambiguidade com os novos
+    try:
+        return load_cache_value(raw)
+    except orjson.JSONDecodeError:
+        return raw
+
+
+# Tipos de argumento que entram na chave do decorator @cached
+_KEY_ARG_TYPES = (str, int, float, bool)
+
+
+def skips_first_arg(func: Callable) -> bool:
+    """
+    Indica se o primeiro parâmetro de func é self/cls, que não entra na chave.
+    Avaliado uma vez, na decoração, e não a cada chamada.
+    """
+    params = list(inspect.signature(func).parameters)
+    return bool(params) and params[0] in ("self", "cls")
+
+
+def tag_key(tag: str) -> str:
+    """Chave do SET Redis com as chaves de cache marcadas com a tag."""
+    return f"tag:{tag}"
+
+
+def index_key(pattern: str) -> str:
+    """Chave do SET Redis (índice secundário) com as chaves que casam com o padrão."""
+    return f"idx:{pattern}"
+
+
+# Padrões com índice secundário -> prefixo que as chaves precisam ter
+_indexed_patterns: Dict[str, str] = {}
+
+
+def index_pattern(pattern: str) -> bool:
+    """
+    Passa a registrar em idx:<padrão> as chaves gravadas por CacheService.set
+    que casam com o padrão, para que invalidate_patterns o remova sem SCAN.
+
+    Só padrões de prefixo ("metrics:*") têm índice; para os demais retorna
+    False e a invalidação continua por SCAN. Chaves gravadas antes do
+    registro não entram no índice e saem pelo TTL.
+    """
+    prefix = pattern[:-1]
+    if not pattern.endswith("*") or any(char in prefix for char in "*?[\\"):
+        return False
+    _indexed_patterns[pattern] = prefix
+    return True
+
+
+def _index_keys_for(key: str) -> List[str]:
+    """SETs de índice em que a chave deve ser registrada."""
+    return [
+        index_key(pattern)
+        for pattern, prefix in _indexed_patterns.items()
+        if key.startswith(prefix)
+    ]
+
 
 class CacheService:
     """Serviço de cache utilizando Redis para armazenar consultas frequentes."""
@@ -29,22 +157,56 @@ class CacheService:
             logger.error(f"Erro ao recuperar do cache: {e}")
             return None
     
-    async def set(self, key: str, value: Any, ttl_seconds: int = 300) -> bool:
-        """Armazena um valor no cache com TTL (tempo de vida)."""
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 300,
+        tags: Sequence[str] = ()
+    ) -> bool:
+        """
+        Armazena um valor no cache com TTL (tempo de vida).
+        Cada tag registra a chave em seu SET (tag:<nome>), e cada padrão
+        indexado que casa com ela em idx:<padrão> (ver index_pattern), para
+        que invalidate_tag/invalidate_patterns a removam sem varrer o keyspace.
+        """
         try:
-            # Para objetos complexos, convertemos para JSON
-            if not isinstance(value, (str, bytes, int, float)):
-                value = json.dumps(value)
-            
-            return await self.redis.set(key, value, ex=ttl_seconds)
+            set_keys = [*map(tag_key, tags), *_index_keys_for(key)]
+            if not set_keys:
+                return await self.redis.set(key, encode_cache_value(value), ex=ttl_seconds)
+
+            async with self.pipeline() as pipe:
+                pipe.set(key, encode_cache_value(value), ex=ttl_seconds)
+                for set_key in set_keys:
+                    pipe.sadd(set_key, key)
+            return True
         except Exception as e:
             logger.error(f"Erro ao armazenar no cache: {e}")
             return False
-    
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Any]:
+        """
+        Agrupa comandos em um único round-trip ao Redis.
+        Os comandos enfileirados no bloco são executados ao sair dele;
+        erros de execução são propagados para quem chamou.
+
+        Exemplo:
+            async with cache.pipeline() as pipe:
+                pipe.set("a", 1, ex=60)
+                pipe.unlink("b")
+        """
+        async with self.redis.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            await pipe.execute()
+
     async def delete(self, key: str) -> bool:
-        """Remove um valor do cache."""
+        """
+        Remove um valor do cache. UNLINK libera a memória em background no
+        Redis, sem travar o servidor em valores grandes (ex.: relatórios).
+        """
         try:
-            return await self.redis.delete(key) > 0
+            return await self.redis.unlink(key) > 0
         except Exception as e:
             logger.error(f"Erro ao remover do cache: {e}")
             return False
@@ -54,7 +216,8 @@ class CacheService:
         key: str, 
         callback: Callable[[], T], 
         ttl_seconds: int = 300, 
-        force_refresh: bool = False
+        force_refresh: bool = False,
+        tags: Sequence[str] = ()
     ) -> T:
         """
         Tenta recuperar um valor do cache. Se não existir ou force_refresh for True, 
@@ -63,73 +226,141 @@ class CacheService:
         if not force_refresh:
             cached_value = await self.get(key)
             if cached_value:
-                try:
-                    return json.loads(cached_value)
-                except json.JSONDecodeError:
-                    # Se não for um JSON válido, pode ser um valor simples
-                    return cached_value
+                return decode_cache_value(cached_value)
         
         # Executa o callback para obter o valor
         value = await callback()
         
         # Armazena no cache
-        await self.set(key, value, ttl_seconds)
+        await self.set(key, value, ttl_seconds, tags)
         
         return value
     
+    async def _unlink_batches(self, keys: Union[Iterable[str], AsyncIterable[str]]) -> int:
+        """
+        Remove as chaves com UNLINK (memória liberada em background pelo
+        Redis), um comando por lote de INVALIDATION_BATCH_SIZE chaves.
+        """
+        removed = 0
+        batch: List[str] = []
+
+        async def flush() -> int:
+            count = await self.redis.unlink(*batch)
+            batch.clear()
+            return count
+
+        if isinstance(keys, AsyncIterable):
+            async for key in keys:
+                batch.append(key)
+                if len(batch) >= INVALIDATION_BATCH_SIZE:
+                    removed += await flush()
+        else:
+            for key in keys:
+                batch.append(key)
+                if len(batch) >= INVALIDATION_BATCH_SIZE:
+                    removed += await flush()
+
+        if batch:
+            removed += await flush()
+        return removed
+
     async def invalidate_pattern(self, pattern: str) -> int:
-        """Invalida todas as chaves que correspondem ao padrão especificado."""
+        """
+        Invalida todas as chaves que correspondem ao padrão especificado.
+        Usa SCAN incremental em vez de KEYS, que é O(keyspace) e bloqueia o Redis.
+        """
         try:
-            keys = await self.redis.keys(pattern)
-            if not keys:
-                return 0
-            
-            return await self.redis.delete(*keys)
+            return await self._unlink_batches(
+                self.redis.scan_iter(match=pattern, count=INVALIDATION_BATCH_SIZE)
+            )
         except Exception as e:
             logger.error(f"Erro ao invalidar padrão no cache: {e}")
             return 0
+
+    async def invalidate_patterns(self, patterns: Iterable[str]) -> int:
+        """
+        Invalida vários padrões de uma vez. Os indexados (index_pattern) saem
+        pelos seus SETs: um round-trip lê e apaga todos os índices (MULTI, para
+        não perder chaves registradas no meio) e os UNLINK das chaves vão em
+        um único pipeline. Os demais caem no SCAN de invalidate_pattern.
+        """
+        patterns = list(dict.fromkeys(patterns))
+        indexed = [pattern for pattern in patterns if pattern in _indexed_patterns]
+        removed = 0
+
+        for pattern in patterns:
+            if pattern not in _indexed_patterns:
+                removed += await self.invalidate_pattern(pattern)
+
+        if not indexed:
+            return removed
+
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for pattern in indexed:
+                    pipe.smembers(index_key(pattern))
+                pipe.unlink(*map(index_key, indexed))
+                results = await pipe.execute()
+
+            keys = list(set().union(*results[:-1]))
+            if keys:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for start in range(0, len(keys), INVALIDATION_BATCH_SIZE):
+                        pipe.unlink(*keys[start:start + INVALIDATION_BATCH_SIZE])
+                    removed += sum(await pipe.execute())
+        except Exception as e:
+            logger.error(f"Erro ao invalidar padrões indexados no cache: {e}")
+        return removed
+
+    async def invalidate_tag(self, tag: str) -> int:
+        """
+        Invalida todas as chaves marcadas com a tag (ver set(tags=...)).
+        Custo proporcional às chaves da tag, não ao tamanho do keyspace.
+        """
+        try:
+            key = tag_key(tag)
+            members = await self.redis.smembers(key)
+            # O próprio SET da tag sai junto; entradas já expiradas são ignoradas pelo UNLINK
+            return await self._unlink_batches([*members, key])
+        except Exception as e:
+            logger.error(f"Erro ao invalidar tag no cache: {e}")
+            return 0
     
     async def get_keys(self, pattern: str) -> List[str]:
         """Obtém todas as chaves que correspondem ao padrão especificado."""
         try:
-            keys = await self.redis.keys(pattern)
-            return [key.decode('utf-8') for key in keys]
+            # O cliente usa decode_responses=True: as chaves já chegam como str
+            return [key async for key in self.redis.scan_iter(match=pattern, count=INVALIDATION_BATCH_SIZE)]
         except Exception as e:
             logger.error(f"Erro ao obter chaves do cache: {e}")
             return []
 
 
 # Decorator para cache de funções/métodos
-def cached(key_prefix: str, ttl_seconds: int = 300):
+def cached(key_prefix: str, ttl_seconds: int = 300, tags: Sequence[str] = ()):
     """
     Decorator para cachear o resultado de uma função ou método.
     Utiliza como chave o prefixo fornecido mais os argumentos da função.
+    As chaves geradas são registradas nas tags informadas (ver CacheService.invalidate_tag).
     """
     def decorator(func):
+        # Resolvido na decoração: ignorar o parâmetro self/cls de métodos
+        first_arg = 1 if skips_first_arg(func) else 0
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Ignorar o parâmetro self para métodos de classe
-            args_to_use = args[1:] if args and hasattr(args[0], '__class__') else args
-            
-            # Constrói a chave do cache com o prefixo e os argumentos
-            key_parts = [key_prefix]
-            
-            for arg in args_to_use:
-                if isinstance(arg, (str, int, float, bool)):
-                    key_parts.append(str(arg))
-            
-            for k, v in sorted(kwargs.items()):
-                if isinstance(v, (str, int, float, bool)):
-                    key_parts.append(f"{k}:{v}")
+            # Verifica se force_refresh foi passado como parâmetro (não faz parte da chave)
+            force_refresh = kwargs.pop('force_refresh', False)
             
-            cache_key = ":".join(key_parts)
+            # Constrói a chave do cache com o prefixo e os argumentos simples
+            cache_key = ":".join([
+                key_prefix,
+                *[str(arg) for arg in args[first_arg:] if isinstance(arg, _KEY_ARG_TYPES)],
+                *[f"{k}:{v}" for k, v in sorted(kwargs.items()) if isinstance(v, _KEY_ARG_TYPES)],
+            ])
             
-            # Obtém cliente redis
-            redis_client = await get_redis_client()
-            cache_service = CacheService(redis_client)
-            
-            # Verifica se force_refresh foi passado como parâmetro
-            force_refresh = kwargs.pop('force_refresh', False) if 'force_refresh' in kwargs else False
+            # Serviço compartilhado, sem nova instância a cada chamada
+            cache_service = await get_cache_service()
             
             # Função para obter o valor real
             async def fetch_value():
@@ -140,7 +371,8 @@ def cached(key_prefix: str, ttl_seconds: int = 300):
                 cache_key, 
                 fetch_value, 
                 ttl_seconds, 
-                force_refresh
+                force_refresh,
+                tags
             )
         
         return wrapper
@@ -148,7 +380,16 @@ def cached(key_prefix: str, ttl_seconds: int = 300):
     return decorator
 
 
+# Instância global do serviço de cache
+_cache_service: Optional[CacheService] = None
+
+
 async def get_cache_service() -> CacheService:
-    """Cria e retorna uma instância do serviço de cache."""
-    redis_client = await get_redis_client()
-    return CacheService(redis_client)
\ No newline at end of file
+    """
+    Retorna a instância global do serviço de cache.
+    Criada na primeira chamada; as conexões vêm do pool Redis compartilhado.
+    """
+    global _cache_service
+    if _cache_service is None:
+        _cache_service = CacheService(get_async_redis_client())
+    return _cache_service
\ No newline at end of file
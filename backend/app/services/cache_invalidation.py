@@ -2,14 +2,18 @@
 Utilitário para limpeza periódica de cache e revalidação.
 """
 import asyncio
+import heapq
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Set
+import time
+from typing import List, Dict, Any, Optional, Set, Tuple
 
-from app.services.cache import get_cache_service
+from app.services.cache import get_cache_service, index_pattern
 
 logger = logging.getLogger(__name__)
 
+# Após uma falha, os padrões vencidos são tentados de novo depois deste intervalo
+RETRY_DELAY_SECONDS = 30
+
 
 class CacheInvalidator:
     """
@@ -21,6 +25,11 @@ class CacheInvalidator:
         self.patterns: Dict[str, Dict[str, Any]] = {}
         self.running: bool = False
         self.task: Optional[asyncio.Task] = None
+        # Min-heap (próximo vencimento em time.monotonic(), padrão): o loop
+        # dorme até o vencimento mais próximo em vez de acordar a cada 30s
+        self._heap: List[Tuple[float, str]] = []
+        # Acorda o loop quando um padrão é (re)agendado durante a espera
+        self._wakeup = asyncio.Event()
     
     def register_pattern(
         self,
@@ -36,12 +45,48 @@ class CacheInvalidator:
             invalidation_interval: Intervalo em segundos para invalidação
             dependencies: Conjunto de outros padrões que devem ser invalidados junto
         """
+        now = time.monotonic()
+        # Instantes em time.monotonic(): floats baratos e imunes a ajustes do relógio
         self.patterns[pattern] = {
-            "interval": invalidation_interval,
-            "last_invalidated": datetime.utcnow(),
-            "dependencies": dependencies or set()
+            "interval": float(invalidation_interval),
+            "last_invalidated": now,
+            "dependencies": dependencies or set(),
+            "closure": set(),
+            "next_due": 0.0
         }
+        self._schedule(pattern, now + invalidation_interval)
+        # Índice secundário (SET idx:<padrão>): invalidação sem SCAN no keyspace
+        for indexed in (pattern, *self.patterns[pattern]["dependencies"]):
+            index_pattern(indexed)
+        self._update_closures()
         logger.info(f"Padrão de cache registrado para invalidação: {pattern} (intervalo: {invalidation_interval}s)")
+
+    def _update_closures(self) -> None:
+        """
+        Recalcula, para cada padrão, o fecho transitivo das dependências
+        (dependências das dependências registradas), para que o loop não
+        precise percorrê-las a cada ciclo.
+        """
+        for config in self.patterns.values():
+            closure: Set[str] = set()
+            pending = list(config["dependencies"])
+            while pending:
+                dependency = pending.pop()
+                if dependency in closure:
+                    continue
+                closure.add(dependency)
+                pending.extend(self.patterns.get(dependency, {}).get("dependencies", ()))
+            config["closure"] = closure
+
+    def _schedule(self, pattern: str, next_due: float) -> None:
+        """
+        Agenda a próxima invalidação de um padrão. Entradas anteriores do
+        mesmo padrão ficam no heap e são descartadas quando saem dele
+        (next_due diferente do registrado no config).
+        """
+        self.patterns[pattern]["next_due"] = next_due
+        heapq.heappush(self._heap, (next_due, pattern))
+        self._wakeup.set()
     
     async def invalidate_pattern(self, pattern: str) -> int:
         """
@@ -51,18 +96,18 @@ class CacheInvalidator:
             pattern: O padrão a ser invalidado
             
         Returns:
-            Número de chaves invalidadas
+            Número de chaves invalidadas (incluindo as das dependências)
         """
         cache_service = await get_cache_service()
-        count = await cache_service.invalidate_pattern(pattern)
+        # Padrão e dependências juntos: os índices saem em um só pipeline
+        dependencies = self.patterns.get(pattern, {}).get("closure", set())
+        count = await cache_service.invalidate_patterns([pattern, *dependencies])
         
-        # Atualiza o timestamp de última invalidação
+        # Atualiza o timestamp de última invalidação e reagenda a próxima
         if pattern in self.patterns:
-            self.patterns[pattern]["last_invalidated"] = datetime.utcnow()
-            
-        # Invalida dependências
-        for dependency in self.patterns.get(pattern, {}).get("dependencies", set()):
-            await cache_service.invalidate_pattern(dependency)
+            now = time.monotonic()
+            self.patterns[pattern]["last_invalidated"] = now
+            self._schedule(pattern, now + self.patterns[pattern]["interval"])
         
         logger.info(f"Padrão {pattern} invalidado manualmente. {count} chaves removidas.")
         return count
@@ -101,20 +146,39 @@ class CacheInvalidator:
         Loop principal que verifica e invalida padrões periodicamente.
         """
         while self.running:
-            now = datetime.utcnow()
+            now = time.monotonic()
+            
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                next_due, pattern = heapq.heappop(self._heap)
+                if self.patterns[pattern]["next_due"] == next_due:
+                    due.append(pattern)
             
-            for pattern, config in self.patterns.items():
-                last_invalidated = config["last_invalidated"]
-                interval = timedelta(seconds=config["interval"])
-                
-                if now - last_invalidated >= interval:
-                    try:
-                        await self.invalidate_pattern(pattern)
-                    except Exception as e:
-                        logger.error(f"Erro ao invalidar padrão {pattern}: {e}")
+            if due:
+                # Padrões vencidos e suas dependências em uma única chamada:
+                # os índices de todos saem no mesmo pipeline
+                targets = set(due)
+                for pattern in due:
+                    targets |= self.patterns[pattern]["closure"]
+                try:
+                    cache_service = await get_cache_service()
+                    count = await cache_service.invalidate_patterns(targets)
+                    for pattern in due:
+                        self.patterns[pattern]["last_invalidated"] = now
+                        self._schedule(pattern, now + self.patterns[pattern]["interval"])
+                    logger.info(f"Padrões {sorted(due)} invalidados. {count} chaves removidas.")
+                except Exception as e:
+                    logger.error(f"Erro ao invalidar padrões {sorted(due)}: {e}")
+                    for pattern in due:
+                        self._schedule(pattern, now + RETRY_DELAY_SECONDS)
             
-            # Espera 30 segundos antes da próxima verificação
-            await asyncio.sleep(30)
+            # Dorme até o vencimento mais próximo (ou até um novo agendamento)
+            self._wakeup.clear()
+            timeout = max(0.0, self._heap[0][0] - time.monotonic()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
 
 
 # Instância global do invalidador
@@ -1,14 +1,38 @@
 """
 Serviço para gerenciamento de armazenamento de documentos.
 """
+import asyncio
 import os
 import shutil
 import hashlib
-import aiofiles
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import BinaryIO, Optional, Tuple
 from fastapi import UploadFile
 from app.core.config import settings
+from app.utils.file_utils import copy_upload, ensure_dir, forget_dir, make_subdir
+
+# Tipos MIME por extensão (minúscula, com o ponto)
+_MIME_TYPES = {
+    '.pdf': 'application/pdf',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xls': 'application/vnd.ms-excel',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.csv': 'text/csv',
+    '.txt': 'text/plain',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.tiff': 'image/tiff',
+    '.tif': 'image/tiff',
+    '.bmp': 'image/bmp',
+}
+
+
+def _new_document_hash():
+    """Hash de app.models.document.DOCUMENT_HASH_ALGO: BLAKE2b com digest de 32 bytes (64 hex)."""
+    return hashlib.blake2b(digest_size=32)
+
 
 class DocumentStorageService:
     """
@@ -20,31 +44,33 @@ class DocumentStorageService:
         """
         Obtém o caminho base para armazenamento de documentos.
         """
-        # Usa o caminho configurado ou cria um padrão
-        base_path = settings.DOCUMENT_STORAGE_PATH
-        
-        # Certifica-se de que o diretório existe
-        os.makedirs(base_path, exist_ok=True)
-        
-        return base_path
+        # Usa o caminho configurado, criado só na primeira chamada do processo
+        return ensure_dir(settings.DOCUMENT_STORAGE_PATH)
     
     @staticmethod
     def get_document_path(user_id: int, document_id: int) -> str:
         """
         Obtém o caminho para o diretório de um documento específico.
         """
-        # Organiza os arquivos em uma estrutura de pastas com base no usuário e documento
-        document_path = os.path.join(
-            DocumentStorageService.get_storage_path(),
-            f"user_{user_id}",
-            f"doc_{document_id}"
-        )
-        
-        # Certifica-se de que o diretório existe
-        os.makedirs(document_path, exist_ok=True)
-        
-        return document_path
+        # Organiza os arquivos em uma estrutura de pastas com base no usuário e documento;
+        # o diretório do usuário é garantido uma vez por processo
+        user_path = os.path.join(DocumentStorageService.get_storage_path(), f"user_{user_id}")
+        return make_subdir(user_path, f"doc_{document_id}")
     
+    @staticmethod
+    def _write_file(src: BinaryIO, file_path: str) -> Tuple[str, int]:
+        """
+        Copia o upload para file_path e calcula o hash BLAKE2b do conteúdo.
+
+        Síncrono: roda fora do event loop (asyncio.to_thread). O hash é
+        calculado sobre os mesmos blocos da cópia, sem reler o arquivo gravado.
+        """
+        digest = _new_document_hash()
+        with open(file_path, 'wb') as out_file:
+            file_size = copy_upload(src, out_file, digest)
+
+        return digest.hexdigest(), file_size
+
     @staticmethod
     async def save_file(file: UploadFile, user_id: int, document_id: int) -> Tuple[str, str, int]:
         """
@@ -56,7 +82,7 @@ class DocumentStorageService:
             document_id: ID do documento no banco de dados
             
         Returns:
-            Tuple contendo (caminho_do_arquivo, hash_md5, tamanho_do_arquivo)
+            Tuple contendo (caminho_do_arquivo, hash_blake2b, tamanho_do_arquivo)
         """
         # Gera um nome de arquivo seguro baseado no timestamp e ID do documento
         timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
@@ -67,24 +93,17 @@ class DocumentStorageService:
         document_dir = DocumentStorageService.get_document_path(user_id, document_id)
         file_path = os.path.join(document_dir, safe_filename)
         
-        # Inicializa o hash MD5
-        md5_hash = hashlib.md5()
-        file_size = 0
-        
         # Salva o arquivo em disco e calcula o hash
         try:
             # Retorna o ponteiro para o início do arquivo
             await file.seek(0)
             
-            # Abre um arquivo para escrita
-            async with aiofiles.open(file_path, 'wb') as out_file:
-                # Lê e escreve o arquivo em blocos para lidar com arquivos grandes
-                while content := await file.read(1024 * 1024):  # 1MB por vez
-                    await out_file.write(content)
-                    md5_hash.update(content)
-                    file_size += len(content)
+            # Cópia e hash são bloqueantes: rodam em uma thread
+            content_hash, file_size = await asyncio.to_thread(
+                DocumentStorageService._write_file, file.file, file_path
+            )
             
-            return file_path, md5_hash.hexdigest(), file_size
+            return file_path, content_hash, file_size
         except Exception as e:
             # Em caso de erro, tenta limpar qualquer arquivo parcialmente escrito
             if os.path.exists(file_path):
@@ -133,6 +152,7 @@ class DocumentStorageService:
             
             if os.path.exists(user_dir):
                 shutil.rmtree(user_dir)
+                forget_dir(user_dir)
                 return True
             return False
         except Exception:
@@ -157,25 +177,10 @@ class DocumentStorageService:
         Obtém o tipo MIME com base na extensão do arquivo.
         
         Args:
-            file_extension: Extensão do arquivo (incluindo o ponto)
+            file_extension: Extensão do arquivo (incluindo o ponto), já em
+                minúsculas, como retornada por get_file_extension
             
         Returns:
             Tipo MIME correspondente
         """
-        mime_types = {
-            '.pdf': 'application/pdf',
-            '.doc': 'application/msword',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.xls': 'application/vnd.ms-excel',
-            '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            '.csv': 'text/csv',
-            '.txt': 'text/plain',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.tiff': 'image/tiff',
-            '.tif': 'image/tiff',
-            '.bmp': 'image/bmp',
-        }
-        
-        return mime_types.get(file_extension.lower(), 'application/octet-stream')
+        return _MIME_TYPES.get(file_extension, 'application/octet-stream')
@@ -1,31 +1,143 @@
 """
 Serviço para envio de emails.
 """
-import smtplib
+import asyncio
+import logging
+import time
+from pathlib import Path
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional, List
+from typing import List, Optional, Tuple
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Conexão ociosa por mais que isso é testada com NOOP antes de ser reutilizada;
+# servidores SMTP costumam derrubar sessões paradas em 1-5 minutos
+SMTP_NOOP_AFTER_SECONDS = 30
+SMTP_TIMEOUT_SECONDS = 10
+
+# Templates compilados uma vez, na importação, e reutilizados em todo envio.
+# Só os .html são escapados (ex.: username); os .txt saem como texto puro
+EMAIL_TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+_templates = Environment(
+    loader=FileSystemLoader(EMAIL_TEMPLATES_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+    cache_size=-1,
+    keep_trailing_newline=True,
+)
+_PASSWORD_RESET_HTML = _templates.get_template("password_reset.html")
+_PASSWORD_RESET_TEXT = _templates.get_template("password_reset.txt")
+_VERIFICATION_HTML = _templates.get_template("verification.html")
+_VERIFICATION_TEXT = _templates.get_template("verification.txt")
+_WELCOME_HTML = _templates.get_template("welcome.html")
+_WELCOME_TEXT = _templates.get_template("welcome.txt")
+
+
+class SMTPClient:
+    """
+    Sessão SMTP assíncrona e persistente (aiosmtplib): conexão TCP, STARTTLS
+    e login acontecem uma vez e são reaproveitados entre envios, sem
+    bloquear o event loop.
 
-def send_email(
+    Uma sessão SMTP só transmite uma mensagem por vez, então os envios são
+    serializados com um asyncio.Lock. Se o servidor fechou a sessão, o
+    envio reconecta e tenta de novo uma vez.
+    """
+    def __init__(self):
+        self._server: Optional[aiosmtplib.SMTP] = None
+        self._last_used = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        # SMTP_TLS indica STARTTLS (porta 587), não TLS implícito (use_tls, porta 465);
+        # com usuário e senha, o login é feito pelo próprio connect()
+        server = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER or None,
+            password=settings.SMTP_PASSWORD or None,
+            start_tls=settings.SMTP_TLS,
+            timeout=SMTP_TIMEOUT_SECONDS,
+        )
+        await server.connect()
+        return server
+
+    def _discard(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+
+    async def _session(self) -> aiosmtplib.SMTP:
+        # Sessão parada há muito tempo pode ter sido encerrada pelo servidor
+        if self._server is not None and time.monotonic() - self._last_used > SMTP_NOOP_AFTER_SECONDS:
+            try:
+                await self._server.noop()
+            except (aiosmtplib.SMTPException, OSError):
+                self._discard()
+        if self._server is None:
+            self._server = await self._connect()
+        return self._server
+
+    async def _send(self, message: MIMEMultipart, recipients: List[str]) -> None:
+        try:
+            server = await self._session()
+            await server.send_message(message, recipients=recipients)
+        except aiosmtplib.SMTPServerDisconnected:
+            self._discard()
+            server = await self._session()
+            await server.send_message(message, recipients=recipients)
+        except Exception:
+            # Estado da sessão desconhecido: o próximo envio reconecta
+            self._discard()
+            raise
+        self._last_used = time.monotonic()
+
+    async def send_message(self, message: MIMEMultipart, recipients: List[str]) -> None:
+        """Envia uma mensagem pela sessão compartilhada, reconectando se preciso."""
+        async with self._lock:
+            await self._send(message, recipients)
+
+    async def close(self) -> None:
+        """Encerra a sessão (QUIT), se houver uma aberta."""
+        async with self._lock:
+            if self._server is not None:
+                try:
+                    await self._server.quit()
+                except (aiosmtplib.SMTPException, OSError):
+                    pass
+                self._discard()
+
+
+# Sessão SMTP global do processo
+_smtp_client = SMTPClient()
+
+
+async def close_email_connection() -> None:
+    """Fecha a sessão SMTP persistente."""
+    await _smtp_client.close()
+
+
+def _smtp_configured() -> bool:
+    return bool(settings.SMTP_HOST and settings.SMTP_PORT)
+
+
+def build_email(
     to_email: str,
     subject: str,
     html_content: str,
     text_content: Optional[str] = None,
     cc: Optional[List[str]] = None,
     bcc: Optional[List[str]] = None
-) -> bool:
+) -> Tuple[MIMEMultipart, List[str]]:
     """
-    Envia um email usando o servidor SMTP configurado.
+    Monta a mensagem e a lista de destinatários (to + cc + bcc).
     """
-    # Se estamos em modo de teste ou desenvolvimento e sem servidor SMTP configurado
-    if not settings.SMTP_HOST or not settings.SMTP_PORT:
-        print(f"Email would be sent to {to_email}: {subject}")
-        print(f"Content: {html_content}")
-        return True
-
     # Configuração do email
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
@@ -35,6 +147,7 @@ def send_email(
     if cc:
         msg['Cc'] = ", ".join(cc)
     if bcc:
+        # aiosmtplib remove o cabeçalho Bcc ao transmitir; fica só no envelope
         msg['Bcc'] = ", ".join(bcc)
     
     # Adiciona conteúdo texto simples, se fornecido
@@ -46,40 +159,44 @@ def send_email(
     part2 = MIMEText(html_content, 'html')
     msg.attach(part2)
     
+    # Preparação de destinatários
+    recipients = [to_email]
+    if cc:
+        recipients.extend(cc)
+    if bcc:
+        recipients.extend(bcc)
+    return msg, recipients
+
+
+async def send_email(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None,
+    cc: Optional[List[str]] = None,
+    bcc: Optional[List[str]] = None
+) -> bool:
+    """
+    Envia um email usando o servidor SMTP configurado.
+    """
+    # Se estamos em modo de teste ou desenvolvimento e sem servidor SMTP configurado
+    if not _smtp_configured():
+        logger.info(f"Email would be sent to {to_email}: {subject}")
+        logger.debug(f"Content: {html_content}")
+        return True
+
+    msg, recipients = build_email(to_email, subject, html_content, text_content, cc, bcc)
+    
     try:
-        # Conecta ao servidor SMTP
-        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT)
-        server.ehlo()
-        
-        # Inicia TLS para segurança, se disponível
-        if settings.SMTP_TLS:
-            server.starttls()
-            server.ehlo()
-        
-        # Login, se configurado
-        if settings.SMTP_USER and settings.SMTP_PASSWORD:
-            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-        
-        # Preparação de destinatários
-        recipients = [to_email]
-        if cc:
-            recipients.extend(cc)
-        if bcc:
-            recipients.extend(bcc)
-        
-        # Envio do email
-        server.sendmail(settings.EMAILS_FROM_EMAIL, recipients, msg.as_string())
-        
-        # Encerra a conexão
-        server.quit()
-        
+        # Envio do email pela sessão SMTP persistente
+        await _smtp_client.send_message(msg, recipients)
         return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
+    except Exception:
+        logger.exception(f"Error sending email to {to_email}")
         return False
 
 
-def send_password_reset_email(email: str, token: str) -> bool:
+async def send_password_reset_email(email: str, token: str) -> bool:
     """
     Envia um email de recuperação de senha.
     """
@@ -88,42 +205,14 @@ def send_password_reset_email(email: str, token: str) -> bool:
     
     # Prepara o conteúdo do email
     subject = f"Redefinição de senha para {settings.PROJECT_NAME}"
+    context = {"project_name": settings.PROJECT_NAME, "reset_url": reset_url}
     
-    html_content = f"""
-    <h2>Redefinição de senha</h2>
-    <p>Olá,</p>
-    <p>Você solicitou uma redefinição de senha para sua conta no {settings.PROJECT_NAME}.</p>
-    <p>Clique no botão abaixo para redefinir sua senha:</p>
-    <p><a href="{reset_url}" style="padding: 10px 20px; background-color: #4CAF50; color: white; text-decoration: none; border-radius: 5px;">Redefinir Senha</a></p>
-    <p>Ou copie e cole o seguinte link em seu navegador:</p>
-    <p>{reset_url}</p>
-    <p>Este link é válido por 1 hora.</p>
-    <p>Se você não solicitou esta redefinição, ignore este email.</p>
-    <p>Atenciosamente,<br>Equipe {settings.PROJECT_NAME}</p>
-    """
-    
-    text_content = f"""
-    Redefinição de senha
-
-    Olá,
-
-    Você solicitou uma redefinição de senha para sua conta no {settings.PROJECT_NAME}.
-
-    Acesse o seguinte link para redefinir sua senha:
-    {reset_url}
+    return await send_email(
+        email, subject, _PASSWORD_RESET_HTML.render(context), _PASSWORD_RESET_TEXT.render(context)
+    )
 
-    Este link é válido por 1 hora.
 
-    Se você não solicitou esta redefinição, ignore este email.
-
-    Atenciosamente,
-    Equipe {settings.PROJECT_NAME}
-    """
-    
-    return send_email(email, subject, html_content, text_content)
-
-
-def send_verification_email(email: str, token: str) -> bool:
+async def send_verification_email(email: str, token: str) -> bool:
     """
     Envia um email de verificação de conta.
     """
@@ -132,64 +221,25 @@ def send_verification_email(email: str, token: str) -> bool:
     
     # Prepara o conteúdo do email
     subject = f"Verificação de conta para {settings.PROJECT_NAME}"
+    context = {"project_name": settings.PROJECT_NAME, "verify_url": verify_url}
     
-    html_content = f"""
-    <h2>Verificação de conta</h2>
-    <p>Olá,</p>
-    <p>Obrigado por se registrar no {settings.PROJECT_NAME}.</p>
-    <p>Clique no botão abaixo para verificar seu endereço de email:</p>
-    <p><a href="{verify_url}" style="padding: 10px 20px; background-color: #4CAF50; color: white; text-decoration: none; border-radius: 5px;">Verificar Email</a></p>
-    <p>Ou copie e cole o seguinte link em seu navegador:</p>
-    <p>{verify_url}</p>
-    <p>Este link é válido por 24 horas.</p>
-    <p>Atenciosamente,<br>Equipe {settings.PROJECT_NAME}</p>
-    """
-    
-    text_content = f"""
-    Verificação de conta
-
-    Olá,
-
-    Obrigado por se registrar no {settings.PROJECT_NAME}.
-
-    Acesse o seguinte link para verificar seu endereço de email:
-    {verify_url}
-
-    Este link é válido por 24 horas.
-
-    Atenciosamente,
-    Equipe {settings.PROJECT_NAME}
-    """
-    
-    return send_email(email, subject, html_content, text_content)
+    return await send_email(
+        email, subject, _VERIFICATION_HTML.render(context), _VERIFICATION_TEXT.render(context)
+    )
 
 
-def send_welcome_email(email: str, username: str) -> bool:
+async def send_welcome_email(email: str, username: str) -> bool:
     """
     Envia um email de boas-vindas após verificação da conta.
     """
     # Prepara o conteúdo do email
     subject = f"Bem-vindo ao {settings.PROJECT_NAME}"
+    context = {
+        "project_name": settings.PROJECT_NAME,
+        "username": username,
+        "login_url": f"{settings.FRONTEND_URL}/login",
+    }
     
-    html_content = f"""
-    <h2>Bem-vindo ao {settings.PROJECT_NAME}!</h2>
-    <p>Olá {username},</p>
-    <p>Sua conta foi verificada com sucesso. Agora você tem acesso completo a todas as funcionalidades do sistema.</p>
-    <p>Para acessar sua conta, <a href="{settings.FRONTEND_URL}/login">clique aqui</a>.</p>
-    <p>Atenciosamente,<br>Equipe {settings.PROJECT_NAME}</p>
-    """
-    
-    text_content = f"""
-    Bem-vindo ao {settings.PROJECT_NAME}!
-
-    Olá {username},
-
-    Sua conta foi verificada com sucesso. Agora você tem acesso completo a todas as funcionalidades do sistema.
-
-    Para acessar sua conta, visite: {settings.FRONTEND_URL}/login
-
-    Atenciosamente,
-    Equipe {settings.PROJECT_NAME}
-    """
-    
-    return send_email(email, subject, html_content, text_content)
+    return await send_email(
+        email, subject, _WELCOME_HTML.render(context), _WELCOME_TEXT.render(context)
+    )
@@ -1,23 +1,26 @@
+import asyncio
 import os
 import uuid
-import shutil
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Optional, Tuple
 from fastapi import UploadFile
 
 from app.core.config import settings
+from app.utils.file_utils import copy_upload, ensure_dir, make_subdir
 
 
 class MessageAttachmentService:
     def __init__(self):
         # Ensure upload directory exists
         self.base_dir = settings.UPLOAD_DIRECTORY
-        self.message_attachments_dir = os.path.join(self.base_dir, "message_attachments")
-        os.makedirs(self.message_attachments_dir, exist_ok=True)
+        self.message_attachments_dir = ensure_dir(os.path.join(self.base_dir, "message_attachments"))
 
-    def save_attachment(self, file: UploadFile, conversation_id: int, message_id: int) -> dict:
+    async def save_attachment(self, file: UploadFile, conversation_id: int, message_id: int) -> dict:
         """
         Save a message attachment to disk
         
+        The directory setup and the copy run in a worker thread, so a large
+        upload does not block the event loop.
+        
         Args:
             file: The uploaded file object
             conversation_id: The ID of the conversation
@@ -26,31 +29,45 @@ class MessageAttachmentService:
         Returns:
             dict: Metadata about the saved file
         """
+        file_path, file_size = await asyncio.to_thread(
+            self._write_attachment, file.file, file.filename, conversation_id, message_id
+        )
+            
+        # Return metadata
+        return {
+            "file_name": file.filename,
+            "file_type": file.content_type,
+            "file_size": file_size,
+            "file_path": os.path.relpath(file_path, self.base_dir)  # Store relative path
+        }
+
+    def _write_attachment(
+        self, src: BinaryIO, filename: Optional[str], conversation_id: int, message_id: int
+    ) -> Tuple[str, int]:
+        """
+        Write an attachment to its message directory (blocking).
+        
+        Returns:
+            tuple: (full path of the saved file, bytes written)
+        """
         # Create directory structure: message_attachments/conversation_id/message_id/
+        # (the conversation directory is created once per process)
         conversation_dir = os.path.join(self.message_attachments_dir, str(conversation_id))
-        os.makedirs(conversation_dir, exist_ok=True)
-        
-        message_dir = os.path.join(conversation_dir, str(message_id))
-        os.makedirs(message_dir, exist_ok=True)
+        message_dir = make_subdir(conversation_dir, str(message_id))
         
         # Generate unique filename to avoid collisions
-        file_ext = os.path.splitext(file.filename)[1] if file.filename else ""
+        file_ext = os.path.splitext(filename)[1] if filename else ""
         safe_filename = f"{uuid.uuid4()}{file_ext}"
         
         # Complete path where the file will be saved
         file_path = os.path.join(message_dir, safe_filename)
         
-        # Save the file
+        # Save the file (kernel-side sendfile when the upload is on disk)
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # Return metadata
-        return {
-            "file_name": file.filename,
-            "file_type": file.content_type,
-            "file_size": os.path.getsize(file_path),
-            "file_path": os.path.relpath(file_path, self.base_dir)  # Store relative path
-        }
+            file_size = copy_upload(src, buffer)
+        
+        # Size from the copy itself, no extra stat
+        return file_path, file_size
 
     def get_attachment_path(self, file_path: str) -> str:
         """
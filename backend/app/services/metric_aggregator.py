@@ -0,0 +1,195 @@
+"""
+Pré-agregação do histórico de métricas por intervalo de tempo.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.metric import MetricHistory, MetricHistoryRollup, TimeGranularity
+
+# Granularidades mantidas na tabela de rollups; mês, trimestre e ano são
+# somados a partir dos rollups diários
+ROLLUP_GRANULARITIES = (TimeGranularity.HOUR, TimeGranularity.DAY, TimeGranularity.WEEK)
+
+
+def _date_trunc(granularity: TimeGranularity, column):
+    """
+    date_trunc com a unidade inline: como parâmetro ligado, a mesma expressão
+    no SELECT e no GROUP BY poderia não ser reconhecida como igual.
+    """
+    return func.date_trunc(literal_column(f"'{granularity.value}'"), column)
+
+
+def bucket_start(timestamp: datetime, granularity: TimeGranularity) -> datetime:
+    """
+    Início do intervalo que contém o timestamp, igual ao date_trunc do PostgreSQL
+    (semanas começam na segunda-feira).
+    """
+    if granularity == TimeGranularity.HOUR:
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == TimeGranularity.WEEK:
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class MetricHistoryAggregator:
+    """
+    Mantém contagem, soma, soma dos quadrados, mínimo e máximo por métrica e
+    intervalo, e responde às consultas temporais a partir deles.
+
+    Percentis não são deriváveis dessas estatísticas e continuam sendo
+    calculados sobre metric_history.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _upsert(self, stmt):
+        """Soma as estatísticas novas às do intervalo, se ele já existir."""
+        excluded = stmt.excluded
+        return stmt.on_conflict_do_update(
+            index_elements=["metric_id", "granularity", "bucket_start"],
+            set_={
+                "value_count": MetricHistoryRollup.value_count + excluded.value_count,
+                "value_sum": MetricHistoryRollup.value_sum + excluded.value_sum,
+                "value_sum_sq": MetricHistoryRollup.value_sum_sq + excluded.value_sum_sq,
+                "value_min": func.least(MetricHistoryRollup.value_min, excluded.value_min),
+                "value_max": func.greatest(MetricHistoryRollup.value_max, excluded.value_max),
+            },
+        )
+
+    async def record(self, metric_id: int, value: float, timestamp: datetime) -> None:
+        """Acrescenta um valor aos rollups de todas as granularidades."""
+        await self.record_many([(metric_id, value, timestamp)])
+
+    async def record_many(self, samples: Iterable[Tuple[int, float, datetime]]) -> None:
+        """
+        Acrescenta vários valores (metric_id, valor, timestamp) em um único
+        INSERT ... ON CONFLICT DO UPDATE. As amostras são somadas por intervalo
+        antes, já que o ON CONFLICT não aceita a mesma chave duas vezes.
+        """
+        buckets: Dict[Tuple[int, str, datetime], Dict[str, Any]] = {}
+        for metric_id, value, timestamp in samples:
+            for granularity in ROLLUP_GRANULARITIES:
+                key = (metric_id, granularity.value, bucket_start(timestamp, granularity))
+                row = buckets.get(key)
+                if row is None:
+                    buckets[key] = {
+                        "metric_id": key[0],
+                        "granularity": key[1],
+                        "bucket_start": key[2],
+                        "value_count": 1,
+                        "value_sum": value,
+                        "value_sum_sq": value * value,
+                        "value_min": value,
+                        "value_max": value,
+                    }
+                else:
+                    row["value_count"] += 1
+                    row["value_sum"] += value
+                    row["value_sum_sq"] += value * value
+                    row["value_min"] = min(row["value_min"], value)
+                    row["value_max"] = max(row["value_max"], value)
+
+        if not buckets:
+            return
+
+        stmt = pg_insert(MetricHistoryRollup).values(list(buckets.values()))
+        await self.db.execute(self._upsert(stmt))
+
+    async def rebuild(self, metric_id: Optional[int] = None) -> None:
+        """
+        Recalcula os rollups a partir de metric_history (carga inicial ou
+        correção), para uma métrica ou para todas.
+        """
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = _date_trunc(granularity, MetricHistory.timestamp)
+            source = (
+                select(
+                    MetricHistory.metric_id,
+                    literal(granularity.value),
+                    bucket,
+                    func.count(MetricHistory.value),
+                    func.sum(MetricHistory.value),
+                    func.sum(MetricHistory.value * MetricHistory.value),
+                    func.min(MetricHistory.value),
+                    func.max(MetricHistory.value),
+                )
+                .where(MetricHistory.value.isnot(None))
+                .group_by(MetricHistory.metric_id, bucket)
+            )
+            if metric_id is not None:
+                source = source.where(MetricHistory.metric_id == metric_id)
+
+            stmt = pg_insert(MetricHistoryRollup).from_select(
+                [
+                    "metric_id", "granularity", "bucket_start", "value_count",
+                    "value_sum", "value_sum_sq", "value_min", "value_max",
+                ],
+                source,
+            )
+            # Recalculado do zero: substitui em vez de somar
+            await self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=["metric_id", "granularity", "bucket_start"],
+                    set_={
+                        column: stmt.excluded[column]
+                        for column in (
+                            "value_count", "value_sum", "value_sum_sq", "value_min", "value_max"
+                        )
+                    },
+                )
+            )
+
+    async def get_buckets(
+        self,
+        metric_id: int,
+        start_date: datetime,
+        end_date: datetime,
+        granularity: TimeGranularity,
+    ) -> List[Dict[str, Any]]:
+        """
+        Estatísticas por intervalo entre start_date e end_date, lendo uma linha
+        por intervalo. Os intervalos das pontas entram inteiros.
+        """
+        source_granularity = (
+            granularity if granularity in ROLLUP_GRANULARITIES else TimeGranularity.DAY
+        )
+        if source_granularity == granularity:
+            bucket = MetricHistoryRollup.bucket_start
+        else:
+            bucket = _date_trunc(granularity, MetricHistoryRollup.bucket_start)
+
+        query = (
+            select(
+                bucket.label("bucket_start"),
+                func.sum(MetricHistoryRollup.value_count),
+                func.sum(MetricHistoryRollup.value_sum),
+                func.min(MetricHistoryRollup.value_min),
+                func.max(MetricHistoryRollup.value_max),
+            )
+            .where(
+                MetricHistoryRollup.metric_id == metric_id,
+                MetricHistoryRollup.granularity == source_granularity.value,
+                MetricHistoryRollup.bucket_start >= bucket_start(start_date, source_granularity),
+                MetricHistoryRollup.bucket_start <= end_date,
+            )
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        result = await self.db.execute(query)
+
+        return [
+            {
+                "bucket_start": row[0],
+                "count": row[1],
+                "avg_value": row[2] / row[1] if row[1] else None,
+                "min_value": row[3],
+                "max_value": row[4],
+            }
+            for row in result.all()
+        ]
@@ -2,10 +2,11 @@
 Serviço para manipulação de métricas e KPIs do sistema.
 """
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Union, Any, Tuple
-from sqlalchemy import select, func, and_, desc
+from sqlalchemy import Float, String, and_, bindparam, desc, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
 from sqlalchemy.sql import text
 
 from app.models.metric import (
@@ -18,10 +19,21 @@ from app.models.metric import (
     DashboardWidget
 )
 from app.services.cache import cached, get_cache_service
+from app.services.metric_aggregator import MetricHistoryAggregator
 from app.services.alerts import AlertService
 
 logger = logging.getLogger(__name__)
 
+# Amostras por INSERT na ingestão em lote
+METRIC_SAMPLE_BATCH_SIZE = 1000
+
+
+def _naive_utc(value: datetime) -> datetime:
+    """Converte um timestamp com fuso para UTC sem fuso, como a coluna guarda."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
 
 class MetricsService:
     """Serviço para gerenciamento de métricas e estatísticas do sistema."""
@@ -46,7 +58,9 @@ class MetricsService:
         if user_id:
             query = query.where(Metric.user_id == user_id)
             
-        query = query.limit(limit)
+        # Listagens só usam colunas: qualquer acesso a historical_data/alerts
+        # falha na hora em vez de virar uma consulta por métrica
+        query = query.options(raiseload("*")).limit(limit)
         result = await self.db.execute(query)
         return result.scalars().all()
     
@@ -73,6 +87,9 @@ class MetricsService:
         """
         Recupera o histórico de uma métrica com agregação temporal.
         
+        Lê os rollups pré-agregados (uma linha por intervalo) em vez de
+        agrupar os pontos brutos de metric_history.
+        
         Args:
             metric_id: ID da métrica
             start_date: Data inicial
@@ -82,67 +99,31 @@ class MetricsService:
         Returns:
             Lista de valores históricos da métrica com agregação temporal
         """
-        # Definir formato de data baseado na granularidade
+        # Definir formato do período baseado na granularidade
         date_formats = {
             TimeGranularity.HOUR: "%Y-%m-%d %H:00:00",
             TimeGranularity.DAY: "%Y-%m-%d",
             TimeGranularity.WEEK: "%Y-%U",  # Semana do ano
             TimeGranularity.MONTH: "%Y-%m",
-            TimeGranularity.QUARTER: "TO_CHAR(DATE_TRUNC('quarter', timestamp), 'YYYY-Q')",
             TimeGranularity.YEAR: "%Y",
         }
         
-        format_str = date_formats.get(granularity, date_formats[TimeGranularity.DAY])
-        
-        if granularity == TimeGranularity.QUARTER:
-            # Para trimestres, precisamos de uma abordagem diferente
-            query_str = """
-            SELECT 
-                TO_CHAR(DATE_TRUNC('quarter', timestamp), 'YYYY-Q') as period,
-                AVG(value) as avg_value,
-                MIN(value) as min_value,
-                MAX(value) as max_value,
-                COUNT(*) as count
-            FROM metric_history
-            WHERE metric_id = :metric_id
-            AND timestamp BETWEEN :start_date AND :end_date
-            GROUP BY period
-            ORDER BY period
-            """
-        else:
-            query_str = f"""
-            SELECT 
-                TO_CHAR(timestamp, '{format_str}') as period,
-                AVG(value) as avg_value,
-                MIN(value) as min_value,
-                MAX(value) as max_value,
-                COUNT(*) as count
-            FROM metric_history
-            WHERE metric_id = :metric_id
-            AND timestamp BETWEEN :start_date AND :end_date
-            GROUP BY period
-            ORDER BY period
-            """
-        
-        result = await self.db.execute(
-            text(query_str),
-            {
-                "metric_id": metric_id,
-                "start_date": start_date,
-                "end_date": end_date,
-            },
+        buckets = await MetricHistoryAggregator(self.db).get_buckets(
+            metric_id, start_date, end_date, granularity
         )
         
-        return [
-            {
-                "period": row[0],
-                "avg_value": float(row[1]) if row[1] is not None else None,
-                "min_value": float(row[2]) if row[2] is not None else None,
-                "max_value": float(row[3]) if row[3] is not None else None,
-                "count": row[4],
-            }
-            for row in result.fetchall()
-        ]
+        history = []
+        for bucket in buckets:
+            bucket_start = bucket.pop("bucket_start")
+            if granularity == TimeGranularity.QUARTER:
+                period = f"{bucket_start.year}-{(bucket_start.month - 1) // 3 + 1}"
+            else:
+                period = bucket_start.strftime(
+                    date_formats.get(granularity, date_formats[TimeGranularity.DAY])
+                )
+            history.append({"period": period, **bucket})
+        
+        return history
     
     async def update_metric_value(
         self,
@@ -184,7 +165,7 @@ class MetricsService:
             value=value,
             value_text=value_text,
             timestamp=datetime.utcnow(),
-            metadata=metadata
+            meta=metadata
         )
         
         # Persiste as alterações
@@ -192,6 +173,12 @@ class MetricsService:
         self.db.add(history_entry)
         await self.db.flush()
         
+        # Atualiza os rollups por hora/dia/semana usados pelos dashboards
+        if value is not None:
+            await MetricHistoryAggregator(self.db).record(
+                metric_id, value, history_entry.timestamp
+            )
+        
         # Verifica alertas se solicitado
         if check_alerts and value is not None:
             alert_service = AlertService(self.db)
@@ -203,6 +190,102 @@ class MetricsService:
         
         return metric, history_entry
     
+    async def record_metric_values(
+        self,
+        samples: List[Dict[str, Any]],
+        check_alerts: bool = True,
+    ) -> int:
+        """
+        Registra um lote de valores de métricas (ingestão em tempo real).
+        
+        O histórico é gravado com insert() do Core em lotes de
+        METRIC_SAMPLE_BATCH_SIZE linhas (executemany), sem criar um objeto ORM
+        nem fazer um INSERT por amostra. Os alertas são verificados uma vez
+        por lote, com o valor numérico mais recente de cada métrica.
+        
+        Args:
+            samples: Dicionários com metric_id, value, value_text, metadata e
+                timestamp (opcional, padrão agora; com fuso é convertido para UTC)
+            check_alerts: Se deve verificar condições de alerta
+            
+        Returns:
+            Número de amostras registradas
+        """
+        if not samples:
+            return 0
+        
+        now = datetime.utcnow()
+        rows = [
+            {
+                "metric_id": sample["metric_id"],
+                "value": sample.get("value"),
+                "value_text": sample.get("value_text"),
+                # Clientes mandam ISO com e sem fuso; misturados, a ordenação
+                # abaixo falharia e os rollups cairiam no intervalo errado
+                "timestamp": _naive_utc(sample.get("timestamp") or now),
+                "metadata": sample.get("metadata"),
+            }
+            for sample in samples
+        ]
+        
+        history_table = MetricHistory.__table__
+        for start in range(0, len(rows), METRIC_SAMPLE_BATCH_SIZE):
+            await self.db.execute(
+                insert(history_table), rows[start:start + METRIC_SAMPLE_BATCH_SIZE]
+            )
+        
+        # Valor atual de cada métrica = amostra mais recente do lote
+        latest: Dict[int, Dict[str, Any]] = {}
+        latest_values: Dict[int, float] = {}
+        for row in sorted(rows, key=lambda row: row["timestamp"]):
+            latest[row["metric_id"]] = row
+            if row["value"] is not None:
+                latest_values[row["metric_id"]] = row["value"]
+        
+        metrics_table = Metric.__table__
+        await self.db.execute(
+            update(metrics_table)
+            .where(metrics_table.c.id == bindparam("b_metric_id"))
+            .values(
+                value=func.coalesce(bindparam("b_value", type_=Float), metrics_table.c.value),
+                value_text=func.coalesce(bindparam("b_value_text", type_=String), metrics_table.c.value_text),
+                updated_at=now,
+            ),
+            [
+                {
+                    "b_metric_id": metric_id,
+                    "b_value": row["value"],
+                    "b_value_text": row["value_text"],
+                }
+                for metric_id, row in latest.items()
+            ],
+        )
+        
+        await MetricHistoryAggregator(self.db).record_many(
+            (row["metric_id"], row["value"], row["timestamp"])
+            for row in rows
+            if row["value"] is not None
+        )
+        
+        # Verifica alertas do lote inteiro: uma consulta de métricas e uma de
+        # alertas ativos, em vez de duas por amostra
+        if check_alerts and latest_values:
+            metrics_result = await self.db.execute(
+                select(Metric)
+                .where(Metric.id.in_(latest_values))
+                .options(raiseload("*"))
+            )
+            await AlertService(self.db).check_metric_alerts_batch(
+                [(metric, latest_values[metric.id]) for metric in metrics_result.scalars()]
+            )
+        
+        # Invalida cache relacionado
+        cache_service = await get_cache_service()
+        for metric_id in latest:
+            await cache_service.invalidate_pattern(f"metric:{metric_id}:*")
+        
+        return len(rows)
+    
     async def calculate_aggregated_metric(
         self, 
         metric_ids: List[int],
@@ -316,6 +399,7 @@ class MetricsService:
             select(DashboardWidget)
             .where(DashboardWidget.dashboard_id == dashboard_id)
             .order_by(DashboardWidget.position_y, DashboardWidget.position_x)
+            .options(raiseload("*"))
         )
         widget_result = await self.db.execute(widget_query)
         widgets = widget_result.scalars().all()
@@ -387,7 +471,7 @@ class MetricsService:
         if user_id:
             query = query.where(Metric.user_id == user_id)
             
-        result = await self.db.execute(query)
+        result = await self.db.execute(query.options(raiseload("*")))
         metrics = result.scalars().all()
         
         # Data final (hoje) e inicial para comparação
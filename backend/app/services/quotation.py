@@ -53,17 +53,18 @@ class PriceSuggestionService:
         # Basic price calculation based on cost and margin
         min_price = unit_cost * (1 + (target_profit_margin or 30) / 100)
         
-        # Get historical price data
-        historical_prices = await historical_price_repository.get_historical_prices(
+        # Get historical price data; only the price column is selected
+        price_points = await historical_price_repository.get_historical_unit_prices(
             db_session=db_session,
             item_name=item_name,
             item_sku=sku,
             customer_type=customer_type,
             region=region,
-            from_date=datetime.utcnow() - timedelta(days=365)  # Last year
+            from_date=datetime.utcnow() - timedelta(days=365),  # Last year
+            limit=100
         )
         
-        if not historical_prices:
+        if not price_points:
             # No historical data, use basic margin-based pricing
             response.update({
                 "suggested_price": round(min_price, 2),
@@ -74,9 +75,6 @@ class PriceSuggestionService:
             })
             return response
         
-        # Extract relevant price points
-        price_points = [p.unit_price for p in historical_prices]
-        
         # Calculate statistics
         historical_min = min(price_points)
         historical_max = max(price_points)
@@ -121,7 +119,7 @@ class PriceSuggestionService:
         
         # Build explanation
         explanation = (
-            f"Suggested price based on historical data ({len(historical_prices)} records). "
+            f"Suggested price based on historical data ({len(price_points)} records). "
             f"Historical range: ${historical_min:.2f}-${historical_max:.2f}, "
             f"average: ${historical_avg:.2f}. "
         )
@@ -457,7 +455,11 @@ class QuotationReportService:
             status=status,
             customer_id=customer_id,
             assigned_to_id=assigned_to_id,
-            tag_ids=tag_ids
+            tag_ids=tag_ids,
+            # The report serializes each quotation with its users and tags;
+            # get_quotations raiseloads anything not requested here
+            include_users=True,
+            include_tags=True
         )
         
         if not quotations:
@@ -0,0 +1,24 @@
+"""
+Tarefas periódicas de manutenção do banco de dados.
+"""
+import logging
+from typing import List
+
+from app.core.celery import celery_app
+from app.db.partitions import ensure_monthly_partitions
+from app.db.session import engine
+from app.models.metric import MetricHistory
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name="ensure_metric_history_partitions")
+def ensure_metric_history_partitions() -> List[str]:
+    """
+    Garante as partições mensais de metric_history para os próximos meses,
+    antes que os inserts cheguem a eles e caiam na partição DEFAULT.
+    """
+    with engine.begin() as connection:
+        names = ensure_monthly_partitions(connection, MetricHistory.__tablename__)
+    logger.info(f"Partições de metric_history garantidas: {', '.join(names)}")
+    return names
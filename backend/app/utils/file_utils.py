@@ -0,0 +1,106 @@
+"""
+Utilitários para copiar arquivos enviados (uploads) para o disco.
+"""
+import io
+import os
+from typing import Any, BinaryIO, Optional, Set
+
+# Bytes por chamada de sendfile() / leitura do copyfileobj()
+COPY_CHUNK_SIZE = 1 << 20
+
+# Diretórios já criados/confirmados por este processo (ver ensure_dir)
+_known_dirs: Set[str] = set()
+
+
+def ensure_dir(path: str) -> str:
+    """
+    Garante que o diretório existe, sem syscalls se este processo já o
+    garantiu antes. Para diretórios estáveis (base, por usuário, por
+    conversa); os de um único upload usam make_subdir, para não acumular
+    entradas no cache.
+    """
+    if path not in _known_dirs:
+        os.makedirs(path, exist_ok=True)
+        _known_dirs.add(path)
+    return path
+
+
+def make_subdir(parent: str, name: str) -> str:
+    """
+    Cria parent/name com um único mkdir(), garantindo parent via ensure_dir.
+    """
+    path = os.path.join(ensure_dir(parent), name)
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        pass
+    return path
+
+
+def forget_dir(path: str) -> None:
+    """
+    Esquece path e seus subdiretórios no cache de ensure_dir; chamar depois
+    de removê-los do disco (ex.: shutil.rmtree).
+    """
+    prefix = os.path.join(path, "")
+    _known_dirs.difference_update(
+        [known for known in _known_dirs if known == path or known.startswith(prefix)]
+    )
+
+
+def real_fileno(file: BinaryIO) -> Optional[int]:
+    """
+    Retorna o descritor do sistema por trás de um upload, ou None se ele
+    está só em memória.
+
+    O UploadFile envolve um SpooledTemporaryFile: uploads pequenos ficam em
+    um BytesIO e os maiores viram um arquivo temporário real. O fileno() do
+    próprio SpooledTemporaryFile forçaria essa gravação em disco, por isso
+    olhamos o arquivo interno.
+    """
+    raw = getattr(file, "_file", file)
+    try:
+        return raw.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+
+def copy_upload(src: BinaryIO, dst: BinaryIO, digest: Optional[Any] = None) -> int:
+    """
+    Copia um upload, a partir da posição atual, para um arquivo de destino
+    aberto, e retorna o número de bytes copiados (dispensa um stat depois).
+
+    Se o upload está em um arquivo real, o kernel copia com sendfile(), sem
+    passar os dados por buffers do Python; caso contrário (ou se o sendfile
+    não for suportado), copia em blocos de 1 MB.
+
+    Com ``digest`` (um objeto de hashlib), cada bloco copiado também alimenta
+    o hash, o que evita reler o arquivo gravado; nesse caso a cópia é sempre
+    em blocos, já que o sendfile não passa os dados pelo processo.
+    """
+    src_fd = real_fileno(src) if digest is None else None
+    if src_fd is not None and hasattr(os, "sendfile"):
+        offset = src.tell()
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(src_fd, offset, 0, os.POSIX_FADV_SEQUENTIAL)
+        dst.flush()
+        dst_fd = dst.fileno()
+        copied = 0
+        try:
+            while True:
+                sent = os.sendfile(dst_fd, src_fd, offset + copied, COPY_CHUNK_SIZE)
+                if sent == 0:
+                    return copied
+                copied += sent
+        except OSError:
+            # Sem suporte para este par de arquivos: só dá para recorrer à
+            # cópia em blocos se nada foi escrito ainda
+            if copied:
+                raise
+    copied = 0
+    while chunk := src.read(COPY_CHUNK_SIZE):
+        dst.write(chunk)
+        if digest is not None:
+            digest.update(chunk)
+        copied += len(chunk)
+    return copied
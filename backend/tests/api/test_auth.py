@@ -213,6 +213,34 @@ def test_oauth_login():
     assert "authorization_url" in data
 
 
+def test_oauth_login_new_user(monkeypatch):
+    """Testa o primeiro login OAuth, que cria o usuário e emite os tokens."""
+    user_info = {
+        "id": "google-oauth-123",
+        "email": "oauth-new@example.com",
+        "name": "OAuth User",
+    }
+    monkeypatch.setattr(
+        "app.api.routers.auth.verify_google_token",
+        lambda code, redirect_uri: user_info
+    )
+
+    oauth_data = {
+        "provider": "google",
+        "code": "auth-code",
+        "redirect_uri": "http://localhost:3000/oauth/callback"
+    }
+    response = client.post(f"{settings.API_V1_PREFIX}/auth/oauth/google", json=oauth_data)
+    assert response.status_code == 200
+    data = response.json()
+    assert "access_token" in data
+    assert "refresh_token" in data
+
+    # Segundo login: o mesmo usuário é encontrado pelo OAuth ID
+    response = client.post(f"{settings.API_V1_PREFIX}/auth/oauth/google", json=oauth_data)
+    assert response.status_code == 200
+
+
 def test_change_password(normal_user_token):
     """Testa a alteração de senha."""
     headers = {"Authorization": f"Bearer {normal_user_token}"}
@@ -81,7 +81,7 @@ class TestDocumentEndpoints:
             "file_size": 1024,
             "mime_type": "application/pdf",
             "extension": ".pdf",
-            "md5_hash": "abcd1234",
+            "content_hash": "abcd1234",
             "uploaded_by_id": test_user.id,
             "processed": True,
             "processing_error": False,
@@ -119,7 +119,7 @@ class TestDocumentEndpoints:
                 "file_size": 1024,
                 "mime_type": "application/pdf",
                 "extension": ".pdf",
-                "md5_hash": f"abcd{i}",
+                "content_hash": f"abcd{i}",
                 "uploaded_by_id": test_user.id,
                 "processed": i % 2 == 0,  # Alternando entre processado e não
                 "processing_error": False,
@@ -168,7 +168,7 @@ class TestDocumentEndpoints:
             "file_size": 1024,
             "mime_type": "application/pdf",
             "extension": ".pdf",
-            "md5_hash": "abcd1234",
+            "content_hash": "abcd1234",
             "uploaded_by_id": test_user.id,
             "processed": False,
             "processing_error": True,
@@ -219,7 +219,7 @@ class TestDocumentEndpoints:
             "file_size": 1024,
             "mime_type": "application/pdf",
             "extension": ".pdf",
-            "md5_hash": "abcd1234",
+            "content_hash": "abcd1234",
             "uploaded_by_id": test_user.id,
             "processed": True,
             "processing_error": False,
@@ -114,6 +114,35 @@ def test_message(db: Session, test_conversation, test_user):
     return message
 
 
+@pytest.fixture
+def test_conversations_with_activity(db: Session, test_user, test_user2):
+    """Create several conversations, each with messages, attachments and read receipts."""
+    conversations = []
+    for index in range(3):
+        conversation = Conversation(
+            name=f"Conversation {index}",
+            is_group=True,
+            created_by_id=test_user.id
+        )
+        conversation.members = [test_user, test_user2]
+        for number in range(3):
+            message = Message(sender_id=test_user.id, content=f"Message {number}")
+            message.attachments = [
+                MessageAttachment(
+                    file_name=f"file_{number}.pdf",
+                    file_type="application/pdf",
+                    file_size=1024,
+                    file_path=f"/tmp/file_{number}.pdf"
+                )
+            ]
+            message.read_receipts = [ReadReceipt(user_id=test_user2.id)]
+            conversation.messages.append(message)
+        conversations.append(conversation)
+    db.add_all(conversations)
+    db.commit()
+    return conversations
+
+
 class TestConversationAPI:
     """Tests for conversation endpoints."""
     
@@ -169,6 +198,16 @@ class TestConversationAPI:
         assert len(data) >= 1
         assert any(conv["id"] == test_conversation.id for conv in data)
     
+    def test_get_conversations_query_count(
+        self, client, test_conversations_with_activity, conversation_list_query_budget, query_counter
+    ):
+        """Test that listing conversations does not issue one query per row."""
+        response = client.get("/api/v1/messaging/conversations")
+
+        assert response.status_code == 200
+        assert len(response.json()) >= len(test_conversations_with_activity)
+        assert len(query_counter) <= conversation_list_query_budget
+    
     def test_get_conversation(self, client, test_conversation):
         """Test retrieving a specific conversation with messages."""
         response = client.get(f"/api/v1/messaging/conversations/{test_conversation.id}")
@@ -243,7 +282,23 @@ class TestMessageAPI:
         ).first()
         
         assert read_receipt is not None
-    
+
+    def test_mark_messages_as_read_twice(self, client, test_message, db: Session, test_user):
+        """Marking the same messages again must not duplicate read receipts."""
+        for _ in range(2):
+            response = client.post(
+                "/api/v1/messaging/messages/read",
+                json={"message_ids": [test_message.id, test_message.id]}
+            )
+            assert response.status_code == 200
+
+        receipt_count = db.query(ReadReceipt).filter(
+            ReadReceipt.message_id == test_message.id,
+            ReadReceipt.user_id == test_user.id
+        ).count()
+
+        assert receipt_count == 1
+
     def test_get_unread_count(self, client, test_message, test_conversation):
         """Test getting unread message count."""
         response = client.get("/api/v1/messaging/messages/unread/count")
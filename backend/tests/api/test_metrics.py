@@ -2,7 +2,7 @@
 Testes para verificar os cálculos de métricas e KPIs.
 """
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch, MagicMock, AsyncMock
 
 from sqlalchemy import insert
@@ -183,3 +183,46 @@ async def test_update_metric_value(db_session: AsyncSession, sample_metrics):
         assert metric.value == new_value
         assert history.value == new_value
         mock_check.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_record_metric_values_mixed_timezones(db_session: AsyncSession, sample_metrics):
+    """Testa a ingestão em lote com timestamps com e sem fuso no mesmo lote."""
+    metrics_service = MetricsService(db_session)
+    metric_id = sample_metrics[1].id
+    now = datetime.utcnow()
+    # Um minuto depois de now, mas no horário de São Paulo: o relógio local
+    # marca três horas antes, então só a conversão para UTC acerta a ordem
+    sao_paulo = timezone(timedelta(hours=-3))
+    later = (now + timedelta(minutes=1)).replace(tzinfo=timezone.utc).astimezone(sao_paulo)
+    
+    recorded = await metrics_service.record_metric_values([
+        {"metric_id": metric_id, "value": 90.0, "timestamp": later},
+        {"metric_id": metric_id, "value": 80.0, "timestamp": now},
+    ])
+    
+    assert recorded == 2
+    metric = await metrics_service.get_metric_by_id(metric_id)
+    await db_session.refresh(metric)
+    assert metric.value == 90.0
+
+
+@pytest.mark.asyncio
+async def test_record_metric_values_checks_alerts_once(db_session: AsyncSession, sample_metrics):
+    """Testa que a ingestão em lote verifica os alertas uma vez, com o valor mais recente."""
+    metrics_service = MetricsService(db_session)
+    now = datetime.utcnow()
+    
+    with patch("app.services.metrics.AlertService") as mock_alert_service:
+        mock_check = AsyncMock()
+        mock_alert_service.return_value.check_metric_alerts_batch = mock_check
+        
+        await metrics_service.record_metric_values([
+            {"metric_id": sample_metrics[0].id, "value": 4.0, "timestamp": now},
+            {"metric_id": sample_metrics[0].id, "value": 3.0, "timestamp": now - timedelta(minutes=1)},
+            {"metric_id": sample_metrics[2].id, "value": 0.55, "timestamp": now},
+        ])
+    
+    mock_check.assert_called_once()
+    checked = {metric.id: value for metric, value in mock_check.call_args.args[0]}
+    assert checked == {sample_metrics[0].id: 4.0, sample_metrics[2].id: 0.55}
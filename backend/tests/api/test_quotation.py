@@ -14,6 +14,8 @@ from app.models.quotation import (
     Quotation, QuotationItem, QuotationTag, 
     QuotationStatus, PriceSource, RiskLevel
 )
+from app.db.repositories.quotation import search_pattern
+from app.services.quotation import QuotationReportService
 
 
 @pytest.fixture
@@ -183,6 +185,9 @@ class TestQuotationAPI:
     def test_get_quotations(self, client, mock_repositories, mock_quotation):
         """Test getting quotations list"""
         # Setup repository mock
+        mock_quotation.total_cost = 100.0
+        mock_quotation.total_price = 150.0
+        mock_quotation.profit = 50.0
         mock_repositories["quotation_repository"].get_quotations.return_value = ([mock_quotation], 1)
         
         # Make request
@@ -192,6 +197,11 @@ class TestQuotationAPI:
         assert response.status_code == 200
         assert len(response.json()) == 1
         assert mock_repositories["quotation_repository"].get_quotations.called
+        # Totals come from the cached columns, not from the loaded items
+        assert response.json()[0]["total_price"] == 150.0
+        assert response.json()[0]["profit"] == 50.0
+        # The list carries no total, so nothing is counted
+        assert mock_repositories["quotation_repository"].get_quotations.call_args.kwargs["with_count"] is False
     
     def test_get_quotation(self, client, mock_repositories, mock_quotation):
         """Test getting a single quotation"""
@@ -333,4 +343,31 @@ class TestQuotationAPI:
         # Check response
         assert response.status_code == 200
         assert "overall_risk_score" in response.json()
-        assert mock_services["risk_analysis_service"].analyze_risk.called
\ No newline at end of file
+        assert mock_services["risk_analysis_service"].analyze_risk.called
+    
+    def test_generate_summary_report(self, client, mock_quotation):
+        """Test the summary report loads the relationships it serializes"""
+        # Real report service over a mocked repository
+        mock_quotation_repository = AsyncMock()
+        mock_quotation_repository.get_quotations.return_value = ([mock_quotation], 1)
+        
+        with patch("app.api.routers.quotation.quotation_report_service", QuotationReportService()), \
+             patch("app.services.quotation.quotation_repository", mock_quotation_repository):
+            # Make request
+            response = client.post("/api/v1/quotations/reports/summary", json={})
+        
+        # Check response
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total_quotations"] == 1
+        assert data["quotations"][0]["customer"]["username"] == "customer"
+        # Customer, created_by and tags are serialized: they must be eager loaded
+        call_kwargs = mock_quotation_repository.get_quotations.call_args.kwargs
+        assert call_kwargs["include_users"] is True
+        assert call_kwargs["include_tags"] is True
+    
+    def test_search_pattern_matches_substrings(self):
+        """Test search terms match anywhere in the text, however short"""
+        assert search_pattern(" cab ") == "%cab%"
+        # Too short for a trigram seek, but still a substring match
+        assert search_pattern("ab") == "%ab%"
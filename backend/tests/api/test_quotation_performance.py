@@ -3,6 +3,60 @@ Performance tests for quotation-related endpoints.
 """
 import pytest
 from conftest import performance_test
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user
+from app.main import app
+from app.models.quotation import Quotation, QuotationItem, QuotationTag
+from app.models.user import User
+
+
+@pytest.fixture
+def current_user_override():
+    """Authenticate requests without a user lookup, so only endpoint queries are counted"""
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=1, username="test_user", email="test@example.com", hashed_password="hashed_password"
+    )
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+
+@pytest.fixture
+def seeded_quotations(test_engine):
+    """
+    Several quotations, each with multiple items and tags, so N+1 queries show
+    up. Committed on its own session, so the endpoint's session can see them.
+    """
+    customer = User(
+        username="perf_customer", email="perf_customer@example.com", hashed_password="hashed_password"
+    )
+    tags = [QuotationTag(name=f"perf-tag-{index}") for index in range(3)]
+    quotations = [
+        Quotation(
+            reference_id=f"QT-PERF-{index:04d}",
+            title=f"Performance Quotation {index}",
+            customer=customer,
+            created_by=customer,
+            tags=tags,
+            items=[
+                QuotationItem(name=f"Item {item}", quantity=2, unit_cost=10.0, unit_price=15.0)
+                for item in range(4)
+            ],
+        )
+        for index in range(5)
+    ]
+    with Session(test_engine, expire_on_commit=False) as session:
+        session.add_all(quotations)
+        session.commit()
+        yield quotations
+        # Items and tag links go with the quotations (ON DELETE CASCADE)
+        for quotation in quotations:
+            session.delete(quotation)
+        for tag in tags:
+            session.delete(tag)
+        session.delete(customer)
+        session.commit()
+
 
 class TestQuotationPerformance:
     """
@@ -19,6 +73,18 @@ class TestQuotationPerformance:
         assert response.status_code == 200
         performance_metrics("get_quotations_response_time", response.elapsed.total_seconds() * 1000)
     
+    def test_get_quotations_query_budget(
+        self, client, current_user_override, seeded_quotations, quotation_list_query_budget, query_counter
+    ):
+        """
+        Test that listing quotations issues a fixed number of queries, however
+        many quotations, items and tags the page holds
+        """
+        response = client.get("/api/v1/quotations")
+        assert response.status_code == 200
+        assert len(response.json()) >= len(seeded_quotations)
+        assert len(query_counter) <= quotation_list_query_budget
+    
     @performance_test(threshold=150.0)  # Slightly higher threshold for detailed view
     def test_get_quotation_detail_performance(self, client, performance_metrics, auth_headers):
         """
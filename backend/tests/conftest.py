@@ -17,6 +17,7 @@ from app.core.config import settings
 from app.main import app
 from app.db.session import Base
 from app.models.user import User, Item  # Importamos os modelos aqui para que sejam criados no banco de teste
+from tests.utils.query_counter import count_queries
 
 
 # Substitui a URL do banco de dados para testes em memória ou um banco temporário
@@ -136,6 +137,32 @@ def performance_test(threshold: float = 200.0):
     return decorator
 
 
+@pytest.fixture
+def query_counter():
+    """
+    Fixture that records every SQL statement executed during the test, on any
+    engine. Use it to assert an endpoint issues a bounded number of queries.
+    Request it after the fixtures that create test data, so their queries are
+    not counted.
+    """
+    with count_queries() as statements:
+        yield statements
+
+
+# Orçamentos de queries por endpoint: subir um deles exige justificar a query
+# nova, senão é uma regressão N+1
+@pytest.fixture
+def quotation_list_query_budget() -> int:
+    """Página e tags (selectin); sem contagem, e os totais vêm das colunas do trigger."""
+    return 2
+
+
+@pytest.fixture
+def conversation_list_query_budget() -> int:
+    """Conversas, membros, últimas mensagens, anexos e confirmações de leitura."""
+    return 5
+
+
 # Mock data fixture
 @pytest.fixture
 def mock_data():
@@ -5,7 +5,12 @@ import pytest
 from datetime import datetime
 
 from app.models.user import User, Item
-from app.models.base import BaseModel
+from app.models.base import (
+    BaseModel,
+    SNOWFLAKE_EPOCH_MS,
+    SNOWFLAKE_SEQUENCE_BITS,
+    SNOWFLAKE_SHARD_BITS,
+)
 
 
 def test_base_model_timestamps():
@@ -88,3 +93,15 @@ def test_from_dict_method():
     
     # Verifica se o campo extra não foi incluído
     assert not hasattr(user, "extra_field")
+
+
+def test_snowflake_ids_fit_javascript_numbers():
+    """
+    Testa se os IDs snowflake ficam abaixo de 2^53 (inteiro exato no JavaScript)
+    até 2090, já que a API os envia como número JSON.
+    """
+    ms_2090 = int(datetime(2090, 1, 1).timestamp() * 1000) - SNOWFLAKE_EPOCH_MS
+    low_bits = SNOWFLAKE_SHARD_BITS + SNOWFLAKE_SEQUENCE_BITS
+    largest_id = (ms_2090 << low_bits) | ((1 << low_bits) - 1)
+
+    assert largest_id < 2 ** 53
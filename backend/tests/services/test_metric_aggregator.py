@@ -0,0 +1,53 @@
+"""
+Tests for metric history rollups.
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from app.models.metric import TimeGranularity
+from app.services.metric_aggregator import MetricHistoryAggregator, bucket_start
+
+
+class TestMetricHistoryAggregator:
+    """Test suite for MetricHistoryAggregator"""
+
+    def test_bucket_start_matches_date_trunc(self):
+        """Test bucket boundaries for each stored granularity"""
+        timestamp = datetime(2026, 10, 16, 13, 45, 30)  # a Friday
+
+        assert bucket_start(timestamp, TimeGranularity.HOUR) == datetime(2026, 10, 16, 13)
+        assert bucket_start(timestamp, TimeGranularity.DAY) == datetime(2026, 10, 16)
+        # Weeks start on Monday, like PostgreSQL date_trunc('week', ...)
+        assert bucket_start(timestamp, TimeGranularity.WEEK) == datetime(2026, 10, 12)
+
+    @pytest.mark.asyncio
+    async def test_record_upserts_all_granularities_in_one_statement(self):
+        """Test that recording a value issues a single upsert"""
+        mock_db_session = AsyncMock()
+        aggregator = MetricHistoryAggregator(mock_db_session)
+
+        await aggregator.record(1, 2.5, datetime(2026, 10, 16, 13, 45))
+
+        mock_db_session.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_get_buckets_derives_average_from_sum_and_count(self):
+        """Test that averages come from the stored sufficient statistics"""
+        mock_result = MagicMock()
+        mock_result.all.return_value = [(datetime(2026, 10, 12), 4, 10.0, 1.0, 4.0)]
+        mock_db_session = AsyncMock()
+        mock_db_session.execute.return_value = mock_result
+        aggregator = MetricHistoryAggregator(mock_db_session)
+
+        buckets = await aggregator.get_buckets(
+            1, datetime(2026, 10, 1), datetime(2026, 10, 31), TimeGranularity.WEEK
+        )
+
+        assert buckets == [{
+            "bucket_start": datetime(2026, 10, 12),
+            "count": 4,
+            "avg_value": 2.5,
+            "min_value": 1.0,
+            "max_value": 4.0,
+        }]
@@ -3,7 +3,7 @@ Tests for quotation price suggestion service.
 """
 import pytest
 from datetime import datetime, timedelta
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, patch
 
 from app.models.quotation import PriceSource
 from app.services.quotation import PriceSuggestionService
@@ -18,7 +18,7 @@ class TestPriceSuggestionService:
         # Mock dependencies
         mock_db_session = AsyncMock()
         mock_historical_repository = AsyncMock()
-        mock_historical_repository.get_historical_prices.return_value = []
+        mock_historical_repository.get_historical_unit_prices.return_value = []
         
         # Create service instance
         service = PriceSuggestionService()
@@ -45,17 +45,17 @@ class TestPriceSuggestionService:
         # Mock dependencies
         mock_db_session = AsyncMock()
         
-        # Create mock historical prices
+        # Historical unit prices
         mock_historical_prices = [
-            MagicMock(unit_price=120.0),
-            MagicMock(unit_price=140.0),
-            MagicMock(unit_price=150.0),
-            MagicMock(unit_price=130.0),
-            MagicMock(unit_price=135.0)
+            120.0,
+            140.0,
+            150.0,
+            130.0,
+            135.0
         ]
         
         mock_historical_repository = AsyncMock()
-        mock_historical_repository.get_historical_prices.return_value = mock_historical_prices
+        mock_historical_repository.get_historical_unit_prices.return_value = mock_historical_prices
         
         # Create service instance
         service = PriceSuggestionService()
@@ -83,17 +83,17 @@ class TestPriceSuggestionService:
         # Mock dependencies
         mock_db_session = AsyncMock()
         
-        # Create mock historical prices with wide range
+        # Historical unit prices with wide range
         mock_historical_prices = [
-            MagicMock(unit_price=120.0),
-            MagicMock(unit_price=140.0),
-            MagicMock(unit_price=150.0),
-            MagicMock(unit_price=160.0),
-            MagicMock(unit_price=180.0)
+            120.0,
+            140.0,
+            150.0,
+            160.0,
+            180.0
         ]
         
         mock_historical_repository = AsyncMock()
-        mock_historical_repository.get_historical_prices.return_value = mock_historical_prices
+        mock_historical_repository.get_historical_unit_prices.return_value = mock_historical_prices
         
         # Create service instance
         service = PriceSuggestionService()
@@ -134,15 +134,15 @@ class TestPriceSuggestionService:
         # Mock dependencies
         mock_db_session = AsyncMock()
         
-        # Create mock historical prices with prices below cost + margin
+        # Historical unit prices with prices below cost + margin
         mock_historical_prices = [
-            MagicMock(unit_price=110.0),
-            MagicMock(unit_price=105.0),
-            MagicMock(unit_price=108.0)
+            110.0,
+            105.0,
+            108.0
         ]
         
         mock_historical_repository = AsyncMock()
-        mock_historical_repository.get_historical_prices.return_value = mock_historical_prices
+        mock_historical_repository.get_historical_unit_prices.return_value = mock_historical_prices
         
         # Create service instance
         service = PriceSuggestionService()
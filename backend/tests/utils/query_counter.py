@@ -0,0 +1,33 @@
+"""
+Contagem de queries SQL para detectar regressões N+1 nos testes.
+"""
+import contextlib
+from typing import Any, Iterator, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@contextlib.contextmanager
+def count_queries(conn: Any = Engine) -> Iterator[List[str]]:
+    """
+    Registra cada statement SQL executado dentro do bloco.
+
+    Args:
+        conn: Engine ou Connection a observar; por padrão a classe Engine,
+            o que cobre todas as engines (inclusive a síncrona por trás de
+            uma AsyncEngine)
+
+    Yields:
+        Lista dos statements executados, preenchida durante o bloco
+    """
+    statements: List[str] = []
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(conn, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(conn, "before_cursor_execute", _before_cursor_execute)